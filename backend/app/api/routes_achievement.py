@@ -1,50 +1,49 @@
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 from app.api.routes_auth import verify_token
 from app.database import get_db
-from app.models.achievement import Achievement, UserAchievement
-from app.models.user import User
+from app.models.achievement import UserAchievement
 from app.schemas.achievement import (
     Achievement as AchievementSchema,
     UserAchievement as UserAchievementSchema,
     UserAchievementResponse
 )
+from app.services.achievement_catalog import achievement_catalog
 from app.services.achievement_service import achievement_service
-from fastapi import APIRouter, Depends, HTTPException
+from app.services.principal_service import Principal
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/achievements", tags=["achievements"])
 
 
 @router.get("/", response_model=List[AchievementSchema])
-def get_all_achievements(db: Session = Depends(get_db), current_user: User = Depends(verify_token)):
-    """Get all available achievements"""
-    achievements = db.query(Achievement).all()
+def get_all_achievements(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(verify_token)
+):
+    """Get all available achievements (served from the catalog cache, revalidate with If-None-Match)"""
+    achievements, etag = achievement_catalog.get_snapshot(db)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=cache_headers)
+
+    response.headers.update(cache_headers)
     return achievements
 
 
 @router.get("/user", response_model=List[UserAchievementResponse])
-def get_user_achievements(db: Session = Depends(get_db), current_user: User = Depends(verify_token)):
+def get_user_achievements(db: Session = Depends(get_db), current_user: Principal = Depends(verify_token)):
     """Get achievements for the current user"""
-    user_achievements = db.query(UserAchievement).filter(
-        UserAchievement.user_id == current_user.id
-    ).all()
-    
-    return [
-        UserAchievementResponse(
-            id=ua.id,
-            achievement_id=ua.achievement_id,
-            unlocked_at=ua.unlocked_at,
-            is_notified=ua.is_notified,
-            achievement=ua.achievement
-        )
-        for ua in user_achievements
-    ]
+    return achievement_service.get_user_achievements(current_user.id, db)
 
 
 @router.post("/check")
-def check_achievements(db: Session = Depends(get_db), current_user: User = Depends(verify_token)):
+def check_achievements(db: Session = Depends(get_db), current_user: Principal = Depends(verify_token)):
     """Check and award any new achievements for the current user"""
     new_achievements = achievement_service.check_and_award_achievements(current_user.id, db)
     
@@ -66,7 +65,7 @@ def check_achievements(db: Session = Depends(get_db), current_user: User = Depen
 def mark_achievement_notified(
     achievement_id: int,
     db: Session = Depends(get_db), 
-    current_user: User = Depends(verify_token)
+    current_user: Principal = Depends(verify_token)
 ):
     """Mark an achievement as notified (user has seen the notification)"""
     user_achievement = db.query(UserAchievement).filter(
@@ -1,19 +1,29 @@
+import asyncio
 import logging
+from datetime import datetime
 from typing import Any, Dict, List
 
-from app.api.routes_auth import verify_token
+from app.api.routes_auth import verify_token, verify_token_detached
 from app.core.config import settings
 from app.core.security import (validate_and_sanitize_input,
                                validate_roadmap_field)
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.models.milestone import Milestone
 from app.models.roadmap import Roadmap
-from app.models.user import User
+from app.services.ai_quota_service import (AIQuotaExceededError,
+                                           ai_quota_service)
 from app.services.llm_service import llm_service
-from app.services.rate_limit_service import RateLimitService
-from app.services.achievement_service import achievement_service
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.services.principal_service import Principal
+from app.services.rate_limit_service import rate_limit_service
+from app.services.achievement_worker import achievement_worker
+from app.services.chat_write_buffer import (ChatBufferFullError,
+                                            chat_timestamp,
+                                            chat_write_buffer)
+from app.services.user_stats_service import (FIELD_ADDED, ROADMAP_CREATED,
+                                             user_stats_service)
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from pydantic import BaseModel, Field
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 # Configure logging
@@ -22,32 +32,45 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ai", tags=["AI-powered features"])
 
-# Initialize rate limiting service
-rate_limit_service = RateLimitService()
+def ai_rate_limit(cost: int = 1):
+    """
+    Dependency factory to check rate limits for AI endpoints.
+    Counts the request with the given cost (0 for endpoints that make no LLM call) and adds
+    the X-RateLimit headers if the limit is not exceeded, raises HTTPException otherwise.
+    """
+    async def check_ai_rate_limit(
+        response: Response,
+        current_user: Principal = Depends(verify_token_detached)
+    ) -> Principal:
+        decision = await rate_limit_service.acquire(current_user.id, cost)
+
+        if not decision.allowed:
+            retry_at = datetime.fromtimestamp(decision.reset_at)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Rate limit exceeded. Try again after {retry_at.strftime('%H:%M:%S')}",
+                headers=decision.headers()
+            )
+
+        response.headers.update(decision.headers())
+        return current_user
 
-async def check_ai_rate_limit(current_user: User = Depends(verify_token)) -> User:
+    return check_ai_rate_limit
+
+check_ai_rate_limit = ai_rate_limit()
+
+async def ai_quota_exceeded(user_id: int, error: AIQuotaExceededError, cost: int = 1) -> HTTPException:
     """
-    Dependency to check rate limits for AI endpoints.
-    Returns the user if rate limit is not exceeded, raises HTTPException otherwise.
+    The 429 for a call that doesn't fit the user's daily token budget.
+    The request was already counted by check_ai_rate_limit; it is refunded, since no LLM call was made.
     """
-    rate_limit_info = rate_limit_service.check_rate_limit(current_user.id)
-    
-    if rate_limit_info.is_limited:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"Rate limit exceeded. Try again after {rate_limit_info.reset_time.strftime('%H:%M:%S')}",
-            headers=rate_limit_service.get_rate_limit_headers(current_user.id)
-        )
-    
-    # Increment the counter
-    if not rate_limit_service.increment_request_count(current_user.id):
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded",
-            headers=rate_limit_service.get_rate_limit_headers(current_user.id)
-        )
-    
-    return current_user
+    await rate_limit_service.adjust(user_id, -cost)
+    retry_at = datetime.fromtimestamp(error.decision.reset_at)
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Daily AI token budget exceeded. Try again after {retry_at.strftime('%H:%M:%S')}",
+        headers={"Retry-After": error.decision.headers()["Retry-After"]}
+    )
 
 # --- Pydantic Models for Requests and Responses ---
 
@@ -82,7 +105,7 @@ class ChatResponse(BaseModel):
 @router.get("/initial-questions/{field}", response_model=InitialQuestionsResponse)
 async def get_initial_questions(
     field: str, 
-    current_user: User = Depends(check_ai_rate_limit)
+    current_user: Principal = Depends(ai_rate_limit(cost=0))
 ):
     """
     Provides a list of initial questions tailored to the selected career field.
@@ -109,7 +132,7 @@ async def get_initial_questions(
 async def generate_roadmap(
     request: GenerateRoadmapRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(check_ai_rate_limit)
+    current_user: Principal = Depends(check_ai_rate_limit)
 ):
     """
     Generates a new career roadmap based on user's answers to initial questions.
@@ -119,12 +142,14 @@ async def generate_roadmap(
         logger.info(f"Generating roadmap for field: {request.field}")
         logger.info(f"User responses: {request.user_responses}")
         
-        # Generate roadmap data using the LLM service
-        roadmap_data = await llm_service.generate_career_roadmap(
-            field=request.field,
-            user_responses=request.user_responses,
-            db=db
-        )
+        # Generate roadmap data using the LLM service, within the user's token budget
+        estimated_tokens = llm_service.estimate_roadmap_tokens(request.field, request.user_responses)
+        async with ai_quota_service.metered(current_user.id, estimated_tokens):
+            roadmap_data = await llm_service.generate_career_roadmap(
+                field=request.field,
+                user_responses=request.user_responses,
+                db=db
+            )
 
         logger.info(f"LLM service returned roadmap data: {roadmap_data}")
 
@@ -153,6 +178,9 @@ async def generate_roadmap(
         milestones_data = roadmap_data.get("milestones", [])
         first_milestone_title = milestones_data[0].get("title", "First Milestone") if milestones_data else None
         
+        # Load the counters before mutating so the creation events apply on top of them
+        user_stats_service.get_stats(current_user.id, db)
+
         new_roadmap = Roadmap(
             user_id=current_user.id,
             title=roadmap_data.get("title", f"Roadmap for {request.field}"),
@@ -197,12 +225,15 @@ async def generate_roadmap(
                 logger.error(f"Error creating milestone: {str(e)}")
                 logger.error(f"Milestone data: {milestone_data}")
                 logger.error(f"Milestone data type: {type(milestone_data)}")
+
+        user_stats_service.record_event(current_user.id, ROADMAP_CREATED, db, milestones=milestones_created)
+        user_stats_service.record_event(current_user.id, FIELD_ADDED, db, field=new_roadmap.field, roadmap_id=new_roadmap.id)
         
         db.commit()
         logger.info(f"Successfully created roadmap with {milestones_created} milestones")
         
         # Check for new achievements after roadmap creation
-        achievement_service.check_and_award_achievements(current_user.id, db)
+        achievement_worker.enqueue(current_user.id)
 
         return GenerateRoadmapResponse(
             success=True,
@@ -210,6 +241,8 @@ async def generate_roadmap(
             message="Roadmap created successfully."
         )
 
+    except AIQuotaExceededError as e:
+        raise await ai_quota_exceeded(current_user.id, e)
     except Exception as e:
         logger.error(f"Error generating roadmap for user {current_user.id}: {e}")
         db.rollback()
@@ -222,7 +255,7 @@ async def generate_roadmap(
 async def get_conversation_status(
     roadmap_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(verify_token)
+    current_user: Principal = Depends(verify_token)
 ):
     """
     Get the current conversation status for a roadmap.
@@ -253,53 +286,59 @@ async def get_conversation_status(
             detail="Failed to retrieve conversation status."
         )
 
+def load_chat_context(roadmap_id: int, user_id: int):
+    """Get the roadmap, its milestone count and first 3 titles for a chat, or None if not the user's"""
+    with SessionLocal() as db:
+        roadmap = db.query(
+            Roadmap.field, Roadmap.title, Roadmap.description
+        ).filter(
+            Roadmap.id == roadmap_id,
+            Roadmap.user_id == user_id
+        ).first()
+        if not roadmap:
+            return None
+        milestone_count = db.query(func.count(Milestone.id)).filter(
+            Milestone.roadmap_id == roadmap_id
+        ).scalar()
+        milestone_titles = [row[0] for row in db.query(Milestone.title).filter(
+            Milestone.roadmap_id == roadmap_id
+        ).order_by(Milestone.id).limit(3).all()]
+        return roadmap, milestone_count, milestone_titles
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_ai(
     request: ChatRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(check_ai_rate_limit)
+    current_user: Principal = Depends(check_ai_rate_limit)
 ):
     """
     Chat with AI mentor about the roadmap.
+    The database is only used in two short phases around the AI call, so waiting on the
+    AI provider doesn't hold a pooled connection.
     """
     try:
         # Validate and sanitize the message content
         sanitized_message = validate_and_sanitize_input(request.message, max_length=settings.max_message_length)
-        
-        # Check if roadmap exists and belongs to user
-        roadmap = db.query(Roadmap).filter(
-            Roadmap.id == request.roadmap_id,
-            Roadmap.user_id == current_user.id
-        ).first()
-        
-        if not roadmap:
+        sent_at = chat_timestamp()
+
+        # Phase 1: check ownership and read the roadmap context (database calls run off the event loop)
+        context = await asyncio.to_thread(load_chat_context, request.roadmap_id, current_user.id)
+        if context is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Roadmap not found."
             )
-        
-        # Save user message to database
-        from app.models.chat_message import ChatMessage
-        user_message = ChatMessage(
-            roadmap_id=request.roadmap_id,
-            user_id=current_user.id,
-            type="user",
-            content=sanitized_message
-        )
-        db.add(user_message)
-        db.commit()
+        roadmap, milestone_count, milestone_titles = context
         
         # Generate AI response based on the roadmap context
         roadmap_context = f"User is working on a {roadmap.field} roadmap titled '{roadmap.title}'. "
         roadmap_context += f"Description: {roadmap.description}. "
         
         # Get milestones for context
-        milestones = db.query(Milestone).filter(Milestone.roadmap_id == request.roadmap_id).all()
-        if milestones:
-            roadmap_context += f"The roadmap has {len(milestones)} milestones: "
-            roadmap_context += ", ".join([m.title for m in milestones[:3]])  # First 3 milestones
-            if len(milestones) > 3:
-                roadmap_context += f" and {len(milestones) - 3} more."
+        if milestone_count:
+            roadmap_context += f"The roadmap has {milestone_count} milestones: "
+            roadmap_context += ", ".join(milestone_titles)  # First 3 milestones
+            if milestone_count > 3:
+                roadmap_context += f" and {milestone_count - 3} more."
         
         # Create AI prompt for mentoring
         ai_prompt = f"""You are a career mentor helping a user with their career roadmap.
@@ -310,8 +349,9 @@ User's question/message: {request.message}
 
 Please provide helpful, encouraging, and specific advice related to their career path and roadmap. Keep your response concise (2-3 sentences) and actionable."""
 
-        # Get AI response (no JSON formatting for chat)
-        ai_response_text = await llm_service._call_ai_service(ai_prompt, json_output=False)
+        # Phase 2: get the AI response (no JSON formatting for chat) with no session open
+        async with ai_quota_service.metered(current_user.id, llm_service.estimate_chat_tokens(ai_prompt)):
+            ai_response_text = await llm_service._call_ai_service(ai_prompt, json_output=False)
         
         if not ai_response_text:
             ai_response_text = "I apologize, but I'm having trouble generating a response right now. Please try asking your question again, and I'll do my best to help you with your career roadmap."
@@ -321,25 +361,43 @@ Please provide helpful, encouraging, and specific advice related to their career
         if ai_response_text.startswith('"') and ai_response_text.endswith('"'):
             ai_response_text = ai_response_text[1:-1]
         
-        # Save AI response to database
-        ai_message = ChatMessage(
-            roadmap_id=request.roadmap_id,
-            user_id=current_user.id,
-            type="ai",
-            content=ai_response_text
-        )
-        db.add(ai_message)
-        db.commit()
+        # Phase 3: save the user message and the AI response in one transaction, both stamped
+        # from the same clock so the reply never sorts before the question
+        replied_at = max(chat_timestamp(), sent_at)
+        await chat_write_buffer.write_async([
+            {
+                "roadmap_id": request.roadmap_id,
+                "user_id": current_user.id,
+                "type": "user",
+                "content": sanitized_message,
+                "timestamp": sent_at
+            },
+            {
+                "roadmap_id": request.roadmap_id,
+                "user_id": current_user.id,
+                "type": "ai",
+                "content": ai_response_text,
+                "timestamp": replied_at
+            },
+        ])
         
         return ChatResponse(
             message=ai_response_text,
             stage="mentoring",
             roadmap_ready=True
         )
+    except HTTPException:
+        raise
+    except AIQuotaExceededError as e:
+        raise await ai_quota_exceeded(current_user.id, e)
+    except ChatBufferFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many chat messages are being saved. Please try again shortly."
+        )
     except Exception as e:
         logger.error(f"Error in chat for roadmap {request.roadmap_id}: {e}")
-        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to process chat message."
-        )
\ No newline at end of file
+        )
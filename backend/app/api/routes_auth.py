@@ -1,12 +1,15 @@
+import asyncio
 from datetime import datetime, timedelta
 from typing import Optional
 
 import jwt
 from app.core.config import settings
-from app.core.security import get_password_hash, verify_password
-from app.database import get_db
+from app.core.hashing_worker import PasswordHashingBusyError, password_hasher
+from app.database import SessionLocal, get_db
 from app.models.user import User
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.services.login_throttle import login_throttle
+from app.services.principal_service import Principal, principal_service
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
@@ -43,7 +46,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def decode_token(token: str, scope: Optional[str] = None) -> int:
+    """
+    Validate a JWT and return its user id. Tokens carrying a scope (such as notification
+    stream tokens) are only accepted where that scope is expected, and vice versa.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -66,6 +73,9 @@ def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_
         exp = payload.get("exp")
         if exp is None:
             raise credentials_exception
+
+        if payload.get("scope") != scope:
+            raise credentials_exception
             
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -75,38 +85,107 @@ def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_
         )
     except jwt.InvalidTokenError:
         raise credentials_exception
+    except HTTPException:
+        raise
     except Exception:
         raise credentials_exception
+
+    return user_id
+
+def principal_for(user_id: int, db: Session) -> Principal:
+    """The user's principal, or 401 if the user no longer exists"""
+    # Verify user still exists (cached for a short time, invalidated when the user changes)
+    principal = principal_service.get(user_id, db)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
-    # Verify user still exists and is active
-    user = db.query(User).filter(User.id == user_id).first()
+    return principal
+
+def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """
+    Authenticate the request. Returns the cached principal of the user, so the users table
+    is only read when the cache entry is missing or expired; use load_current_user for the ORM row.
+    """
+    return principal_for(decode_token(token), db)
+
+def verify_token_detached(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    verify_token with its own short-lived session, so the request holds no database
+    connection afterwards (none is opened at all when the principal is cached).
+    """
+    db = SessionLocal()
+    try:
+        return verify_token(token, db)
+    finally:
+        db.close()
+
+def load_current_user(current_user: Principal = Depends(verify_token), db: Session = Depends(get_db)) -> User:
+    """Load the authenticated user's ORM row, for routes that modify the user"""
+    user = db.get(User, current_user.id)
     if user is None:
+        principal_service.invalidate(current_user.id)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
     return user
 
+def password_hashing_unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many requests are being processed. Please try again shortly.",
+        headers={"Retry-After": "1"},
+    )
+
+def find_user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
+
+def commit_and_refresh(db: Session, *instances):
+    """Commit and reload the instances; async routes run it with asyncio.to_thread"""
+    db.commit()
+    for instance in instances:
+        db.refresh(instance)
+
 @router.post("/login", response_model=Token)
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
-    # Find user by email
-    user = db.query(User).filter(User.email == login_data.email).first()
+async def login(login_data: LoginRequest, request: Request, db: Session = Depends(get_db)):
+    # Turn away throttled clients before doing any password work
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = await login_throttle.check(client_ip, login_data.email)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts. Please try again later.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    # Find user by email (database calls run off the event loop)
+    user = await asyncio.to_thread(find_user_by_email, db, login_data.email)
     if not user:
+        await login_throttle.record_failure(client_ip, login_data.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Verify password
-    if not verify_password(login_data.password, str(user.hashed_password)):
+    # Verify password on the hashing pool
+    try:
+        password_ok = await password_hasher.verify(login_data.password, str(user.hashed_password))
+    except PasswordHashingBusyError:
+        raise password_hashing_unavailable()
+    if not password_ok:
+        await login_throttle.record_failure(client_ip, login_data.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    await login_throttle.reset(login_data.email)
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -130,9 +209,9 @@ class RegisterRequest(BaseModel):
     password: str
 
 @router.post("/register", status_code=201)
-def register(register_data: RegisterRequest, db: Session = Depends(get_db)):
+async def register(register_data: RegisterRequest, db: Session = Depends(get_db)):
     # 1. Aynı e-posta ile kullanıcı var mı kontrol et
-    existing_user = db.query(User).filter(User.email == register_data.email).first()
+    existing_user = await asyncio.to_thread(find_user_by_email, db, register_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -140,7 +219,10 @@ def register(register_data: RegisterRequest, db: Session = Depends(get_db)):
         )
 
     # 2. Şifreyi hashle
-    hashed_pw = get_password_hash(register_data.password)
+    try:
+        hashed_pw = await password_hasher.hash(register_data.password)
+    except PasswordHashingBusyError:
+        raise password_hashing_unavailable()
 
     # 3. Yeni kullanıcı oluştur
     new_user = User(
@@ -151,8 +233,7 @@ def register(register_data: RegisterRequest, db: Session = Depends(get_db)):
 
     # 4. Veritabanına ekle
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await asyncio.to_thread(commit_and_refresh, db, new_user)
 
     # 5. Access token oluştur
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
@@ -172,7 +253,7 @@ def register(register_data: RegisterRequest, db: Session = Depends(get_db)):
     }
     
 @router.get("/me")
-def get_current_user(current_user: User = Depends(verify_token)):
+def get_current_user(current_user: Principal = Depends(verify_token)):
     return {
         "id": current_user.id,
         "name": current_user.name,
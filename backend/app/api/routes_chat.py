@@ -1,35 +1,58 @@
-from typing import List
+from typing import List, Optional
 
 from app.api.routes_auth import verify_token
 from app.core.security import validate_and_sanitize_input
 from app.database import get_db
-from app.models.chat_message import ChatMessage
 from app.models.roadmap import Roadmap
-from app.models.user import User
 from app.schemas.chat import ChatMessage as ChatMessageSchema
-from app.schemas.chat import ChatMessageCreate
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.schemas.chat import ChatHistoryPage, ChatMessageCreate
+from app.services.chat_write_buffer import ChatBufferFullError, chat_write_buffer
+from app.services.chat_history_service import (DEFAULT_PAGE_SIZE,
+                                               MAX_PAGE_SIZE,
+                                               chat_history_service)
+from app.services.principal_service import Principal
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-# List chat messages for a roadmap
+def _check_roadmap_access(roadmap_id: int, db: Session, current_user: Principal):
+    """Ensure the roadmap exists and belongs to the current user"""
+    owner_id = db.query(Roadmap.user_id).filter(Roadmap.id == roadmap_id).scalar()
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="Roadmap not found")
+    if owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+# List chat messages for a roadmap (newest page by default, oldest first)
 @router.get("/roadmap/{roadmap_id}", response_model=List[ChatMessageSchema])
 def get_chat_messages(
     roadmap_id: int, 
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[int] = Query(None, description="Load messages older than this message ID"),
+    after: Optional[int] = Query(None, description="Load messages newer than this message ID"),
     db: Session = Depends(get_db), 
-    current_user: User = Depends(verify_token)
+    current_user: Principal = Depends(verify_token)
 ):
-    # First, verify that the roadmap exists and belongs to the current user
-    roadmap = db.query(Roadmap).filter(Roadmap.id == roadmap_id).first()
-    if not roadmap:
-        raise HTTPException(status_code=404, detail="Roadmap not found")
-    
-    # Ensure user can only access their own roadmap's chat messages
-    if roadmap.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    return db.query(ChatMessage).filter(ChatMessage.roadmap_id == roadmap_id).all()
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    _check_roadmap_access(roadmap_id, db, current_user)
+    return chat_history_service.get_page(roadmap_id, db, limit, before, after).items
+
+# Get a page of chat messages with cursors for older and newer messages
+@router.get("/roadmap/{roadmap_id}/page", response_model=ChatHistoryPage)
+def get_chat_page(
+    roadmap_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[int] = Query(None, description="next_before from a previous page"),
+    after: Optional[int] = Query(None, description="next_after from a previous page"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(verify_token)
+):
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    _check_roadmap_access(roadmap_id, db, current_user)
+    return chat_history_service.get_page(roadmap_id, db, limit, before, after)
 
 # Create a chat message for a roadmap
 @router.post("/roadmap/{roadmap_id}", response_model=ChatMessageSchema, status_code=201)
@@ -37,7 +60,7 @@ def create_chat_message(
     roadmap_id: int, 
     chat_message: ChatMessageCreate, 
     db: Session = Depends(get_db),
-    current_user: User = Depends(verify_token)
+    current_user: Principal = Depends(verify_token)
 ):
     # First, verify that the roadmap exists and belongs to the current user
     roadmap = db.query(Roadmap).filter(Roadmap.id == roadmap_id).first()
@@ -59,13 +82,15 @@ def create_chat_message(
     if chat_message.type not in ["user", "ai", "system"]:
         raise HTTPException(status_code=400, detail="Invalid message type")
     
-    new_message = ChatMessage(
-        roadmap_id=roadmap_id, 
-        user_id=current_user.id,  # Use authenticated user's ID
-        type=chat_message.type, 
-        content=sanitized_content
-    )
-    db.add(new_message)
-    db.commit()
-    db.refresh(new_message)
-    return new_message 
\ No newline at end of file
+    # Release the connection before waiting on the (possibly buffered) insert
+    db.close()
+    try:
+        saved = chat_write_buffer.write([{
+            "roadmap_id": roadmap_id,
+            "user_id": current_user.id,  # Use authenticated user's ID
+            "type": chat_message.type,
+            "content": sanitized_content
+        }])
+    except ChatBufferFullError:
+        raise HTTPException(status_code=503, detail="Too many chat messages are being saved. Please try again shortly.")
+    return saved[0] 
\ No newline at end of file
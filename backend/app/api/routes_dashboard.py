@@ -0,0 +1,62 @@
+from typing import Optional
+
+from app.api.routes_auth import verify_token
+from app.api.routes_roadmap import get_roadmap_summary_page
+from app.database import get_db
+from app.schemas.dashboard import (DASHBOARD_SECTIONS, DashboardResponse,
+                                   DashboardStats, DashboardUser)
+from app.services.achievement_service import achievement_service
+from app.services.activity_service import activity_service
+from app.services.analytics_service import analytics_service
+from app.services.principal_service import Principal
+from app.services.user_stats_service import user_stats_service
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+DASHBOARD_ROADMAP_LIMIT = 20
+DASHBOARD_RECENT_LIMIT = 10
+
+
+# Everything the dashboard needs on load in one round trip
+@router.get("/", response_model=DashboardResponse, response_model_exclude_unset=True)
+def get_dashboard(
+    sections: Optional[str] = Query(None, description="Comma-separated sections, defaults to all"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(verify_token)
+):
+    """
+    Combined payload of the user, profile counters, roadmap cards, achievements and analytics.
+    Everything is read in the request's session.
+    """
+    selected = set(DASHBOARD_SECTIONS)
+    if sections:
+        selected = {section.strip() for section in sections.split(",") if section.strip()}
+        unknown = selected - set(DASHBOARD_SECTIONS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown dashboard sections: {sorted(unknown)}")
+
+    if "milestones_by_date" in selected:
+        # The rollups are built together with the counters row on first use
+        user_stats_service.get_stats(current_user.id, db)
+
+    dashboard = DashboardResponse()
+    if "user" in selected:
+        dashboard.user = DashboardUser.model_validate(current_user)
+    if "stats" in selected:
+        dashboard.stats = DashboardStats(**user_stats_service.get_profile_stats(current_user.id, db))
+    if "roadmaps" in selected:
+        dashboard.roadmaps = get_roadmap_summary_page(db, current_user.id, DASHBOARD_ROADMAP_LIMIT)
+    if "achievements" in selected:
+        dashboard.achievements = achievement_service.get_user_achievements(current_user.id, db)
+    if "milestones_by_date" in selected:
+        dashboard.milestones_by_date = analytics_service.get_completion_series(current_user.id, db)
+    if "recent_milestones" in selected:
+        dashboard.recent_milestones = activity_service.get_recent_completions(
+            current_user.id, db, DASHBOARD_RECENT_LIMIT
+        )
+
+    # Persist the counters row if this was its first use
+    db.commit()
+    return dashboard
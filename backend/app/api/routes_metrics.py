@@ -0,0 +1,42 @@
+import hmac
+from typing import Optional
+
+from app.core.config import settings
+from app.core.hashing_worker import password_hasher
+from app.core.redis_client import redis_connection
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+LOOPBACK_ADDRESSES = {"127.0.0.1", "::1"}
+
+metrics_bearer = HTTPBearer(auto_error=False)
+
+
+def require_internal_access(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(metrics_bearer)
+):
+    """Allow the METRICS_TOKEN bearer token, or loopback clients when no token is configured"""
+    if settings.metrics_token:
+        if credentials and hmac.compare_digest(credentials.credentials, settings.metrics_token):
+            return
+    elif request.client and request.client.host in LOOPBACK_ADDRESSES:
+        return
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Metrics are internal")
+
+
+router = APIRouter(prefix="/metrics", tags=["metrics"], dependencies=[Depends(require_internal_access)])
+
+
+# Password hashing pool queue depth and latency
+@router.get("/password-hashing")
+def get_password_hashing_metrics():
+    """Operational counters of the bcrypt worker pool (no user data)"""
+    return password_hasher.metrics()
+
+
+# Shared Redis client and circuit breaker state
+@router.get("/redis")
+def get_redis_metrics():
+    """Whether Redis is configured and whether calls to it are currently short-circuited"""
+    return redis_connection.status()
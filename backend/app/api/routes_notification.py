@@ -0,0 +1,85 @@
+from datetime import timedelta
+from typing import Optional
+
+from app.api.routes_auth import (create_access_token, decode_token,
+                                 principal_for, verify_token_detached)
+from app.core.config import settings
+from app.database import SessionLocal
+from app.services.notification_service import notification_broker
+from app.services.principal_service import Principal
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+
+router = APIRouter(prefix="/notifications", tags=["notifications"])
+
+# EventSource can't send headers, so it authenticates with a short-lived stream token in the
+# query string instead; access tokens are only accepted in the Authorization header
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+STREAM_TOKEN_SCOPE = "notifications:stream"
+HEARTBEAT_SECONDS = 15
+
+
+def get_stream_user_id(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    stream_token: Optional[str] = Query(None)
+) -> int:
+    """Authenticate a stream with a short-lived session so no connection is held while streaming"""
+    if token:
+        user_id = decode_token(token)
+    elif stream_token:
+        user_id = decode_token(stream_token, scope=STREAM_TOKEN_SCOPE)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    db = SessionLocal()
+    try:
+        return principal_for(user_id, db).id
+    finally:
+        db.close()
+
+
+# Short-lived token for opening the stream with EventSource
+@router.post("/stream-token")
+def create_stream_token(current_user: Principal = Depends(verify_token_detached)):
+    """Token accepted only by GET /notifications/stream, valid for a short time"""
+    expires_in = settings.notification_stream_token_ttl_seconds
+    stream_token = create_access_token(
+        data={"sub": str(current_user.id), "scope": STREAM_TOKEN_SCOPE},
+        expires_delta=timedelta(seconds=expires_in)
+    )
+    return {"stream_token": stream_token, "expires_in": expires_in}
+
+
+# Stream notifications (achievement unlocks, milestone progress, job completions)
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    last_event_id: Optional[int] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    user_id: int = Depends(get_stream_user_id)
+):
+    """
+    Server-sent event stream of the current user's notifications.
+    Reconnecting clients send Last-Event-ID (or ?last_event_id=) to receive missed events.
+    """
+    if last_event_id is None and last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+
+    async def event_stream():
+        # Tell the browser how long to wait before reconnecting
+        yield "retry: 3000\n\n"
+        async for notification in notification_broker.subscribe(user_id, last_event_id, HEARTBEAT_SECONDS):
+            if await request.is_disconnected():
+                break
+            yield ": keep-alive\n\n" if notification is None else notification.to_sse()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
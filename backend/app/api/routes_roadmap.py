@@ -1,33 +1,153 @@
-from datetime import date, datetime, timedelta
-from typing import Dict, List
+from datetime import date, datetime
+from typing import Dict, List, Literal, Optional
 
 from app.api.routes_auth import verify_token
 from app.database import get_db
 from app.models.milestone import Milestone
 from app.models.roadmap import Roadmap
-from app.models.user import User
+from app.schemas.activity import ActivityPage, ActivityType
 from app.schemas.roadmap import Milestone as MilestoneSchema
 from app.schemas.roadmap import Roadmap as RoadmapSchema
-from app.schemas.roadmap import RoadmapUpdate
-from app.services.achievement_service import achievement_service
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from app.schemas.roadmap import (MilestoneBatchRequest, RoadmapSummary,
+                                 RoadmapSummaryPage, RoadmapUpdate)
+from app.services.achievement_worker import achievement_worker
+from app.services.activity_service import MAX_PAGE_SIZE, activity_service
+from app.services.analytics_service import analytics_service, count_by_day
+from app.services.notification_service import (MILESTONE_COMPLETED as MILESTONE_COMPLETED_NOTIFICATION,
+                                               ROADMAP_PROGRESS,
+                                               notification_broker)
+from app.services.principal_service import Principal
+from app.services.user_stats_service import (MILESTONE_COMPLETED,
+                                             MILESTONE_UNCOMPLETED,
+                                             ROADMAP_COMPLETED,
+                                             ROADMAP_DELETED, ROADMAP_REOPENED,
+                                             user_stats_service)
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session, selectinload
 
 router = APIRouter(prefix="/roadmaps", tags=["roadmaps"])
 
+
+def _is_complete(completed_milestones: int, total_milestones: int) -> bool:
+    return total_milestones > 0 and completed_milestones >= total_milestones
+
+
+def _next_open_milestone(roadmap_id: int):
+    return (
+        select(Milestone.title)
+        .where(Milestone.roadmap_id == roadmap_id, Milestone.completed == False)
+        .order_by(Milestone.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def _update_progress(db: Session, roadmap_id: int, completed, total):
+    """Write progress counters and next_milestone in one UPDATE and return the new values"""
+    return db.execute(
+        update(Roadmap)
+        .where(Roadmap.id == roadmap_id)
+        .values(
+            completed_milestones=completed,
+            total_milestones=total,
+            progress=case((total > 0, completed * 100 // total), else_=0),
+            next_milestone=_next_open_milestone(roadmap_id)
+        )
+        .returning(
+            Roadmap.id, Roadmap.title, Roadmap.field, Roadmap.progress, Roadmap.next_milestone,
+            Roadmap.total_milestones, Roadmap.completed_milestones, Roadmap.created_at
+        ),
+        execution_options={"synchronize_session": False}
+    ).one()
+
+
+def _apply_progress_delta(db: Session, roadmap_id: int, delta: int):
+    """Shift a roadmap's completed count by delta, keeping the stored total"""
+    return _update_progress(db, roadmap_id, Roadmap.completed_milestones + delta, Roadmap.total_milestones)
+
+
+def _recompute_progress(db: Session, roadmap_id: int):
+    """Recount a roadmap's milestones after set-based changes"""
+    total = select(func.count(Milestone.id)).where(Milestone.roadmap_id == roadmap_id).scalar_subquery()
+    completed = select(func.count(Milestone.id)).where(
+        Milestone.roadmap_id == roadmap_id, Milestone.completed == True
+    ).scalar_subquery()
+    return _update_progress(db, roadmap_id, completed, total)
+
+
+def _record_completion_change(user_id: int, db: Session, was_completed: bool, roadmap):
+    """Emit roadmap completed/reopened events when a progress update crossed 100%"""
+    is_completed = _is_complete(roadmap.completed_milestones, roadmap.total_milestones)
+    if is_completed != was_completed:
+        user_stats_service.record_event(user_id, ROADMAP_COMPLETED if is_completed else ROADMAP_REOPENED, db)
+
+
+def _get_owned_roadmap(roadmap_id: int, db: Session, current_user: Principal) -> Roadmap:
+    roadmap = db.query(Roadmap).filter(Roadmap.id == roadmap_id).first()
+    if not roadmap:
+        raise HTTPException(status_code=404, detail="Roadmap not found")
+    # Ensure user can only modify their own roadmaps
+    if roadmap.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return roadmap
+
+
+def _progress_payload(roadmap) -> Dict:
+    """Roadmap progress fields pushed to the notification stream"""
+    return {
+        "roadmap_id": roadmap.id,
+        "progress": roadmap.progress,
+        "completed_milestones": roadmap.completed_milestones,
+        "total_milestones": roadmap.total_milestones,
+        "next_milestone": roadmap.next_milestone
+    }
+
+
+def get_roadmap_summary_page(db: Session, user_id: int, limit: int, cursor: Optional[int] = None) -> RoadmapSummaryPage:
+    """Get one page of a user's roadmap cards, newest first"""
+    query = select(
+        Roadmap.id, Roadmap.title, Roadmap.field, Roadmap.progress, Roadmap.next_milestone,
+        Roadmap.total_milestones, Roadmap.completed_milestones, Roadmap.created_at
+    ).where(Roadmap.user_id == user_id)
+    if cursor is not None:
+        query = query.where(Roadmap.id < cursor)
+    # Fetch one extra row to know whether another page exists
+    rows = db.execute(query.order_by(Roadmap.id.desc()).limit(limit + 1)).all()
+
+    items = [RoadmapSummary.model_validate(row) for row in rows[:limit]]
+    next_cursor = items[-1].id if len(rows) > limit else None
+    return RoadmapSummaryPage(items=items, next_cursor=next_cursor)
+
+
 # List all roadmaps for a user
 @router.get("/user/{user_id}", response_model=List[RoadmapSchema])
-def get_roadmaps_for_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(verify_token)):
+def get_roadmaps_for_user(user_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(verify_token)):
     # Ensure user can only access their own roadmaps
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Access denied")
-    roadmaps = db.query(Roadmap).filter(Roadmap.user_id == user_id).all()
+    # Load every roadmap's milestones in one extra query instead of one per roadmap
+    roadmaps = db.query(Roadmap).options(selectinload(Roadmap.milestones)).filter(Roadmap.user_id == user_id).all()
     return roadmaps
 
+# List roadmap cards for a user (no milestones), newest first
+@router.get("/user/{user_id}/summary", response_model=RoadmapSummaryPage)
+def get_roadmap_summaries_for_user(
+    user_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(verify_token)
+):
+    """Lightweight dashboard listing with keyset pagination on roadmap id"""
+    # Ensure user can only access their own roadmaps
+    if current_user.id != user_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return get_roadmap_summary_page(db, user_id, limit, cursor)
+
 # Get a single roadmap (with milestones)
 @router.get("/{roadmap_id}", response_model=RoadmapSchema)
-def get_roadmap(roadmap_id: int, db: Session = Depends(get_db), current_user: User = Depends(verify_token)):
+def get_roadmap(roadmap_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(verify_token)):
     roadmap = db.query(Roadmap).filter(Roadmap.id == roadmap_id).first()
     if not roadmap:
         raise HTTPException(status_code=404, detail="Roadmap not found")
@@ -38,35 +158,58 @@ def get_roadmap(roadmap_id: int, db: Session = Depends(get_db), current_user: Us
 
 # Update a roadmap
 @router.put("/{roadmap_id}", response_model=RoadmapSchema)
-def update_roadmap(roadmap_id: int, roadmap_update: RoadmapUpdate, db: Session = Depends(get_db), current_user: User = Depends(verify_token)):
+def update_roadmap(roadmap_id: int, roadmap_update: RoadmapUpdate, db: Session = Depends(get_db), current_user: Principal = Depends(verify_token)):
     roadmap = db.query(Roadmap).filter(Roadmap.id == roadmap_id).first()
     if not roadmap:
         raise HTTPException(status_code=404, detail="Roadmap not found")
     # Ensure user can only update their own roadmaps
     if roadmap.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
-    for key, value in roadmap_update.dict(exclude_unset=True).items():
+    updates = roadmap_update.dict(exclude_unset=True)
+    for key, value in updates.items():
         setattr(roadmap, key, value)
     db.commit()
+
+    # Direct edits of counted fields bypass the event stream, so rebuild the counters
+    if updates.keys() & {"field", "total_milestones", "completed_milestones"}:
+        user_stats_service.reconcile_user_stats(current_user.id, db)
+
     db.refresh(roadmap)
     return roadmap
 
 # Delete a roadmap
 @router.delete("/{roadmap_id}")
-def delete_roadmap(roadmap_id: int, db: Session = Depends(get_db), current_user: User = Depends(verify_token)):
+def delete_roadmap(roadmap_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(verify_token)):
     roadmap = db.query(Roadmap).filter(Roadmap.id == roadmap_id).first()
     if not roadmap:
         raise HTTPException(status_code=404, detail="Roadmap not found")
     # Ensure user can only delete their own roadmaps
     if roadmap.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
+
+    milestone_count, completed_count = db.query(
+        func.count(Milestone.id),
+        func.coalesce(func.sum(case((Milestone.completed == True, 1), else_=0)), 0)
+    ).filter(Milestone.roadmap_id == roadmap_id).one()
+    was_completed = roadmap.total_milestones > 0 and roadmap.completed_milestones == roadmap.total_milestones
+    completed_on = analytics_service.get_completion_days(current_user.id, db, roadmap_id) if completed_count else {}
+
     db.delete(roadmap)
+    user_stats_service.record_event(
+        current_user.id, ROADMAP_DELETED, db,
+        roadmap_id=roadmap_id,
+        field=roadmap.field,
+        milestones=milestone_count,
+        completed_milestones=completed_count,
+        completed_on=completed_on,
+        was_completed=was_completed
+    )
     db.commit()
     return {"ok": True}
 
 # List milestones for a roadmap
 @router.get("/{roadmap_id}/milestones", response_model=List[MilestoneSchema])
-def get_milestones(roadmap_id: int, db: Session = Depends(get_db), current_user: User = Depends(verify_token)):
+def get_milestones(roadmap_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(verify_token)):
     # First, verify that the roadmap exists and belongs to the current user
     roadmap = db.query(Roadmap).filter(Roadmap.id == roadmap_id).first()
     if not roadmap:
@@ -80,212 +223,242 @@ def get_milestones(roadmap_id: int, db: Session = Depends(get_db), current_user:
 
 # Mark a milestone as complete
 @router.put("/milestones/{milestone_id}/complete", response_model=MilestoneSchema)
-async def complete_milestone(milestone_id: int, db: Session = Depends(get_db), current_user: User = Depends(verify_token)):
-    milestone = db.query(Milestone).filter(Milestone.id == milestone_id).first()
-    if not milestone:
-        raise HTTPException(status_code=404, detail="Milestone not found")
-
-    # Ensure the milestone belongs to a roadmap owned by the current user
-    roadmap = db.query(Roadmap).filter(Roadmap.id == milestone.roadmap_id).first()
-    if not roadmap or roadmap.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+async def complete_milestone(milestone_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(verify_token)):
+    # Load the counters first so events below apply on top of them
+    user_stats_service.get_stats(current_user.id, db)
+
+    # Complete the milestone only if it is still open and belongs to one of the user's roadmaps
+    completed_at = datetime.now()
+    milestone = db.scalars(
+        update(Milestone)
+        .where(
+            Milestone.id == milestone_id,
+            Milestone.completed == False,
+            Milestone.roadmap_id.in_(select(Roadmap.id).where(Roadmap.user_id == current_user.id))
+        )
+        .values(completed=True, completed_at=completed_at)
+        .returning(Milestone),
+        execution_options={"synchronize_session": False}
+    ).first()
+
+    if milestone is None:
+        # Nothing changed: the milestone is missing, not ours, or already completed
+        milestone = db.query(Milestone).filter(Milestone.id == milestone_id).first()
+        if not milestone:
+            raise HTTPException(status_code=404, detail="Milestone not found")
+        owner_id = db.query(Roadmap.user_id).filter(Roadmap.id == milestone.roadmap_id).scalar()
+        if owner_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Access denied")
+        return milestone
 
-    milestone.completed = True
-    milestone.completed_at = datetime.now()
+    # Update roadmap progress incrementally in one statement
+    roadmap = _apply_progress_delta(db, milestone.roadmap_id, 1)
+
+    user_stats_service.record_event(current_user.id, MILESTONE_COMPLETED, db, completed_at=completed_at)
+    _record_completion_change(
+        current_user.id, db, _is_complete(roadmap.completed_milestones - 1, roadmap.total_milestones), roadmap
+    )
+
+    # Serialize before committing so the response doesn't reload expired attributes
+    response = MilestoneSchema.model_validate(milestone)
     db.commit()
 
-    # Update roadmap progress
-    if roadmap:
-        completed_milestones = db.query(Milestone).filter(Milestone.roadmap_id == roadmap.id, Milestone.completed == True).count()
-        total_milestones = db.query(Milestone).filter(Milestone.roadmap_id == roadmap.id).count()
-        roadmap.progress = int((completed_milestones / total_milestones) * 100) if total_milestones > 0 else 0
-        roadmap.completed_milestones = completed_milestones
-        roadmap.total_milestones = total_milestones
-        
-        # Update next milestone
-        if completed_milestones >= total_milestones:
-            roadmap.next_milestone = None  # All milestones completed
-        else:
-            # Find the first incomplete milestone
-            next_milestone = db.query(Milestone).filter(
-                Milestone.roadmap_id == roadmap.id, 
-                Milestone.completed == False
-            ).first()
-            roadmap.next_milestone = next_milestone.title if next_milestone else None
-        
-        db.commit()
-        
-        # Check for new achievements after milestone completion
-        achievement_service.check_and_award_achievements(current_user.id, db)
+    notification_broker.publish(current_user.id, MILESTONE_COMPLETED_NOTIFICATION, {
+        "milestone_id": milestone_id,
+        **_progress_payload(roadmap)
+    })
 
-    db.refresh(milestone)
-    return milestone
+    # Check for new achievements after milestone completion
+    achievement_worker.enqueue(current_user.id)
+
+    return response
 
 # Complete all milestones in a roadmap
 @router.put("/{roadmap_id}/complete-all")
-async def complete_all_milestones(roadmap_id: int, db: Session = Depends(get_db), current_user: User = Depends(verify_token)):
-    roadmap = db.query(Roadmap).filter(Roadmap.id == roadmap_id).first()
-    if not roadmap:
-        raise HTTPException(status_code=404, detail="Roadmap not found")
-    # Ensure user can only complete their own roadmaps
-    if roadmap.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access denied")
+async def complete_all_milestones(roadmap_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(verify_token)):
+    roadmap = _get_owned_roadmap(roadmap_id, db, current_user)
+    roadmap_was_completed = _is_complete(roadmap.completed_milestones, roadmap.total_milestones)
+    # Load the counters before mutating so the events below apply on top of them
+    user_stats_service.get_stats(current_user.id, db)
 
-    # Mark all milestones as complete
-    milestones = db.query(Milestone).filter(Milestone.roadmap_id == roadmap_id).all()
-    for milestone in milestones:
-        milestone.completed = True
-        if not milestone.completed_at:  # Only set if not already set
-            milestone.completed_at = datetime.now()
-    
-    # Update roadmap progress to 100%
-    total_milestones = len(milestones)
-    roadmap.progress = 100
-    roadmap.completed_milestones = total_milestones
-    roadmap.total_milestones = total_milestones
-    roadmap.next_milestone = None  # All milestones completed
+    # Mark all milestones as complete, keeping completion times that are already set
+    completed_at = datetime.now()
+    completion_times = db.scalars(
+        update(Milestone)
+        .where(Milestone.roadmap_id == roadmap_id, Milestone.completed == False)
+        .values(completed=True, completed_at=func.coalesce(Milestone.completed_at, completed_at))
+        .returning(Milestone.completed_at),
+        execution_options={"synchronize_session": False}
+    ).all()
+    newly_completed = len(completion_times)
+
+    # Update roadmap progress (100% unless the roadmap has no milestones)
+    progress = _recompute_progress(db, roadmap_id)
+
+    if newly_completed:
+        user_stats_service.record_event(
+            current_user.id, MILESTONE_COMPLETED, db,
+            count=newly_completed, completed_at=completed_at, completed_on=count_by_day(completion_times)
+        )
+    _record_completion_change(current_user.id, db, roadmap_was_completed, progress)
     
     db.commit()
-    
+
+    notification_broker.publish(current_user.id, ROADMAP_PROGRESS, _progress_payload(progress))
+
     # Check for new achievements after completing all milestones
-    achievement_service.check_and_award_achievements(current_user.id, db)
+    achievement_worker.enqueue(current_user.id)
     
-    return {"message": "All milestones completed successfully", "completed_count": total_milestones}
+    return {"message": "All milestones completed successfully", "completed_count": progress.total_milestones}
+
+# Apply several milestone operations to a roadmap at once
+@router.post("/{roadmap_id}/milestones/batch", response_model=RoadmapSummary)
+async def batch_update_milestones(
+    roadmap_id: int,
+    batch: MilestoneBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(verify_token)
+):
+    """
+    Apply complete, uncomplete, set_due_date and edit operations in one transaction.
+    Operations are grouped into set-based UPDATEs and progress is recomputed once.
+    When a milestone gets both complete and uncomplete, the last one wins.
+    """
+    roadmap = _get_owned_roadmap(roadmap_id, db, current_user)
+    roadmap_was_completed = _is_complete(roadmap.completed_milestones, roadmap.total_milestones)
+    # Load the counters before mutating so the events below apply on top of them
+    user_stats_service.get_stats(current_user.id, db)
+
+    # Every referenced milestone must belong to this roadmap
+    requested_ids = {operation.milestone_id for operation in batch.operations}
+    found_ids = set(db.scalars(
+        select(Milestone.id).where(Milestone.roadmap_id == roadmap_id, Milestone.id.in_(requested_ids))
+    ).all())
+    missing_ids = requested_ids - found_ids
+    if missing_ids:
+        raise HTTPException(status_code=404, detail=f"Milestones not found in this roadmap: {sorted(missing_ids)}")
+
+    # Fold the operations into one final state per milestone
+    completion_state: Dict[int, bool] = {}
+    field_updates: Dict[int, Dict] = {}
+    for operation in batch.operations:
+        if operation.op in ("complete", "uncomplete"):
+            completion_state[operation.milestone_id] = operation.op == "complete"
+            continue
+        values = field_updates.setdefault(operation.milestone_id, {"id": operation.milestone_id})
+        if operation.op == "set_due_date":
+            values["due_date"] = operation.due_date
+        else:
+            if operation.title is not None:
+                values["title"] = operation.title
+            if operation.description is not None:
+                values["description"] = operation.description
+
+    field_updates = {mid: values for mid, values in field_updates.items() if len(values) > 1}
+    if field_updates:
+        # Bulk UPDATE by primary key, executed as a single executemany
+        db.execute(update(Milestone), list(field_updates.values()))
+
+    completed_at = datetime.now()
+    to_complete = [mid for mid, done in completion_state.items() if done]
+    to_uncomplete = [mid for mid, done in completion_state.items() if not done]
+    newly_completed = newly_uncompleted = 0
+    uncompleted_on: Dict[date, int] = {}
+    if to_complete:
+        newly_completed = len(db.scalars(
+            update(Milestone)
+            .where(Milestone.id.in_(to_complete), Milestone.completed == False)
+            .values(completed=True, completed_at=completed_at)
+            .returning(Milestone.id),
+            execution_options={"synchronize_session": False}
+        ).all())
+    if to_uncomplete:
+        # Read the completion times first; the rollups need the days being removed
+        previous_times = dict(db.execute(
+            select(Milestone.id, Milestone.completed_at)
+            .where(Milestone.id.in_(to_uncomplete), Milestone.completed == True)
+        ).all())
+        uncompleted_ids = db.scalars(
+            update(Milestone)
+            .where(Milestone.id.in_(to_uncomplete), Milestone.completed == True)
+            .values(completed=False, completed_at=None)
+            .returning(Milestone.id),
+            execution_options={"synchronize_session": False}
+        ).all()
+        newly_uncompleted = len(uncompleted_ids)
+        uncompleted_on = count_by_day(previous_times.get(mid) for mid in uncompleted_ids)
+
+    progress = _recompute_progress(db, roadmap_id)
+
+    if newly_completed:
+        user_stats_service.record_event(
+            current_user.id, MILESTONE_COMPLETED, db, count=newly_completed, completed_at=completed_at
+        )
+    if newly_uncompleted:
+        user_stats_service.record_event(
+            current_user.id, MILESTONE_UNCOMPLETED, db, count=newly_uncompleted, completed_on=uncompleted_on
+        )
+    _record_completion_change(current_user.id, db, roadmap_was_completed, progress)
+
+    summary = RoadmapSummary.model_validate(progress)
+    db.commit()
+
+    notification_broker.publish(current_user.id, ROADMAP_PROGRESS, _progress_payload(progress))
+    if newly_completed:
+        achievement_worker.enqueue(current_user.id)
 
-# Get milestone completion statistics by week for analytics
+    return summary
+
+# Get milestone completion statistics for analytics
 @router.get("/analytics/milestones-by-date", response_model=List[Dict])
-def get_milestones_by_date(db: Session = Depends(get_db), current_user: User = Depends(verify_token)):
-    """Get milestone completion counts grouped by week for the current user, including empty weeks"""
-    
-    # Query completed milestones that belong to the current user's roadmaps
-    completed_milestones = db.query(Milestone).join(Roadmap).filter(
-        Roadmap.user_id == current_user.id,
-        Milestone.completed == True,
-        Milestone.completed_at.isnot(None)
-    ).all()
-    
-    # Group milestones by ISO week using Python's isocalendar()
-    stats_dict = {}
-    for milestone in completed_milestones:
-        if milestone.completed_at:
-            # Use ISO week calculation which correctly handles week boundaries
-            iso_year, iso_week, _ = milestone.completed_at.isocalendar()
-            week_key = f"{iso_year}-W{iso_week:02d}"
-            stats_dict[week_key] = stats_dict.get(week_key, 0) + 1
-    
-    # If no completed milestones, show last 4 weeks with zeros
-    if not stats_dict:
-        result = []
-        today = datetime.now().date()
-        for i in range(4):
-            week_start = today - timedelta(days=today.weekday() + (i * 7))
-            year, week_num, _ = week_start.isocalendar()
-            week_display = f"Week {week_num}, {year}"
-            result.insert(0, {
-                "date": week_display,
-                "milestones": 0
-            })
-        return result
-    
-    # Find the range of weeks to display
-    weeks = list(stats_dict.keys())
-    earliest_week = min(weeks)
-    latest_week = max(weeks)
-    
-    # Parse week strings and extend range to current week
-    def parse_week(week_str):
-        year, week_part = week_str.split('-W')
-        return int(year), int(week_part)
-    
-    def week_to_string(year, week):
-        return f"{year}-W{week:02d}"
-    
-    # Get current week using ISO calendar
-    today = datetime.now().date()
-    current_year, current_week_num, _ = today.isocalendar()
-    current_week_str = week_to_string(current_year, current_week_num)
-    
-    # Extend range to current week if needed
-    if current_week_str > latest_week:
-        latest_week = current_week_str
-    
-    earliest_year, earliest_week_num = parse_week(earliest_week)
-    latest_year, latest_week_num = parse_week(latest_week)
-    
-    # Generate all weeks in the range
-    result = []
-    year, week = earliest_year, earliest_week_num
-    
-    while (year < latest_year) or (year == latest_year and week <= latest_week_num):
-        week_string = week_to_string(year, week)
-        milestone_count = stats_dict.get(week_string, 0)
-        
-        # Convert week format to more readable format
-        week_display = f"Week {week}, {year}"
-        
-        result.append({
-            "date": week_display,
-            "milestones": milestone_count
-        })
-        
-        # Move to next week
-        week += 1
-        # Handle year rollover using ISO week dates (can go up to week 53)
-        if week > 53:
-            # Check if week 53 exists in this year by trying to create a date
-            try:
-                # ISO week 53 exists if Jan 1 is Thursday or if it's a leap year and Jan 1 is Wednesday
-                jan1 = datetime(year, 1, 1).date()
-                jan1_weekday = jan1.weekday()  # Monday = 0, Sunday = 6
-                if jan1_weekday == 3 or (jan1_weekday == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)):
-                    # Week 53 exists, continue
-                    pass
-                else:
-                    week = 1
-                    year += 1
-            except:
-                week = 1
-                year += 1
-        elif week == 53:
-            # Check if week 53 exists in this year
-            try:
-                jan1 = datetime(year, 1, 1).date()
-                jan1_weekday = jan1.weekday()
-                if not (jan1_weekday == 3 or (jan1_weekday == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0))):
-                    week = 1
-                    year += 1
-            except:
-                week = 1
-                year += 1
-    
-    return result
+def get_milestones_by_date(
+    granularity: Literal["day", "week", "month"] = Query("week"),
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(verify_token)
+):
+    """Get milestone completion counts per day, ISO week or month for the current user, including empty periods"""
+    # Read from the completion rollups; the user's counters build them on first use
+    user_stats_service.get_stats(current_user.id, db)
+    try:
+        series = analytics_service.get_completion_series(current_user.id, db, granularity, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    return series
 
 # Get recent completed milestones for activity log
 @router.get("/analytics/recent-milestones")
-def get_recent_milestones(limit: int = 20, db: Session = Depends(get_db), current_user: User = Depends(verify_token)):
+def get_recent_milestones(
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(verify_token)
+):
     """Get recent completed milestones for the current user"""
-    
-    # Query recent completed milestones with roadmap info
-    recent_milestones = db.query(Milestone).join(Roadmap).filter(
-        Roadmap.user_id == current_user.id,
-        Milestone.completed == True,
-        Milestone.completed_at.isnot(None)
-    ).order_by(
-        Milestone.completed_at.desc()
-    ).limit(limit).all()
-    
-    # Convert to response format
-    result = []
-    for milestone in recent_milestones:
-        result.append({
-            "id": milestone.id,
-            "title": milestone.title,
-            "description": milestone.description,
-            "completed_at": milestone.completed_at.isoformat() if milestone.completed_at else None,
-            "roadmap": {
-                "id": milestone.roadmap.id,
-                "title": milestone.roadmap.title
-            } if milestone.roadmap else None
-        })
-    
-    return result
\ No newline at end of file
+    # One joined query with only the columns the activity log shows
+    return [
+        {
+            "id": item.id,
+            "title": item.title,
+            "description": item.description,
+            "completed_at": item.occurred_at.isoformat(),
+            "roadmap": item.roadmap.model_dump()
+        }
+        for item in activity_service.get_recent_completions(current_user.id, db, limit)
+    ]
+
+# Get the activity feed (completed milestones, new roadmaps, unlocked achievements)
+@router.get("/analytics/activity", response_model=ActivityPage)
+def get_activity_feed(
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    types: Optional[List[ActivityType]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(verify_token)
+):
+    """Get the current user's activity, newest first. Pass next_cursor back as cursor for the next page."""
+    try:
+        return activity_service.get_feed(current_user.id, db, limit, cursor, types)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,26 @@
+from typing import List, Optional
+
+from app.api.routes_auth import verify_token
+from app.database import get_db
+from app.schemas.search import SearchResult, SearchResultType
+from app.services.principal_service import Principal
+from app.services.search_service import MAX_RESULTS, search_service
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+# Search the user's chat history, milestones and roadmaps
+@router.get("/", response_model=List[SearchResult])
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_RESULTS),
+    types: Optional[List[SearchResultType]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(verify_token)
+):
+    """Full-text search across the current user's data, best matches first"""
+    if not search_service.available:
+        raise HTTPException(status_code=503, detail="Search is not available")
+    return search_service.search(current_user.id, q, db, limit, types)
@@ -1,16 +1,21 @@
+import asyncio
 import re
 from datetime import datetime
 from typing import Optional
 
-from app.api.routes_auth import verify_token
-from app.core.security import get_password_hash, verify_password
+from app.api.routes_auth import (load_current_user,
+                                 password_hashing_unavailable, verify_token)
+from app.core.hashing_worker import PasswordHashingBusyError, password_hasher
 from app.database import get_db
+from app.models.chat_archive import ChatArchiveSegment
 from app.models.chat_message import ChatMessage
 from app.models.milestone import Milestone
 from app.models.roadmap import Roadmap
 from app.models.user import User
-from app.services.rate_limit_service import rate_limit_service
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from app.services.principal_service import Principal, principal_service
+from app.services.rate_limit_service import sensitive_operation_limiter
+from app.services.user_stats_service import PROGRESS_RESET, user_stats_service
+from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr, field_validator
 from sqlalchemy import func
 from sqlalchemy.orm import Session
@@ -81,42 +86,28 @@ class DeleteAccountRequest(BaseModel):
 
 # Get user profile with statistics
 @router.get("/profile", response_model=UserProfileResponse)
-def get_user_profile(current_user: User = Depends(verify_token), db: Session = Depends(get_db)):
+def get_user_profile(current_user: Principal = Depends(verify_token), db: Session = Depends(get_db)):
     """Get user profile with statistics"""
-    # Get roadmap statistics
-    total_roadmaps = db.query(Roadmap).filter(Roadmap.user_id == current_user.id).count()
+    # Counters are maintained per user by the write paths, so this stays one row lookup at most
+    profile_stats = user_stats_service.get_profile_stats(current_user.id, db)
     
-    # Get milestone statistics
-    total_milestones = db.query(Milestone).join(Roadmap).filter(Roadmap.user_id == current_user.id).count()
-    completed_milestones = db.query(Milestone).join(Roadmap).filter(
-        Roadmap.user_id == current_user.id,
-        Milestone.completed == True
-    ).count()
-    
-    # Get completed roadmaps count (roadmaps where completed_milestones equals total_milestones and total_milestones > 0)
-    completed_roadmaps = db.query(Roadmap).filter(
-        Roadmap.user_id == current_user.id,
-        Roadmap.total_milestones > 0,
-        Roadmap.completed_milestones == Roadmap.total_milestones
-    ).count()
-    
-    return UserProfileResponse(
+    response = UserProfileResponse(
         id=current_user.id,
         name=current_user.name,
         email=current_user.email,
         avatar=current_user.avatar,
         joined_at=current_user.joined_at,
-        total_roadmaps=total_roadmaps,
-        total_milestones=total_milestones,
-        completed_milestones=completed_milestones,
-        completed_roadmaps=completed_roadmaps
+        **profile_stats
     )
+    # Persist the counters row if this was its first use
+    db.commit()
+    return response
 
 # Update user profile
 @router.put("/profile")
 def update_user_profile(
     profile_data: UpdateProfileRequest,
-    current_user: User = Depends(verify_token),
+    current_user: User = Depends(load_current_user),
     db: Session = Depends(get_db)
 ):
     """Update user profile information"""
@@ -142,6 +133,7 @@ def update_user_profile(
         current_user.avatar = profile_data.avatar
     
     db.commit()
+    principal_service.invalidate(current_user.id)
     db.refresh(current_user)
     
     return {
@@ -155,52 +147,38 @@ def update_user_profile(
     }
 
 # Rate limiting dependency for sensitive operations
-def check_user_rate_limit(request: Request, current_user: User = Depends(verify_token)):
+async def check_user_rate_limit(current_user: Principal = Depends(verify_token)) -> Principal:
     """Check rate limit for user operations (more restrictive for sensitive ops)"""
-    # Use a separate, more restrictive rate limit for sensitive operations
-    user_requests = getattr(rate_limit_service, 'user_sensitive_requests', {})
-    if current_user.id not in user_requests:
-        user_requests[current_user.id] = []
-    
-    # Allow max 10 sensitive operations per hour
-    import time
-    current_time = time.time()
-    one_hour_ago = current_time - 3600
-    
-    # Clean old requests
-    user_requests[current_user.id] = [
-        req_time for req_time in user_requests[current_user.id] 
-        if req_time > one_hour_ago
-    ]
-    
-    if len(user_requests[current_user.id]) >= 10:
+    decision = await sensitive_operation_limiter.acquire(current_user.id)
+    if not decision.allowed:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Too many sensitive operations. Please try again later."
+            detail="Too many sensitive operations. Please try again later.",
+            headers=decision.headers()
         )
-    
-    # Add current request
-    user_requests[current_user.id].append(current_time)
-    rate_limit_service.user_sensitive_requests = user_requests
-    
     return current_user
 
+def load_user_for_sensitive_operation(
+    current_user: Principal = Depends(check_user_rate_limit),
+    db: Session = Depends(get_db)
+) -> User:
+    """Rate-limited load of the user's ORM row, for operations on credentials or the account"""
+    return load_current_user(current_user, db)
+
+def delete_user_and_data(db: Session, user: User):
+    """Delete a user and everything it owns; cascades load the related rows, so async routes run it in a thread"""
+    db.delete(user)
+    db.commit()
+
 # Change password
 @router.put("/change-password")
-def change_password(
+async def change_password(
     password_data: ChangePasswordRequest,
-    current_user: User = Depends(check_user_rate_limit),
+    current_user: User = Depends(load_user_for_sensitive_operation),
     db: Session = Depends(get_db)
 ):
     """Change user password"""
     
-    # Verify current password
-    if not verify_password(password_data.current_password, str(current_user.hashed_password)):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Current password is incorrect"
-        )
-    
     # Validate new password (basic validation)
     if len(password_data.new_password) < 6:
         raise HTTPException(
@@ -208,16 +186,28 @@ def change_password(
             detail="New password must be at least 6 characters long"
         )
     
-    # Hash and update password
-    current_user.hashed_password = get_password_hash(password_data.new_password)
-    db.commit()
+    try:
+        # Verify current password
+        if not await password_hasher.verify(password_data.current_password, str(current_user.hashed_password)):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Current password is incorrect"
+            )
+        
+        # Hash and update password
+        current_user.hashed_password = await password_hasher.hash(password_data.new_password)
+    except PasswordHashingBusyError:
+        raise password_hashing_unavailable()
+    user_id = current_user.id
+    await asyncio.to_thread(db.commit)
+    principal_service.invalidate(user_id)
     
     return {"message": "Password changed successfully"}
 
 # Reset all progress
 @router.delete("/reset-progress")
 def reset_user_progress(
-    current_user: User = Depends(check_user_rate_limit),
+    current_user: Principal = Depends(check_user_rate_limit),
     db: Session = Depends(get_db)
 ):
     """Reset all user progress (delete all roadmaps, milestones, and chat messages)"""
@@ -225,6 +215,7 @@ def reset_user_progress(
     try:
         # Delete all chat messages
         db.query(ChatMessage).filter(ChatMessage.user_id == current_user.id).delete()
+        db.query(ChatArchiveSegment).filter(ChatArchiveSegment.user_id == current_user.id).delete()
         
         # Delete all milestones (will be deleted via cascade, but being explicit)
         milestone_ids = db.query(Milestone.id).join(Roadmap).filter(Roadmap.user_id == current_user.id).subquery()
@@ -232,6 +223,8 @@ def reset_user_progress(
         
         # Delete all roadmaps
         db.query(Roadmap).filter(Roadmap.user_id == current_user.id).delete()
+
+        user_stats_service.record_event(current_user.id, PROGRESS_RESET, db)
         
         db.commit()
         
@@ -246,15 +239,19 @@ def reset_user_progress(
 
 # Delete account
 @router.delete("/account")
-def delete_user_account(
+async def delete_user_account(
     delete_data: DeleteAccountRequest,
-    current_user: User = Depends(check_user_rate_limit),
+    current_user: User = Depends(load_user_for_sensitive_operation),
     db: Session = Depends(get_db)
 ):
     """Delete user account permanently"""
     
     # Verify password for security
-    if not verify_password(delete_data.password, str(current_user.hashed_password)):
+    try:
+        password_ok = await password_hasher.verify(delete_data.password, str(current_user.hashed_password))
+    except PasswordHashingBusyError:
+        raise password_hashing_unavailable()
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password is incorrect"
@@ -262,13 +259,14 @@ def delete_user_account(
     
     try:
         # Delete all related data (handled by cascade relationships)
-        db.delete(current_user)
-        db.commit()
+        user_id = current_user.id
+        await asyncio.to_thread(delete_user_and_data, db, current_user)
+        principal_service.invalidate(user_id)
         
         return {"message": "Account deleted successfully"}
     
     except Exception as e:
-        db.rollback()
+        await asyncio.to_thread(db.rollback)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to delete account"
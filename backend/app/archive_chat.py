@@ -0,0 +1,77 @@
+"""
+Move old chat messages into compressed archive segments.
+
+Messages older than the cutoff are grouped per roadmap into segments of consecutive
+messages, compressed with zlib (or zstd when the zstandard package is installed) and
+removed from chat_messages. Chat history and search keep returning them.
+Each segment is its own transaction, so an interrupted run can simply be started again.
+
+Usage:
+    python -m app.archive_chat                            # messages older than CHAT_ARCHIVE_AFTER_DAYS
+    python -m app.archive_chat --older-than-days 30 --segment-size 500 --vacuum
+    python -m app.archive_chat --rebuild-search-index     # refill search, archived messages included
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.database import SessionLocal, engine
+from app.services.chat_archive_service import chat_archive_service
+from sqlalchemy import text
+
+def archive(older_than_days: int, segment_size: int, vacuum: bool):
+    # Chat timestamps are stored in UTC
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=older_than_days)
+    print(f"Archiving chat messages older than {cutoff:%Y-%m-%d %H:%M} UTC "
+          f"({segment_size} per segment, {chat_archive_service.codec})")
+
+    db = SessionLocal()
+    try:
+        started = time.monotonic()
+        roadmaps = messages_total = raw_total = compressed_total = 0
+        for roadmap_id, messages, raw_bytes, compressed_bytes in chat_archive_service.archive_older_than(cutoff, segment_size, db):
+            roadmaps += 1
+            messages_total += messages
+            raw_total += raw_bytes
+            compressed_total += compressed_bytes
+            print(f"  roadmap {roadmap_id}: {messages} messages, {raw_bytes} -> {compressed_bytes} bytes")
+
+        elapsed = time.monotonic() - started
+        ratio = raw_total / compressed_total if compressed_total else 0
+        print(f"Archive finished: {messages_total} messages from {roadmaps} roadmaps in {elapsed:.2f}s, "
+              f"{raw_total} -> {compressed_total} bytes ({ratio:.1f}x)")
+        print(f"Archived messages in total: {chat_archive_service.archived_count(db)}")
+    finally:
+        db.close()
+
+    if vacuum and engine.dialect.name == "sqlite":
+        # Give the freed pages back to the file system
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM"))
+        print("Database vacuumed")
+
+def rebuild_search_index():
+    db = SessionLocal()
+    try:
+        started = time.monotonic()
+        chat_archive_service.rebuild_search_index(db)
+        print(f"Search index rebuilt in {time.monotonic() - started:.2f}s")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old chat messages into compressed segments")
+    parser.add_argument("--older-than-days", type=int, default=settings.chat_archive_after_days,
+                        help="Archive messages older than this many days")
+    parser.add_argument("--segment-size", type=int, default=settings.chat_archive_segment_size,
+                        help="Messages per compressed segment")
+    parser.add_argument("--vacuum", action="store_true", help="Run VACUUM afterwards (SQLite)")
+    parser.add_argument("--rebuild-search-index", action="store_true",
+                        help="Rebuild the search index from live and archived messages instead of archiving")
+    args = parser.parse_args()
+    if args.rebuild_search_index:
+        rebuild_search_index()
+    else:
+        archive(max(0, args.older_than_days), max(1, args.segment_size), args.vacuum)
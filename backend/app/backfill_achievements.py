@@ -0,0 +1,227 @@
+"""
+Backfill achievements for existing users.
+
+Evaluates achievements across all users in chunks of user IDs with one set-based
+INSERT ... SELECT per achievement and chunk, against the user_stats counters.
+Progress is checkpointed after every chunk so an interrupted run resumes where it stopped.
+
+Usage:
+    python -m app.backfill_achievements                      # every achievement
+    python -m app.backfill_achievements -a "Goal Achiever" -a 7 --chunk-size 5000
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from typing import List, Optional
+
+from app.database import SessionLocal
+from app.models import (Achievement, Milestone, MilestoneRollup, Roadmap,
+                        User, UserAchievement, UserStats)
+from app.services.achievement_service import (CONDITION_COUNTERS,
+                                              CONDITION_DEFAULTS)
+from app.services.analytics_service import month_start, week_start
+from app.services.user_stats_service import compute_streaks
+from sqlalchemy import (and_, case, delete, exists, false, func, insert,
+                        literal, select, update)
+from sqlalchemy.orm import Session
+
+DEFAULT_CHECKPOINT = ".achievement_backfill.json"
+
+def resolve_achievements(db: Session, selectors: List[str]) -> List[Achievement]:
+    """Look up achievements by ID or title; no selectors means all of them"""
+    if not selectors:
+        return db.query(Achievement).order_by(Achievement.id).all()
+    achievements = []
+    for selector in selectors:
+        query = db.query(Achievement)
+        achievement = (query.filter(Achievement.id == int(selector)) if selector.isdigit()
+                       else query.filter(Achievement.title == selector)).first()
+        if achievement is None:
+            raise SystemExit(f"Unknown achievement: {selector}")
+        achievements.append(achievement)
+    return achievements
+
+def load_checkpoint(path: str, achievement_ids: List[int]) -> int:
+    """Get the last processed user ID for this set of achievements"""
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("achievement_ids") != achievement_ids:
+        return 0
+    return checkpoint.get("last_user_id", 0)
+
+def save_checkpoint(path: str, achievement_ids: List[int], last_user_id: int):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"achievement_ids": achievement_ids, "last_user_id": last_user_id}, f)
+    os.replace(tmp_path, path)
+
+def next_chunk_end(db: Session, after_user_id: int, chunk_size: int) -> Optional[int]:
+    """Get the highest user ID in the next chunk, or None when done"""
+    boundary = db.execute(
+        select(User.id).where(User.id > after_user_id).order_by(User.id).offset(chunk_size - 1).limit(1)
+    ).scalar()
+    if boundary is not None:
+        return boundary
+    return db.execute(select(func.max(User.id)).where(User.id > after_user_id)).scalar()
+
+def ensure_stats_rows(db: Session, low: int, high: int):
+    """
+    Build counters and rollups for users in the chunk that don't have a user_stats row yet,
+    with a fixed number of statements per chunk instead of one rebuild per user.
+    """
+    in_chunk = and_(User.id > low, User.id <= high)
+    missing = ~exists().where(UserStats.user_id == User.id)
+    missing_ids = select(User.id).where(in_chunk, missing)
+
+    # Completion days of the missing users, for streaks and rollups
+    completed_on = func.date(Milestone.completed_at)
+    completion_days = defaultdict(dict)
+    for user_id, day, count in db.execute(
+        select(Roadmap.user_id, completed_on, func.count(Milestone.id))
+        .join(Milestone, Milestone.roadmap_id == Roadmap.id)
+        .where(
+            Roadmap.user_id.in_(missing_ids),
+            Milestone.completed == True,
+            Milestone.completed_at.isnot(None)
+        )
+        .group_by(Roadmap.user_id, completed_on)
+        .order_by(Roadmap.user_id, completed_on)
+    ).all():
+        completion_days[user_id][date.fromisoformat(day) if isinstance(day, str) else day] = count
+
+    # Leftover rollups of users without counters are rebuilt below
+    db.execute(delete(MilestoneRollup).where(MilestoneRollup.user_id.in_(missing_ids)),
+               execution_options={"synchronize_session": False})
+
+    roadmaps = select(
+        Roadmap.user_id,
+        func.count(Roadmap.id).label("roadmap_count"),
+        func.sum(case(
+            ((Roadmap.total_milestones > 0) & (Roadmap.completed_milestones == Roadmap.total_milestones), 1),
+            else_=0
+        )).label("roadmaps_completed"),
+        func.count(func.distinct(Roadmap.field)).label("distinct_fields"),
+    ).where(Roadmap.user_id > low, Roadmap.user_id <= high).group_by(Roadmap.user_id).subquery()
+    milestones = select(
+        Roadmap.user_id,
+        func.count(Milestone.id).label("milestones_total"),
+        func.sum(case((Milestone.completed == True, 1), else_=0)).label("milestones_completed"),
+    ).join(Milestone, Milestone.roadmap_id == Roadmap.id).where(
+        Roadmap.user_id > low, Roadmap.user_id <= high
+    ).group_by(Roadmap.user_id).subquery()
+    db.execute(insert(UserStats).from_select(
+        ["user_id", "roadmap_count", "roadmaps_completed", "distinct_fields",
+         "milestones_total", "milestones_completed", "current_streak", "longest_streak"],
+        select(
+            User.id,
+            func.coalesce(roadmaps.c.roadmap_count, 0),
+            func.coalesce(roadmaps.c.roadmaps_completed, 0),
+            func.coalesce(roadmaps.c.distinct_fields, 0),
+            func.coalesce(milestones.c.milestones_total, 0),
+            func.coalesce(milestones.c.milestones_completed, 0),
+            literal(0),
+            literal(0),
+        )
+        .outerjoin(roadmaps, roadmaps.c.user_id == User.id)
+        .outerjoin(milestones, milestones.c.user_id == User.id)
+        .where(in_chunk, missing)
+    ))
+
+    if completion_days:
+        streaks = []
+        rollups = []
+        for user_id, days in completion_days.items():
+            current, longest, last = compute_streaks(days)
+            streaks.append({"user_id": user_id, "current_streak": current,
+                            "longest_streak": longest, "last_completion_date": last})
+            rollups.extend(
+                {"user_id": user_id, "day": day, "week_start": week_start(day),
+                 "month_start": month_start(day), "completed_count": count}
+                for day, count in days.items()
+            )
+        db.execute(update(UserStats), streaks)
+        db.execute(insert(MilestoneRollup), rollups)
+
+def award_chunk(db: Session, achievement: Achievement, low: int, high: int, unlocked_at: datetime) -> int:
+    """Award one achievement to every qualifying user in (low, high]. Returns the number of awards."""
+    not_awarded = ~exists().where(
+        UserAchievement.user_id == User.id,
+        UserAchievement.achievement_id == achievement.id
+    )
+    eligible = select(
+        User.id, literal(achievement.id), literal(unlocked_at), false()
+    ).where(User.id > low, User.id <= high, not_awarded)
+
+    if achievement.condition_type != "join_date":
+        counter = CONDITION_COUNTERS.get(achievement.condition_type)
+        if counter is None:
+            return 0
+        required = achievement.condition_value or CONDITION_DEFAULTS.get(achievement.condition_type, 1)
+        eligible = eligible.join(UserStats, and_(
+            UserStats.user_id == User.id,
+            getattr(UserStats, counter) >= required
+        ))
+
+    result = db.execute(insert(UserAchievement).from_select(
+        ["user_id", "achievement_id", "unlocked_at", "is_notified"], eligible
+    ))
+    return result.rowcount or 0
+
+def backfill(selectors: List[str], chunk_size: int, checkpoint_path: str, restart: bool):
+    db = SessionLocal()
+    try:
+        achievements = resolve_achievements(db, selectors)
+        achievement_ids = [a.id for a in achievements]
+        last_user_id = 0 if restart else load_checkpoint(checkpoint_path, achievement_ids)
+        if last_user_id:
+            print(f"Resuming after user {last_user_id}")
+        print(f"Backfilling {len(achievements)} achievement(s): {', '.join(a.title for a in achievements)}")
+
+        started = time.monotonic()
+        users_done = 0
+        awards_total = 0
+        while True:
+            chunk_end = next_chunk_end(db, last_user_id, chunk_size)
+            if chunk_end is None:
+                break
+            chunk_started = time.monotonic()
+            users_in_chunk = db.execute(
+                select(func.count(User.id)).where(User.id > last_user_id, User.id <= chunk_end)
+            ).scalar()
+
+            ensure_stats_rows(db, last_user_id, chunk_end)
+            unlocked_at = datetime.now()
+            awards = sum(award_chunk(db, a, last_user_id, chunk_end, unlocked_at) for a in achievements)
+            db.commit()
+
+            last_user_id = chunk_end
+            save_checkpoint(checkpoint_path, achievement_ids, last_user_id)
+            users_done += users_in_chunk
+            awards_total += awards
+            elapsed = time.monotonic() - chunk_started
+            print(f"  users <= {chunk_end}: {users_in_chunk} users, {awards} awards "
+                  f"({users_in_chunk / elapsed if elapsed else 0:.0f} users/s)")
+
+        elapsed = time.monotonic() - started
+        print(f"Backfill finished: {users_done} users, {awards_total} awards in {elapsed:.2f}s "
+              f"({users_done / elapsed if elapsed else 0:.0f} users/s)")
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill achievements for existing users")
+    parser.add_argument("-a", "--achievement", action="append", default=[],
+                        help="Achievement ID or title (repeatable, defaults to all)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Users per chunk")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file path")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+    backfill(args.achievement, max(1, args.chunk_size), args.checkpoint, args.restart)
@@ -48,6 +48,12 @@ class Settings(BaseSettings):
         """Get CORS origins as a list"""
         return [origin.strip() for origin in self.cors_origins_str.split(",")]
     
+    # Reverse proxy: X-Forwarded-For is only trusted from these addresses (comma-separated IPs or
+    # networks, "*" for any). Uvicorn reads the same FORWARDED_ALLOW_IPS variable.
+    forwarded_allow_ips: str = "127.0.0.1"
+    # Bearer token for the /metrics endpoints; without it only loopback clients may read them
+    metrics_token: Optional[str] = None
+    
     # AI/LLM Settings - Primary Provider: Google Gemini
     google_ai_api_key: Optional[str] = None
     gemini_model: str = "gemini-2.0-flash"
@@ -78,6 +84,20 @@ class Settings(BaseSettings):
     ai_requests_per_minute: int = 10
     ai_requests_per_hour: int = 100
     ai_requests_per_day: int = 500
+    ai_tokens_per_day: int = 200000  # LLM tokens per user and day, reserved before and settled after each call
+    ai_chat_reply_token_estimate: int = 500  # Reserved for a chat reply until its actual size is known
+    sensitive_operations_per_hour: int = 10  # Password changes and account deletions
+    rate_limit_max_tracked_users: int = 100000  # In-memory limiter entries per worker (idle users are dropped)
+    
+    # Login protection
+    login_max_failures_per_ip: int = 20  # Failed logins from one IP address per window
+    login_max_failures_per_email: int = 5  # Failed logins for one account per window
+    login_failure_window_seconds: int = 900
+    login_max_tracked_keys: int = 100000  # IP addresses and accounts with recent failures kept per worker (or host)
+    
+    # Password hashing
+    password_hash_workers: int = 2  # Processes doing bcrypt work
+    password_hash_max_pending: int = 64  # Jobs waiting for a worker before new ones are rejected
     
     # AI Safety and Security
     max_conversation_length: int = 50
@@ -93,6 +113,38 @@ class Settings(BaseSettings):
     enable_conversation_memory: bool = True
     conversation_context_limit: int = 5
     
+    # Background work
+    achievement_batch_window_ms: int = 200  # Window for coalescing achievement checks per user
+    chat_write_buffer_enabled: bool = False  # Batch chat message inserts from all requests into shared commits
+    chat_write_flush_ms: int = 10  # How long the buffer collects messages before committing
+    chat_write_batch_size: int = 200  # Commit early once this many messages are collected
+    chat_write_max_pending: int = 1000  # Queued requests before writers wait for room
+    
+    # Chat archive
+    chat_archive_after_days: int = 90  # Messages older than this move to compressed segments
+    chat_archive_segment_size: int = 200  # Messages per compressed segment
+    chat_archive_codec: str = "zlib"  # "zlib" or "zstd" (needs the zstandard package)
+    
+    # Caching
+    profile_stats_cache_ttl_seconds: int = 30  # Per-user profile counters, dropped on every write
+    principal_cache_ttl_seconds: int = 30  # Authenticated user lookups, dropped on profile changes
+    achievement_catalog_ttl_seconds: int = 60  # Catalog changes made by scripts or other workers show up within this time
+    
+    # Shared memory: rate limits and small caches shared by the worker processes on a host
+    shared_memory_dir: Optional[str] = None  # e.g. /dev/shm/pathyvo; unset means per-process storage
+    
+    # Redis (rate limiting, caches and notifications); unset means in-process storage
+    redis_url: Optional[str] = None  # e.g. redis://localhost:6379/0
+    redis_socket_timeout_seconds: float = 0.5
+    redis_circuit_failure_threshold: int = 5  # Consecutive failures before Redis is bypassed
+    redis_circuit_reset_seconds: float = 30  # How long Redis is bypassed before it is tried again
+    
+    # Notifications
+    notification_backend: str = "memory"  # "memory" or "redis" (needs REDIS_URL; needed with several workers)
+    notification_history_size: int = 100  # Events kept per user for resuming streams
+    notification_history_users: int = 10000  # Users whose recent events are kept (least recently notified dropped first)
+    notification_stream_token_ttl_seconds: int = 60  # Lifetime of ?stream_token= for EventSource
+    
 
 
 settings = Settings()
@@ -0,0 +1,123 @@
+"""
+Password hashing on a dedicated process pool.
+bcrypt is slow on purpose, so running it in request threads lets a burst of logins take the
+whole threadpool. Routes await hashes computed by a small pool of worker processes instead,
+and the number of jobs waiting for a worker is capped so excess work is rejected, not queued.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from app.core.config import settings
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHashingBusyError(Exception):
+    """Raised when too many hashing jobs are already waiting for a worker"""
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing and verification on a size-limited process pool"""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        # Metrics
+        self._completed = 0
+        self._rejected = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+        self._peak_pending = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._executor is not None
+
+    def start(self):
+        """Start the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            # spawn: forking a process that already runs threads can deadlock the children
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        logger.info(f"Password hashing pool started with {self.workers} worker(s)")
+
+    def stop(self):
+        """Stop the worker processes after finishing the jobs already submitted"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+            logger.info("Password hashing pool stopped")
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, plain_password, hashed_password)
+
+    async def _run(self, function, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_pending:
+                self._rejected += 1
+                raise PasswordHashingBusyError("Too many password hashing jobs are waiting")
+            self._pending += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+            executor = self._executor
+
+        started = time.perf_counter()
+        try:
+            if executor is None:
+                # Without a running pool (scripts, tests) hash in a thread
+                return await asyncio.to_thread(function, *args)
+            return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+                self._total_seconds += elapsed
+                self._max_seconds = max(self._max_seconds, elapsed)
+
+    def metrics(self) -> Dict:
+        """Queue depth and latency (including the wait for a worker) since startup"""
+        with self._lock:
+            return {
+                "running": self._executor is not None,
+                "workers": self.workers,
+                "in_progress": min(self._pending, self.workers),
+                "queued": max(0, self._pending - self.workers),
+                "max_queued": self.max_pending,
+                "peak_queued": max(0, self._peak_pending - self.workers),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_latency_ms": round(self._total_seconds / self._completed * 1000, 2) if self._completed else 0.0,
+                "max_latency_ms": round(self._max_seconds * 1000, 2),
+            }
+
+
+# Global instance
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_max_pending)
@@ -0,0 +1,160 @@
+"""
+The application's shared Redis connection.
+One lazily created async client with its own connection pool is shared by the rate limiter,
+the notification broker and any cache layers. Nothing connects at import time, and the pool reconnects by itself.
+A circuit breaker stops sending commands for a while after repeated failures, so an outage
+costs callers one fast error instead of a socket timeout per request.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:
+    aioredis = None
+    RedisError = Exception
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class RedisUnavailableError(Exception):
+    """Raised instead of calling Redis while it is not configured or the circuit is open"""
+
+
+class RedisConnection:
+    """Shared async Redis client behind a circuit breaker"""
+
+    def __init__(self, url: Optional[str], socket_timeout: float, failure_threshold: int, reset_seconds: float):
+        self.url = url
+        self.socket_timeout = socket_timeout
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._client = None
+        self._scripts: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        if url and aioredis is None:
+            logger.warning("REDIS_URL is set but the redis package is not installed")
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.url) and aioredis is not None
+
+    @property
+    def available(self) -> bool:
+        """Whether a command would currently be sent (configured and the circuit lets it through)"""
+        return self.configured and (self._state != OPEN or time.monotonic() - self._opened_at >= self.reset_seconds)
+
+    @property
+    def client(self):
+        """The shared client; created on first use, connections are opened on demand"""
+        if not self.configured:
+            raise RedisUnavailableError("Redis is not configured")
+        with self._lock:
+            if self._client is None:
+                self._client = aioredis.Redis.from_url(
+                    self.url,
+                    decode_responses=True,
+                    socket_timeout=self.socket_timeout,
+                    socket_connect_timeout=self.socket_timeout,
+                    health_check_interval=30
+                )
+            return self._client
+
+    def script(self, source: str):
+        """A Lua script registered on the shared client (EVALSHA, falling back to EVAL)"""
+        client = self.client
+        with self._lock:
+            script = self._scripts.get(source)
+            if script is None:
+                script = self._scripts[source] = client.register_script(source)
+            return script
+
+    async def execute(self, operation: Callable[[object], Awaitable[T]]) -> T:
+        """Run an operation with the client, tracking failures for the circuit breaker"""
+        self._before_call()
+        try:
+            result = await operation(self.client)
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            self._record_failure(e)
+            raise RedisUnavailableError(str(e)) from e
+        except BaseException:
+            # Not a Redis failure (e.g. cancellation); let the next request probe again
+            with self._lock:
+                self._trial_running = False
+            raise
+        self._record_success()
+        return result
+
+    def _before_call(self):
+        if not self.configured:
+            raise RedisUnavailableError("Redis is not configured")
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                # Let one request find out whether Redis is back
+                self._state = HALF_OPEN
+                self._trial_running = False
+            if self._state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            raise RedisUnavailableError("Redis circuit is open")
+
+    def _record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Redis reachable again, closing the circuit")
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def _record_failure(self, error: Exception):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f"Redis unavailable, opening the circuit for {self.reset_seconds}s: {error}")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    async def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+            self._scripts.clear()
+        if client is not None:
+            await client.aclose()
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "configured": self.configured,
+                "circuit": self._state,
+                "consecutive_failures": self._failures,
+            }
+
+
+# Global instance
+redis_connection = RedisConnection(
+    settings.redis_url,
+    settings.redis_socket_timeout_seconds,
+    settings.redis_circuit_failure_threshold,
+    settings.redis_circuit_reset_seconds
+)
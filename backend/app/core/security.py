@@ -2,16 +2,13 @@ import html
 import re
 
 from app.core.config import settings
+from app.core.hashing_worker import pwd_context
 from app.models.user import User
-from app.services.rate_limit_service import RateLimitService
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.responses import Response
-from passlib.context import CryptContext
 from starlette.middleware.base import BaseHTTPMiddleware
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-rate_limit_service = RateLimitService()
-
+# Synchronous variants for scripts; routes await password_hasher instead
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -0,0 +1,237 @@
+"""
+Fixed-size hash tables in memory-mapped files, shared by the worker processes on one host.
+With several uvicorn workers and no Redis, per-process rate limits and caches multiply by
+the number of workers. A table in a file under SHARED_MEMORY_DIR (ideally on tmpfs, such as
+/dev/shm) gives every worker the same state. Each slot holds a key digest, an expiry time
+and a value of bounded size; keys are placed by open addressing with linear probing, and an
+expired slot is free again. Operations take a lock shared across processes (flock).
+Threads wait for it in the kernel; coroutines use run_locked, which polls it without
+blocking and sleeps on the event loop while another process holds it.
+"""
+
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MAGIC = b"PTHYSHM1"
+FILE_HEADER = struct.Struct("<8sII")  # magic, slots, value size
+FILE_HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<B3xI16sd")  # state, value length, key digest, expires at
+
+EMPTY = 0
+USED = 1
+DELETED = 2
+
+T = TypeVar("T")
+
+# Pauses of run_locked between attempts to take a contended lock, growing to 1 ms
+LOCK_BACKOFF_SECONDS = (0.0, 0.0, 0.00005, 0.0002, 0.001)
+
+
+class SharedMemoryTable:
+    """Open-addressing table of expiring entries in a memory-mapped file"""
+
+    def __init__(self, path: str, slots: int, value_size: int, max_probe: int = 32):
+        self.path = path
+        self.slots = max(1, slots)
+        self.value_size = (max(1, value_size) + 7) // 8 * 8
+        self.slot_size = SLOT_HEADER.size + self.value_size
+        self.max_probe = min(max_probe, self.slots)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._pid = os.getpid()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        # Metrics of this process
+        self.evicted_expired = 0
+        self.evicted_live = 0
+
+        size = FILE_HEADER_SIZE + self.slots * self.slot_size
+        with self.locked():
+            # The first process to get here creates the table
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, FILE_HEADER.pack(MAGIC, self.slots, self.value_size), 0)
+            header = os.pread(self._fd, FILE_HEADER.size, 0)
+            compatible = len(header) == FILE_HEADER.size and FILE_HEADER.unpack(header) == (MAGIC, self.slots, self.value_size)
+            if compatible:
+                self._map = mmap.mmap(self._fd, size)
+        if not compatible:
+            os.close(self._fd)
+            raise ValueError(f"{path} has a different layout")
+
+    @contextmanager
+    def locked(self):
+        """Hold the table's lock across several operations (reentrant; blocks the calling thread while contended)"""
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                self._reopen_after_fork()
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                self._lock.release()
+                raise
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def run_locked(self, operation: Callable[[], T]) -> T:
+        """
+        Run operation (synchronous table calls) under the lock without blocking the event loop:
+        while another thread or process holds the lock, wait with asyncio.sleep and try again.
+        """
+        attempt = 0
+        while not self._try_lock():
+            await asyncio.sleep(LOCK_BACKOFF_SECONDS[min(attempt, len(LOCK_BACKOFF_SECONDS) - 1)])
+            attempt += 1
+        try:
+            return operation()
+        finally:
+            self._release()
+
+    def _try_lock(self) -> bool:
+        if not self._lock.acquire(blocking=False):
+            return False
+        if self._depth == 0:
+            self._reopen_after_fork()
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._lock.release()
+                return False
+        self._depth += 1
+        return True
+
+    def _release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+    def _reopen_after_fork(self):
+        if self._pid != os.getpid():
+            # A forked child shares the parent's file description, and with it the flock
+            self._fd = os.open(self.path, os.O_RDWR)
+            self._pid = os.getpid()
+
+    @staticmethod
+    def digest(key: bytes) -> bytes:
+        return hashlib.blake2b(key, digest_size=16).digest()
+
+    def _offset(self, slot: int) -> int:
+        return FILE_HEADER_SIZE + slot * self.slot_size
+
+    def _find(self, digest: bytes, now: float) -> Tuple[Optional[int], Optional[int]]:
+        """(slot holding the live key or None, slot a new entry for the key should take)"""
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        free = None
+        oldest = None
+        oldest_expiry = 0.0
+        for i in range(self.max_probe):
+            slot = (start + i) % self.slots
+            state, _length, slot_digest, expires_at = SLOT_HEADER.unpack_from(self._map, self._offset(slot))
+            if state == EMPTY:
+                return None, free if free is not None else slot
+            if state == USED and slot_digest == digest:
+                return (slot, slot) if expires_at > now else (None, slot)
+            if state == DELETED or expires_at <= now:
+                if free is None:
+                    free = slot
+            elif oldest is None or expires_at < oldest_expiry:
+                oldest, oldest_expiry = slot, expires_at
+        # No free slot in the key's probe range: replace the entry closest to expiring
+        return None, free if free is not None else oldest
+
+    def get(self, key: bytes, now: float) -> Optional[bytes]:
+        """The key's value, or None if it is missing or expired"""
+        digest = self.digest(key)
+        with self.locked():
+            slot, _target = self._find(digest, now)
+            if slot is None:
+                return None
+            offset = self._offset(slot)
+            length = SLOT_HEADER.unpack_from(self._map, offset)[1]
+            start = offset + SLOT_HEADER.size
+            return self._map[start:start + length]
+
+    def put(self, key: bytes, value: bytes, expires_at: float, now: float):
+        """Store a value until expires_at; values larger than value_size are rejected"""
+        if len(value) > self.value_size:
+            raise ValueError(f"Value of {len(value)} bytes exceeds the slot size of {self.value_size}")
+        digest = self.digest(key)
+        with self.locked():
+            slot, target = self._find(digest, now)
+            offset = self._offset(target)
+            if slot is None:
+                state, _length, _digest, old_expiry = SLOT_HEADER.unpack_from(self._map, offset)
+                if state == USED and old_expiry > now:
+                    self.evicted_live += 1
+                elif state == USED:
+                    self.evicted_expired += 1
+            SLOT_HEADER.pack_into(self._map, offset, USED, len(value), digest, expires_at)
+            start = offset + SLOT_HEADER.size
+            self._map[start:start + len(value)] = value
+
+    def delete(self, key: bytes):
+        digest = self.digest(key)
+        with self.locked():
+            start = int.from_bytes(digest[:8], "little") % self.slots
+            for i in range(self.max_probe):
+                slot = (start + i) % self.slots
+                offset = self._offset(slot)
+                state, _length, slot_digest, _expires_at = SLOT_HEADER.unpack_from(self._map, offset)
+                if state == EMPTY:
+                    return
+                if state == USED and slot_digest == digest:
+                    # Keep the probe chain intact for keys placed after this one
+                    SLOT_HEADER.pack_into(self._map, offset, DELETED, 0, bytes(16), 0.0)
+                    return
+
+    def items(self, now: float) -> Iterator[Tuple[bytes, float, bytes]]:
+        """(key digest, expires at, value) of every live entry"""
+        with self.locked():
+            entries = []
+            for slot in range(self.slots):
+                offset = self._offset(slot)
+                state, length, digest, expires_at = SLOT_HEADER.unpack_from(self._map, offset)
+                if state == USED and expires_at > now:
+                    start = offset + SLOT_HEADER.size
+                    entries.append((digest, expires_at, self._map[start:start + length]))
+        return iter(entries)
+
+    def clear(self):
+        with self.locked():
+            self._map[FILE_HEADER_SIZE:] = bytes(self.slots * self.slot_size)
+
+
+def open_shared_table(name: str, slots: int, value_size: int) -> Optional[SharedMemoryTable]:
+    """The named table in SHARED_MEMORY_DIR, or None if shared memory is not configured or available"""
+    if not settings.shared_memory_dir:
+        return None
+    if fcntl is None:
+        logger.warning("SHARED_MEMORY_DIR is set but file locking is not available on this platform")
+        return None
+    # The layout is part of the name, so changing the sizes starts a new table
+    path = os.path.join(settings.shared_memory_dir, f"{name}-{slots}x{value_size}.table")
+    try:
+        os.makedirs(settings.shared_memory_dir, mode=0o700, exist_ok=True)
+        return SharedMemoryTable(path, slots, value_size)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Shared memory table {path} unavailable, using per-process storage: {e}")
+        return None
@@ -2,8 +2,10 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# SQLite veritabanı dosyası (backend klasöründe oluşur)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./mentor.db"
+from app.core.config import settings
+
+# SQLite veritabanı dosyası (varsayılan olarak backend klasöründe oluşur)
+SQLALCHEMY_DATABASE_URL = settings.database_url
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
@@ -13,6 +15,13 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def ensure_indexes():
+    """Create declared indexes that are missing; create_all only adds them together with new tables"""
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
 # Dependency to get database session
 def get_db():
     db = SessionLocal()
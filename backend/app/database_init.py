@@ -1,14 +1,19 @@
 from sqlalchemy.orm import Session
-from app.database import engine, SessionLocal
+from app.database import engine, SessionLocal, ensure_indexes
 from app.models import Base, User, Roadmap, Milestone, ChatMessage, Achievement, UserAchievement
 from app.core.security import get_password_hash
 from app.services.achievement_service import achievement_service
+from app.services.search_service import search_service
 from datetime import datetime, date
 import json
 
 def create_tables():
     """Create all database tables"""
     Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        achievement_service.ensure_unique_awards(db)
+    ensure_indexes()
+    search_service.ensure_index(engine)
 
 def init_database():
     """Initialize database with tables and sample data"""
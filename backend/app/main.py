@@ -1,26 +1,46 @@
+import asyncio
 import time
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from app.api.routes_ai import router as ai_router
+from app.api.routes_auth import (commit_and_refresh, find_user_by_email,
+                                 password_hashing_unavailable)
 from app.api.routes_auth import router as auth_router
 from app.api.routes_chat import router as chat_router
+from app.api.routes_dashboard import router as dashboard_router
+from app.api.routes_metrics import router as metrics_router
 from app.api.routes_roadmap import router as roadmap_router
+from app.api.routes_search import router as search_router
 from app.api.routes_user import router as user_router
 from app.api.routes_achievement import router as achievement_router
+from app.api.routes_notification import router as notification_router
 from app.core.config import settings
+from app.core.hashing_worker import PasswordHashingBusyError, password_hasher
+from app.core.redis_client import redis_connection
 from app.core.security import (RequestSizeLimitMiddleware,
-                               SecurityHeadersMiddleware, get_password_hash,
-                               verify_password)
-from app.database import Base, SessionLocal, engine
+                               SecurityHeadersMiddleware)
+from app.database import Base, SessionLocal, engine, ensure_indexes
 from app.models.user import User
+from app.services.achievement_catalog import achievement_catalog
+from app.services.achievement_service import achievement_service
+from app.services.achievement_worker import achievement_worker
+from app.services.chat_write_buffer import chat_write_buffer
+from app.services.notification_service import notification_broker
+from app.services.principal_service import principal_service
+from app.services.search_service import search_service
 from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 
 Base.metadata.create_all(bind=engine)
+with SessionLocal() as db:
+    achievement_service.ensure_unique_awards(db)
+ensure_indexes()
+search_service.ensure_index(engine)
 
 app = FastAPI(
     title="Pathyvo - AI Career Counselor",
@@ -47,6 +67,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Take the client address from X-Forwarded-For set by a trusted proxy (added last, so it runs first)
+app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=settings.forwarded_allow_ips)
+
 # Include API routes
 app.include_router(auth_router)
 app.include_router(roadmap_router)
@@ -54,6 +77,38 @@ app.include_router(chat_router)
 app.include_router(ai_router)
 app.include_router(user_router)
 app.include_router(achievement_router)
+app.include_router(notification_router)
+app.include_router(dashboard_router)
+app.include_router(search_router)
+app.include_router(metrics_router)
+
+
+@app.on_event("startup")
+def start_background_workers():
+    db = SessionLocal()
+    try:
+        achievement_catalog.load(db)
+    finally:
+        db.close()
+    notification_broker.start()
+    achievement_worker.start()
+    password_hasher.start()
+    if settings.chat_write_buffer_enabled:
+        chat_write_buffer.start()
+
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    # Flushes buffered chat messages and drains queued achievement checks before exiting
+    chat_write_buffer.stop()
+    achievement_worker.stop()
+    password_hasher.stop()
+    notification_broker.stop()
+
+
+@app.on_event("shutdown")
+async def close_redis_connection():
+    await redis_connection.close()
 
 
 # Dependency to get DB session
@@ -97,11 +152,14 @@ def root():
 
 
 @app.post("/users/", response_model=UserResponse)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+    db_user = await asyncio.to_thread(find_user_by_email, db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHashingBusyError:
+        raise password_hashing_unavailable()
     new_user = User(
         name=user.name,
         email=user.email,
@@ -109,8 +167,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         hashed_password=hashed_password,
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await asyncio.to_thread(commit_and_refresh, db, new_user)
     return new_user
 
 
@@ -127,8 +184,7 @@ def get_user(user_id: int, db: Session = Depends(get_db)):
     return user
 
 
-@app.put("/users/{user_id}", response_model=UserResponse)
-def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db)):
+def apply_user_update(db: Session, user_id: int, user_update: UserUpdate, hashed_password: Optional[str]) -> User:
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -145,13 +201,26 @@ def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get
         setattr(user, 'email', str(user_update.email))
     if user_update.avatar is not None:
         setattr(user, 'avatar', str(user_update.avatar) if user_update.avatar else None)
-    if user_update.password is not None:
-        setattr(user, 'hashed_password', get_password_hash(user_update.password))
+    if hashed_password is not None:
+        setattr(user, 'hashed_password', hashed_password)
     db.commit()
+    principal_service.invalidate(user_id)
     db.refresh(user)
     return user
 
 
+@app.put("/users/{user_id}", response_model=UserResponse)
+async def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db)):
+    hashed_password = None
+    if user_update.password is not None:
+        # Hashed before the transaction so no write waits on a hashing worker
+        try:
+            hashed_password = await password_hasher.hash(user_update.password)
+        except PasswordHashingBusyError:
+            raise password_hashing_unavailable()
+    return await asyncio.to_thread(apply_user_update, db, user_id, user_update, hashed_password)
+
+
 @app.delete("/users/{user_id}")
 def delete_user(user_id: int, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.id == user_id).first()
@@ -159,4 +228,5 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
     db.delete(user)
     db.commit()
+    principal_service.invalidate(user_id)
     return {"ok": True}
@@ -4,5 +4,8 @@ from .roadmap import Roadmap
 from .milestone import Milestone
 from .chat_message import ChatMessage
 from .achievement import Achievement, UserAchievement
+from .user_stats import UserStats
+from .milestone_rollup import MilestoneRollup
+from .chat_archive import ChatArchiveSegment
 
-__all__ = ["Base", "User", "Roadmap", "Milestone", "ChatMessage", "Achievement", "UserAchievement"]
+__all__ = ["Base", "User", "Roadmap", "Milestone", "ChatMessage", "Achievement", "UserAchievement", "UserStats", "MilestoneRollup", "ChatArchiveSegment"]
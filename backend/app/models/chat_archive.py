@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, LargeBinary, Index
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ChatArchiveSegment(Base):
+    """
+    A block of old chat messages of one roadmap, compressed together.
+    Messages in a segment are consecutive in (timestamp, id) order, and a roadmap's
+    segments are created oldest first.
+    """
+    __tablename__ = "chat_archive_segments"
+    __table_args__ = (
+        Index("ix_chat_archive_segments_roadmap_range", "roadmap_id", "last_timestamp"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    roadmap_id = Column(Integer, ForeignKey("roadmaps.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    first_message_id = Column(Integer, nullable=False)  # Lowest message ID in the segment
+    last_message_id = Column(Integer, nullable=False)  # Highest message ID in the segment
+    first_timestamp = Column(DateTime, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    codec = Column(String, nullable=False)  # 'zlib' or 'zstd'
+    payload = deferred(Column(LargeBinary, nullable=False))  # Only loaded when a segment is read
+    created_at = Column(DateTime, default=func.now())
+
+    # Relationships
+    roadmap = relationship("Roadmap", back_populates="chat_archive_segments")
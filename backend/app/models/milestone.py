@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Date, Text, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Date, Text, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 import json
@@ -6,6 +6,10 @@ from datetime import datetime
 
 class Milestone(Base):
     __tablename__ = "milestones"
+    __table_args__ = (
+        # Activity feed and analytics walk a roadmap's completions in time order
+        Index("ix_milestones_roadmap_completed_at", "roadmap_id", "completed_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     roadmap_id = Column(Integer, ForeignKey("roadmaps.id"), nullable=False)
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, ForeignKey, Date, Index, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class MilestoneRollup(Base):
+    """
+    Per-user milestone completions per day, maintained incrementally.
+    Each row also carries its ISO week and month keys so analytics can group in SQL.
+    """
+    __tablename__ = "milestone_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", name="uq_milestone_rollups_user_day"),
+        Index("ix_milestone_rollups_user_week", "user_id", "week_start"),
+        Index("ix_milestone_rollups_user_month", "user_id", "month_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    week_start = Column(Date, nullable=False)  # Monday of the ISO week
+    month_start = Column(Date, nullable=False)  # First day of the month
+    completed_count = Column(Integer, nullable=False, default=0)
+
+    # Relationships
+    user = relationship("User", back_populates="milestone_rollups")
@@ -1,14 +1,17 @@
 import json
 
 from app.database import Base
-from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Integer, String,
-                        Text)
+from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Index, Integer,
+                        String, Text)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 
 class Roadmap(Base):
     __tablename__ = "roadmaps"
+    __table_args__ = (
+        Index("ix_roadmaps_user_created_at", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -34,6 +37,7 @@ class Roadmap(Base):
     user = relationship("User", back_populates="roadmaps")
     milestones = relationship("Milestone", back_populates="roadmap", cascade="all, delete-orphan")
     chat_messages = relationship("ChatMessage", back_populates="roadmap", cascade="all, delete-orphan")
+    chat_archive_segments = relationship("ChatArchiveSegment", back_populates="roadmap", cascade="all, delete-orphan")
     
     def get_collected_data(self):
         """Get collected data as a dict"""
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, ForeignKey, Date, DateTime
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database import Base
+
+class UserStats(Base):
+    """Per-user counters maintained incrementally from domain events"""
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    roadmap_count = Column(Integer, nullable=False, default=0)
+    roadmaps_completed = Column(Integer, nullable=False, default=0)
+    milestones_total = Column(Integer, nullable=False, default=0)
+    milestones_completed = Column(Integer, nullable=False, default=0)
+    distinct_fields = Column(Integer, nullable=False, default=0)
+    current_streak = Column(Integer, nullable=False, default=0)  # Consecutive days with a completion
+    longest_streak = Column(Integer, nullable=False, default=0)
+    last_completion_date = Column(Date, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    # Relationships
+    user = relationship("User", back_populates="stats")
@@ -0,0 +1,15 @@
+from app.database import SessionLocal
+from app.services.user_stats_service import user_stats_service
+
+def reconcile_stats():
+    """Recompute every user's counters from the source tables and repair drift"""
+    print("Reconciling user stats...")
+    db = SessionLocal()
+    try:
+        repaired = user_stats_service.reconcile_all_user_stats(db)
+        print(f"Reconciliation finished, {repaired} user(s) repaired.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    reconcile_stats()
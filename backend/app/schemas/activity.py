@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel
+
+ActivityType = Literal["milestone_completed", "roadmap_created", "achievement_unlocked"]
+
+
+class ActivityRoadmap(BaseModel):
+    id: int
+    title: str
+
+
+class ActivityItem(BaseModel):
+    type: ActivityType
+    id: int
+    occurred_at: datetime
+    title: str
+    description: Optional[str] = None
+    icon: Optional[str] = None
+    roadmap: Optional[ActivityRoadmap] = None
+
+
+class ActivityPage(BaseModel):
+    items: List[ActivityItem]
+    next_cursor: Optional[str] = None
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -30,4 +30,10 @@ class ChatMessageResponse(BaseModel):
     timestamp: datetime
     
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class ChatHistoryPage(BaseModel):
+    items: List[ChatMessage] = []  # Oldest first
+    has_more: bool = False  # More messages beyond this page in the requested direction
+    next_before: Optional[int] = None  # Pass as ?before= to load older messages
+    next_after: Optional[int] = None  # Pass as ?after= to load newer messages
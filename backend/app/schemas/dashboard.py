@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from .achievement import UserAchievementResponse
+from .activity import ActivityItem
+from .roadmap import RoadmapSummaryPage
+
+DASHBOARD_SECTIONS = ("user", "stats", "roadmaps", "achievements", "milestones_by_date", "recent_milestones")
+
+
+class DashboardUser(BaseModel):
+    id: int
+    name: str
+    email: str
+    avatar: Optional[str] = None
+    joined_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class DashboardStats(BaseModel):
+    total_roadmaps: int
+    total_milestones: int
+    completed_milestones: int
+    completed_roadmaps: int
+
+
+class DashboardResponse(BaseModel):
+    """Only the requested sections are included"""
+    user: Optional[DashboardUser] = None
+    stats: Optional[DashboardStats] = None
+    roadmaps: Optional[RoadmapSummaryPage] = None
+    achievements: Optional[List[UserAchievementResponse]] = None
+    milestones_by_date: Optional[List[Dict]] = None
+    recent_milestones: Optional[List[ActivityItem]] = None
@@ -1,8 +1,8 @@
-from datetime import datetime
-from typing import List, Optional, Any
+from datetime import date, datetime
+from typing import List, Literal, Optional, Any
 import json
 
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 
 
 class Resource(BaseModel):
@@ -75,4 +75,38 @@ class RoadmapResponse(BaseModel):
     milestones: List[Milestone] = []
     
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class MilestoneOperation(BaseModel):
+    op: Literal["complete", "uncomplete", "set_due_date", "edit"]
+    milestone_id: int
+    due_date: Optional[date] = None  # For set_due_date (null clears it)
+    title: Optional[str] = None  # For edit
+    description: Optional[str] = None  # For edit
+
+    @field_validator('title')
+    @classmethod
+    def validate_title(cls, v):
+        if v is not None and not v.strip():
+            raise ValueError('Title cannot be empty')
+        return v.strip() if v else v
+
+class MilestoneBatchRequest(BaseModel):
+    operations: List[MilestoneOperation] = Field(..., min_length=1, max_length=500)
+
+class RoadmapSummary(BaseModel):
+    id: int
+    title: str
+    field: Optional[str] = None
+    progress: int = 0
+    next_milestone: Optional[str] = None
+    total_milestones: int = 0
+    completed_milestones: int = 0
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class RoadmapSummaryPage(BaseModel):
+    items: List[RoadmapSummary] = []
+    next_cursor: Optional[int] = None  # Pass as ?cursor= to fetch the next page
@@ -0,0 +1,15 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+
+SearchResultType = Literal["chat_message", "milestone", "roadmap"]
+
+
+class SearchResult(BaseModel):
+    type: SearchResultType
+    id: int
+    roadmap_id: int
+    roadmap_title: str
+    title: Optional[str] = None  # Milestone or roadmap title
+    snippet: str  # HTML-escaped matching text with <mark> highlights
+    score: float  # Higher is more relevant
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.achievement import Achievement
+from app.schemas.achievement import Achievement as AchievementSchema
+from sqlalchemy.orm import Session
+
+
+class AchievementCatalog:
+    """
+    In-process cache of the achievements table.
+    The catalog only changes when achievements are seeded. invalidate() reloads it at once
+    in this process; changes made by scripts or other workers are picked up when the cached
+    copy is older than ttl_seconds (the ETag only changes if the rows did).
+    """
+
+    def __init__(self, ttl_seconds: float = settings.achievement_catalog_ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Optional[List[AchievementSchema]] = None
+        self._etag: Optional[str] = None
+        self._loaded_at = 0.0
+        self.version = 0
+
+    def load(self, db: Session) -> List[AchievementSchema]:
+        """(Re)load the catalog from the database"""
+        entries, _ = self._load(db)
+        return entries
+
+    def _load(self, db: Session) -> Tuple[List[AchievementSchema], str]:
+        with self._lock:
+            version = self.version
+        loaded_at = time.monotonic()
+        rows = db.query(Achievement).order_by(Achievement.id).all()
+        entries = [AchievementSchema.model_validate(row) for row in rows]
+        body = json.dumps([entry.model_dump(mode="json") for entry in entries], sort_keys=True)
+        etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+        with self._lock:
+            # Don't publish a snapshot that an invalidation raced past
+            if version == self.version:
+                self._entries = entries
+                self._etag = etag
+                self._loaded_at = loaded_at
+        return entries, etag
+
+    def invalidate(self):
+        """Bump the catalog version; the next read reloads it"""
+        with self._lock:
+            self.version += 1
+            self._entries = None
+            self._etag = None
+
+    def get_all(self, db: Session) -> List[AchievementSchema]:
+        """Get every achievement, loading the catalog on first use or once it is stale"""
+        entries, _ = self.get_snapshot(db)
+        return entries
+
+    def get_snapshot(self, db: Session) -> Tuple[List[AchievementSchema], str]:
+        """Get every achievement together with a strong ETag derived from the contents"""
+        with self._lock:
+            entries, etag = self._entries, self._etag
+            stale = time.monotonic() - self._loaded_at >= self.ttl_seconds
+        if entries is None or etag is None or stale:
+            entries, etag = self._load(db)
+        return entries, etag
+
+
+# Global instance
+achievement_catalog = AchievementCatalog()
@@ -2,35 +2,64 @@ from typing import List, Tuple
 from datetime import datetime
 
 from app.models.achievement import Achievement, UserAchievement
-from app.models.milestone import Milestone
-from app.models.roadmap import Roadmap
 from app.models.user import User
-from sqlalchemy import func
+from app.models.user_stats import UserStats
+from app.schemas.achievement import Achievement as AchievementSchema
+from app.schemas.achievement import UserAchievementResponse
+from app.services.achievement_catalog import achievement_catalog
+from app.services.notification_service import (ACHIEVEMENT_UNLOCKED,
+                                               notification_broker)
+from app.services.user_stats_service import user_stats_service
+from sqlalchemy import func, inspect
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+UNIQUE_AWARD_INDEX = "uq_user_achievements_user_achievement"
+
+# Condition type -> UserStats counter compared against condition_value
+CONDITION_COUNTERS = {
+    "milestone_count": "milestones_completed",
+    "roadmap_count": "roadmap_count",
+    "roadmap_complete": "roadmaps_completed",
+    "milestone_streak": "longest_streak",  # Consecutive days with a completed milestone
+    "diverse_fields": "distinct_fields",
+}
+
+CONDITION_DEFAULTS = {
+    "milestone_streak": 5,
+    "diverse_fields": 3,
+}
+
 
 class AchievementService:
     """Service for managing user achievements"""
 
-    def check_and_award_achievements(self, user_id: int, db: Session) -> List[Tuple[Achievement, UserAchievement]]:
+    def check_and_award_achievements(self, user_id: int, db: Session) -> List[Tuple[AchievementSchema, UserAchievement]]:
         """Check and award any new achievements for a user"""
         user = db.query(User).filter(User.id == user_id).first()
         if not user:
             return []
 
-        # Get all achievements user doesn't have yet
-        existing_achievement_ids = db.query(UserAchievement.achievement_id).filter(
-            UserAchievement.user_id == user_id
-        ).subquery()
+        # Get all achievements user doesn't have yet, reading the catalog from cache
+        existing_achievement_ids = {
+            row[0] for row in db.query(UserAchievement.achievement_id).filter(
+                UserAchievement.user_id == user_id
+            ).all()
+        }
         
-        available_achievements = db.query(Achievement).filter(
-            ~Achievement.id.in_(existing_achievement_ids)
-        ).all()
+        available_achievements = [
+            achievement for achievement in achievement_catalog.get_all(db)
+            if achievement.id not in existing_achievement_ids
+        ]
+
+        if not available_achievements:
+            return []
 
+        stats = user_stats_service.get_stats(user_id, db)
         new_achievements = []
         
         for achievement in available_achievements:
-            if self._check_achievement_condition(user_id, achievement, db):
+            if self._check_achievement_condition(stats, achievement):
                 # Award the achievement
                 user_achievement = UserAchievement(
                     user_id=user_id,
@@ -38,60 +67,67 @@ class AchievementService:
                     unlocked_at=datetime.now(),
                     is_notified=False
                 )
-                db.add(user_achievement)
+                try:
+                    with db.begin_nested():
+                        db.add(user_achievement)
+                except IntegrityError:
+                    # Awarded by a concurrent check (the worker or /achievements/check), which also notified
+                    continue
                 new_achievements.append((achievement, user_achievement))
         
-        if new_achievements:
-            db.commit()
+        db.commit()
+
+        for achievement, user_achievement in new_achievements:
+            notification_broker.publish(user_id, ACHIEVEMENT_UNLOCKED, {
+                "achievement_id": achievement.id,
+                "title": achievement.title,
+                "description": achievement.description,
+                "icon": achievement.icon,
+                "unlocked_at": user_achievement.unlocked_at.isoformat()
+            })
         
         return new_achievements
 
-    def _check_achievement_condition(self, user_id: int, achievement: Achievement, db: Session) -> bool:
-        """Check if a user meets the condition for an achievement"""
+    def get_user_achievements(self, user_id: int, db: Session) -> List[UserAchievementResponse]:
+        """Get a user's unlocked achievements, taking the details from the catalog instead of one query each"""
+        catalog = {achievement.id: achievement for achievement in achievement_catalog.get_all(db)}
+        user_achievements = db.query(UserAchievement).filter(UserAchievement.user_id == user_id).all()
+        return [
+            UserAchievementResponse(
+                id=ua.id,
+                achievement_id=ua.achievement_id,
+                unlocked_at=ua.unlocked_at,
+                is_notified=ua.is_notified,
+                achievement=catalog.get(ua.achievement_id) or ua.achievement
+            )
+            for ua in user_achievements
+        ]
+
+    def _check_achievement_condition(self, stats: UserStats, achievement: AchievementSchema) -> bool:
+        """Check if a user's counters meet the condition for an achievement"""
         
         if achievement.condition_type == "join_date":
             # Early adopter - just joining is enough
             return True
-            
-        elif achievement.condition_type == "milestone_count":
-            # Count completed milestones
-            completed_count = db.query(Milestone).join(Roadmap).filter(
-                Roadmap.user_id == user_id,
-                Milestone.completed == True
-            ).count()
-            return completed_count >= (achievement.condition_value or 1)
-            
-        elif achievement.condition_type == "roadmap_count":
-            # Count created roadmaps
-            roadmap_count = db.query(Roadmap).filter(Roadmap.user_id == user_id).count()
-            return roadmap_count >= (achievement.condition_value or 1)
-            
-        elif achievement.condition_type == "roadmap_complete":
-            # Check if user has completed any roadmap
-            completed_roadmaps = db.query(Roadmap).filter(
-                Roadmap.user_id == user_id,
-                Roadmap.total_milestones > 0,
-                Roadmap.completed_milestones == Roadmap.total_milestones
-            ).count()
-            return completed_roadmaps >= (achievement.condition_value or 1)
-            
-        elif achievement.condition_type == "milestone_streak":
-            # Check for consecutive milestone completions (simplified)
-            completed_count = db.query(Milestone).join(Roadmap).filter(
-                Roadmap.user_id == user_id,
-                Milestone.completed == True
-            ).count()
-            return completed_count >= (achievement.condition_value or 5)
-            
-        elif achievement.condition_type == "diverse_fields":
-            # Check if user has roadmaps in multiple fields
-            field_count = db.query(func.count(func.distinct(Roadmap.field))).filter(
-                Roadmap.user_id == user_id,
-                Roadmap.field.isnot(None)
-            ).scalar()
-            return field_count >= (achievement.condition_value or 3)
-            
-        return False
+
+        counter = CONDITION_COUNTERS.get(achievement.condition_type)
+        if counter is None:
+            return False
+
+        required = achievement.condition_value or CONDITION_DEFAULTS.get(achievement.condition_type, 1)
+        return (getattr(stats, counter) or 0) >= required
+
+    def ensure_unique_awards(self, db: Session):
+        """Create the one-award-per-achievement index on existing databases, dropping repeated awards first"""
+        if any(index["name"] == UNIQUE_AWARD_INDEX for index in inspect(db.get_bind()).get_indexes("user_achievements")):
+            return
+        first_awards = db.query(func.min(UserAchievement.id)).group_by(
+            UserAchievement.user_id, UserAchievement.achievement_id
+        )
+        db.query(UserAchievement).filter(UserAchievement.id.not_in(first_awards)).delete(synchronize_session=False)
+        db.commit()
+        index = next(index for index in UserAchievement.__table__.indexes if index.name == UNIQUE_AWARD_INDEX)
+        index.create(db.get_bind(), checkfirst=True)
 
     def seed_default_achievements(self, db: Session):
         """Seed the database with default achievements"""
@@ -188,6 +224,7 @@ class AchievementService:
             }
         ]
 
+        added = False
         for achievement_data in default_achievements:
             # Check if achievement already exists
             existing = db.query(Achievement).filter(
@@ -197,9 +234,14 @@ class AchievementService:
             if not existing:
                 achievement = Achievement(**achievement_data)
                 db.add(achievement)
+                added = True
         
         db.commit()
 
+        if added:
+            # New catalog version; cached copies reload on next read
+            achievement_catalog.invalidate()
+
 
 # Global instance
 achievement_service = AchievementService()
@@ -0,0 +1,104 @@
+"""
+Background worker for achievement evaluation.
+Routes enqueue a user after committing a change; the worker collects users for a
+short window, deduplicates them and evaluates each one once in its own session.
+"""
+
+import logging
+import threading
+from typing import Set
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.services.achievement_service import achievement_service
+from app.services.notification_service import (JOB_COMPLETED,
+                                               notification_broker)
+
+logger = logging.getLogger(__name__)
+
+
+class AchievementWorker:
+    """Evaluates achievements off the request path with batching and per-user dedup"""
+
+    def __init__(self, batch_window_seconds: float):
+        self.batch_window_seconds = batch_window_seconds
+        self._pending: Set[int] = set()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """Start the worker thread"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="achievement-worker", daemon=True)
+        self._thread.start()
+        logger.info("Achievement worker started")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the worker thread after processing everything still queued"""
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        logger.info("Achievement worker stopped")
+
+    def enqueue(self, user_id: int):
+        """
+        Queue an achievement check for a user. Call it after the triggering change is committed.
+        Without a running worker (scripts, tests) the check runs inline.
+        """
+        if not self._running:
+            self._process({user_id})
+            return
+        with self._condition:
+            self._pending.add(user_id)
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._running and not self._pending:
+                    return
+                running = self._running
+
+            # Let requests from the same burst coalesce before taking the batch
+            if running and self.batch_window_seconds > 0:
+                with self._condition:
+                    self._condition.wait_for(lambda: not self._running, timeout=self.batch_window_seconds)
+
+            with self._condition:
+                batch, self._pending = self._pending, set()
+            self._process(batch)
+
+    def _process(self, user_ids: Set[int]):
+        for user_id in user_ids:
+            # A session per user, so a failed check can't roll back the others in the batch
+            db = SessionLocal()
+            try:
+                new_achievements = achievement_service.check_and_award_achievements(user_id, db)
+                notification_broker.publish(user_id, JOB_COMPLETED, {
+                    "job": "achievement_check",
+                    "new_achievements_count": len(new_achievements)
+                })
+            except Exception as e:
+                logger.error(f"Achievement check failed for user {user_id}: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+
+# Global instance
+achievement_worker = AchievementWorker(settings.achievement_batch_window_ms / 1000)
@@ -0,0 +1,179 @@
+import base64
+import heapq
+import json
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.models.achievement import Achievement, UserAchievement
+from app.models.milestone import Milestone
+from app.models.roadmap import Roadmap
+from app.schemas.activity import ActivityItem, ActivityPage, ActivityRoadmap
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+MILESTONE_COMPLETED = "milestone_completed"
+ROADMAP_CREATED = "roadmap_created"
+ACHIEVEMENT_UNLOCKED = "achievement_unlocked"
+
+# Feed order is (occurred_at, type rank, id) descending; the rank breaks ties between types
+ACTIVITY_TYPES = (MILESTONE_COMPLETED, ROADMAP_CREATED, ACHIEVEMENT_UNLOCKED)
+MAX_PAGE_SIZE = 100
+
+# (occurred_at, type rank, id)
+FeedPosition = Tuple[datetime, int, int]
+
+
+def encode_cursor(position: FeedPosition) -> str:
+    occurred_at, rank, item_id = position
+    raw = json.dumps([occurred_at.isoformat(), ACTIVITY_TYPES[rank], item_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> FeedPosition:
+    """Parse an opaque feed cursor; raises ValueError when it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        occurred_at, activity_type, item_id = json.loads(raw)
+        return datetime.fromisoformat(occurred_at), ACTIVITY_TYPES.index(activity_type), int(item_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+class ActivityService:
+    """Service building the user's time-ordered activity feed with keyset pagination"""
+
+    def __init__(self):
+        self._sources: Dict[str, Callable] = {
+            MILESTONE_COMPLETED: self._completed_milestones,
+            ROADMAP_CREATED: self._created_roadmaps,
+            ACHIEVEMENT_UNLOCKED: self._unlocked_achievements,
+        }
+
+    def get_feed(
+        self,
+        user_id: int,
+        db: Session,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        types: Optional[Iterable[str]] = None
+    ) -> ActivityPage:
+        """
+        Get one page of activity, newest first.
+        Each type is read with its own index-backed keyset query of at most limit + 1 rows,
+        and the sorted streams are merged.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        position = decode_cursor(cursor) if cursor else None
+        selected = [t for t in ACTIVITY_TYPES if types is None or t in types]
+
+        streams = [
+            self._sources[activity_type](user_id, db, position, limit + 1)
+            for activity_type in selected
+        ]
+        merged = heapq.merge(*streams, key=self._sort_key, reverse=True)
+        if position is not None:
+            # Guards against timestamps stored with a different precision than the cursor's
+            merged = (item for item in merged if self._sort_key(item) < position)
+        items = list(islice(merged, limit + 1))
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(self._sort_key(items[-1]))
+        return ActivityPage(items=items, next_cursor=next_cursor)
+
+    def get_recent_completions(self, user_id: int, db: Session, limit: int) -> List[ActivityItem]:
+        """Get the most recently completed milestones"""
+        return self._completed_milestones(user_id, db, None, max(1, min(limit, MAX_PAGE_SIZE)))
+
+    @staticmethod
+    def _sort_key(item: ActivityItem) -> FeedPosition:
+        return item.occurred_at, ACTIVITY_TYPES.index(item.type), item.id
+
+    @staticmethod
+    def _after(occurred_at, item_id, activity_type: str, position: Optional[FeedPosition]):
+        """Keyset predicate for rows of one type that sort after the cursor position"""
+        if position is None:
+            return None
+        cursor_at, cursor_rank, cursor_id = position
+        rank = ACTIVITY_TYPES.index(activity_type)
+        if rank < cursor_rank:
+            return occurred_at <= cursor_at
+        if rank > cursor_rank:
+            return occurred_at < cursor_at
+        return or_(occurred_at < cursor_at, and_(occurred_at == cursor_at, item_id < cursor_id))
+
+    def _completed_milestones(self, user_id: int, db: Session, position: Optional[FeedPosition], limit: int) -> List[ActivityItem]:
+        query = db.query(
+            Milestone.id, Milestone.completed_at, Milestone.title, Milestone.description,
+            Roadmap.id.label("roadmap_id"), Roadmap.title.label("roadmap_title")
+        ).join(Roadmap, Milestone.roadmap_id == Roadmap.id).filter(
+            Roadmap.user_id == user_id,
+            Milestone.completed == True,
+            Milestone.completed_at.isnot(None)
+        )
+        after = self._after(Milestone.completed_at, Milestone.id, MILESTONE_COMPLETED, position)
+        if after is not None:
+            query = query.filter(after)
+        rows = query.order_by(Milestone.completed_at.desc(), Milestone.id.desc()).limit(limit).all()
+        return [
+            ActivityItem(
+                type=MILESTONE_COMPLETED,
+                id=row.id,
+                occurred_at=row.completed_at,
+                title=row.title,
+                description=row.description,
+                roadmap=ActivityRoadmap(id=row.roadmap_id, title=row.roadmap_title)
+            )
+            for row in rows
+        ]
+
+    def _created_roadmaps(self, user_id: int, db: Session, position: Optional[FeedPosition], limit: int) -> List[ActivityItem]:
+        query = db.query(Roadmap.id, Roadmap.created_at, Roadmap.title, Roadmap.description).filter(
+            Roadmap.user_id == user_id,
+            Roadmap.created_at.isnot(None)
+        )
+        after = self._after(Roadmap.created_at, Roadmap.id, ROADMAP_CREATED, position)
+        if after is not None:
+            query = query.filter(after)
+        rows = query.order_by(Roadmap.created_at.desc(), Roadmap.id.desc()).limit(limit).all()
+        return [
+            ActivityItem(
+                type=ROADMAP_CREATED,
+                id=row.id,
+                occurred_at=row.created_at,
+                title=row.title,
+                description=row.description,
+                roadmap=ActivityRoadmap(id=row.id, title=row.title)
+            )
+            for row in rows
+        ]
+
+    def _unlocked_achievements(self, user_id: int, db: Session, position: Optional[FeedPosition], limit: int) -> List[ActivityItem]:
+        query = db.query(
+            UserAchievement.id, UserAchievement.unlocked_at,
+            Achievement.title, Achievement.description, Achievement.icon
+        ).join(Achievement, UserAchievement.achievement_id == Achievement.id).filter(
+            UserAchievement.user_id == user_id,
+            UserAchievement.unlocked_at.isnot(None)
+        )
+        after = self._after(UserAchievement.unlocked_at, UserAchievement.id, ACHIEVEMENT_UNLOCKED, position)
+        if after is not None:
+            query = query.filter(after)
+        rows = query.order_by(UserAchievement.unlocked_at.desc(), UserAchievement.id.desc()).limit(limit).all()
+        return [
+            ActivityItem(
+                type=ACHIEVEMENT_UNLOCKED,
+                id=row.id,
+                occurred_at=row.unlocked_at,
+                title=row.title,
+                description=row.description,
+                icon=row.icon
+            )
+            for row in rows
+        ]
+
+
+# Global instance
+activity_service = ActivityService()
@@ -0,0 +1,57 @@
+"""
+Daily LLM token budgets per user.
+The AI request limits count calls, but a roadmap generation uses far more provider quota than
+a chat reply. Before an LLM call its expected tokens are reserved from the user's daily
+budget, and the call is refused if they don't fit; afterwards the reservation is settled
+against the tokens LLMService reports, refunding or charging the difference.
+"""
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from app.core.config import settings
+from app.services.llm_service import TokenUsage, llm_service
+from app.services.rate_limit_service import (RateLimitDecision,
+                                             RateLimitService,
+                                             RateLimitWindow)
+
+
+class AIQuotaExceededError(Exception):
+    """Raised when a user's remaining daily token budget can't cover an LLM call"""
+
+    def __init__(self, decision: RateLimitDecision):
+        super().__init__("Daily AI token budget exceeded")
+        self.decision = decision
+
+
+class AIQuotaService:
+    """Service for reserving and settling LLM tokens against per-user daily budgets"""
+
+    def __init__(self, tokens_per_day: int = settings.ai_tokens_per_day):
+        self.tokens_per_day = tokens_per_day
+        # A budget of 0 disables the token limit
+        windows = [RateLimitWindow("day", tokens_per_day, 86400)] if tokens_per_day > 0 else []
+        self.limiter = RateLimitService(windows, key_prefix="rate_limit:ai_tokens")
+
+    @asynccontextmanager
+    async def metered(self, user_id: int, estimated_tokens: int) -> AsyncIterator[TokenUsage]:
+        """Reserve the estimated tokens, meter the LLM calls made in the block and settle on exit"""
+        if self.tokens_per_day > 0:
+            # A call estimated above the whole budget still runs when the budget is untouched
+            estimated_tokens = min(estimated_tokens, self.tokens_per_day)
+        decision = await self.limiter.acquire(user_id, estimated_tokens)
+        if not decision.allowed:
+            raise AIQuotaExceededError(decision)
+
+        with llm_service.metered() as usage:
+            try:
+                yield usage
+            finally:
+                # Calls that failed before reaching the provider refund the whole reservation
+                difference = usage.total_tokens - estimated_tokens
+                if difference:
+                    await self.limiter.adjust(user_id, difference)
+
+
+# Global instance
+ai_quota_service = AIQuotaService()
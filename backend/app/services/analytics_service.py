@@ -0,0 +1,217 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from app.models.milestone import Milestone
+from app.models.milestone_rollup import MilestoneRollup
+from app.models.roadmap import Roadmap
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+GRANULARITIES = ("day", "week", "month")
+MAX_BUCKETS = 400
+DEFAULT_EMPTY_BUCKETS = 4
+
+
+def week_start(day: date) -> date:
+    """Monday of the ISO week containing a day"""
+    return day - timedelta(days=day.weekday())
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return week_start(day)
+    if granularity == "month":
+        return month_start(day)
+    return day
+
+
+def next_period(start: date, granularity: str) -> date:
+    if granularity == "week":
+        return start + timedelta(weeks=1)
+    if granularity == "month":
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def periods_back(start: date, count: int, granularity: str) -> date:
+    """Start of the period count periods before the one starting at start"""
+    for _ in range(count):
+        start = period_start(start - timedelta(days=1), granularity)
+    return start
+
+
+def period_label(start: date, granularity: str) -> str:
+    if granularity == "week":
+        iso_year, iso_week, _ = start.isocalendar()
+        return f"Week {iso_week}, {iso_year}"
+    if granularity == "month":
+        return start.strftime("%b %Y")
+    return start.isoformat()
+
+
+def count_by_day(completion_times: Iterable[Optional[datetime]]) -> Dict[date, int]:
+    """Count completion timestamps per calendar day, skipping missing ones"""
+    return dict(Counter(completed_at.date() for completed_at in completion_times if completed_at is not None))
+
+
+class AnalyticsService:
+    """Service maintaining and reading the per-user milestone completion rollups"""
+
+    def apply_completion_deltas(self, user_id: int, deltas: Dict[date, int], db: Session):
+        """Add completions per day to the user's rollups; negative deltas remove them"""
+        emptied = False
+        for day, delta in deltas.items():
+            if not delta:
+                continue
+            if self._increment(user_id, day, delta, db):
+                emptied = emptied or delta < 0
+                continue
+            if delta < 0:
+                # Nothing was counted for that day, so there is nothing to remove
+                continue
+            try:
+                with db.begin_nested():
+                    db.add(MilestoneRollup(
+                        user_id=user_id,
+                        day=day,
+                        week_start=week_start(day),
+                        month_start=month_start(day),
+                        completed_count=delta
+                    ))
+            except IntegrityError:
+                # A concurrent request created the row first
+                self._increment(user_id, day, delta, db)
+        if emptied:
+            db.execute(delete(MilestoneRollup).where(
+                MilestoneRollup.user_id == user_id,
+                MilestoneRollup.completed_count <= 0
+            ))
+
+    def _increment(self, user_id: int, day: date, delta: int, db: Session) -> bool:
+        result = db.execute(
+            update(MilestoneRollup)
+            .where(MilestoneRollup.user_id == user_id, MilestoneRollup.day == day)
+            .values(completed_count=MilestoneRollup.completed_count + delta),
+            execution_options={"synchronize_session": False}
+        )
+        return result.rowcount > 0
+
+    def get_completion_days(self, user_id: int, db: Session, roadmap_id: Optional[int] = None) -> Dict[date, int]:
+        """Count the user's completed milestones per day from the source tables"""
+        completed_on = func.date(Milestone.completed_at)
+        query = (
+            select(completed_on, func.count(Milestone.id))
+            .join(Roadmap)
+            .where(
+                Roadmap.user_id == user_id,
+                Milestone.completed == True,
+                Milestone.completed_at.isnot(None)
+            )
+            .group_by(completed_on)
+        )
+        if roadmap_id is not None:
+            query = query.where(Milestone.roadmap_id == roadmap_id)
+        return {
+            date.fromisoformat(day) if isinstance(day, str) else day: count
+            for day, count in db.execute(query).all()
+        }
+
+    def clear_rollups(self, user_id: int, db: Session):
+        db.execute(delete(MilestoneRollup).where(MilestoneRollup.user_id == user_id))
+
+    def rebuild_rollups(self, user_id: int, db: Session) -> bool:
+        """Recompute a user's rollups from the milestones table. Returns True if they had drifted."""
+        expected = self.get_completion_days(user_id, db)
+        current = dict(db.execute(
+            select(MilestoneRollup.day, MilestoneRollup.completed_count)
+            .where(MilestoneRollup.user_id == user_id)
+        ).all())
+        if current == expected:
+            return False
+        self.clear_rollups(user_id, db)
+        db.add_all([
+            MilestoneRollup(
+                user_id=user_id,
+                day=day,
+                week_start=week_start(day),
+                month_start=month_start(day),
+                completed_count=count
+            )
+            for day, count in expected.items()
+        ])
+        db.flush()
+        return True
+
+    def get_completion_series(
+        self,
+        user_id: int,
+        db: Session,
+        granularity: str = "week",
+        start: Optional[date] = None,
+        end: Optional[date] = None
+    ) -> List[Dict]:
+        """
+        Get completion counts per day, ISO week or month, including empty periods.
+        Without a start the series begins at the first completion, or MAX_BUCKETS periods before
+        the end for longer histories; without an end it runs to today. Explicit ranges of more
+        than MAX_BUCKETS periods raise ValueError.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        today = datetime.now().date()
+        last = period_start(end or today, granularity)
+
+        if start is None:
+            first_day = db.execute(
+                select(func.min(MilestoneRollup.day)).where(MilestoneRollup.user_id == user_id)
+            ).scalar()
+            if first_day is None or first_day > (end or today):
+                # Nothing to show yet: a few empty periods ending at the range end
+                first = periods_back(last, DEFAULT_EMPTY_BUCKETS - 1, granularity)
+            else:
+                first = max(period_start(first_day, granularity), periods_back(last, MAX_BUCKETS - 1, granularity))
+        else:
+            first = period_start(start, granularity)
+
+        if first > last:
+            raise ValueError("start must not be after end")
+
+        periods = []
+        period = first
+        while period <= last:
+            periods.append(period)
+            if len(periods) > MAX_BUCKETS:
+                raise ValueError(f"Range too large: at most {MAX_BUCKETS} {granularity} buckets")
+            period = next_period(period, granularity)
+
+        # Group the daily rollups by the requested period in SQL
+        period_column = {
+            "day": MilestoneRollup.day,
+            "week": MilestoneRollup.week_start,
+            "month": MilestoneRollup.month_start,
+        }[granularity]
+        rows = db.execute(
+            select(period_column, func.sum(MilestoneRollup.completed_count))
+            .where(
+                MilestoneRollup.user_id == user_id,
+                MilestoneRollup.day >= first,
+                MilestoneRollup.day < next_period(last, granularity)
+            )
+            .group_by(period_column)
+        ).all()
+        counts = {period: int(total) for period, total in rows}
+
+        return [
+            {"date": period_label(period, granularity), "milestones": counts.get(period, 0)}
+            for period in periods
+        ]
+
+
+# Global instance
+analytics_service = AnalyticsService()
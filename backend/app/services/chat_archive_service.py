@@ -0,0 +1,185 @@
+import json
+import logging
+import zlib
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.chat_archive import ChatArchiveSegment
+from app.models.chat_message import ChatMessage
+from app.services.search_service import search_service
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session, undefer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# (timestamp, id): the order chat history is paged in
+MessageKey = Tuple[datetime, int]
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("The zstandard package is needed to read zstd chat archive segments")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _key(message: ChatMessage) -> MessageKey:
+    return message.timestamp, message.id
+
+
+class ChatArchiveService:
+    """Service moving old chat messages into compressed per-roadmap segments and reading them back"""
+
+    def __init__(self, codec: str):
+        if codec == "zstd" and zstandard is None:
+            logger.warning("zstandard not installed, archiving chat messages with zlib")
+            codec = "zlib"
+        self.codec = codec
+
+    def archive_roadmap(self, roadmap_id: int, cutoff: datetime, segment_size: int, db: Session) -> Tuple[int, int, int]:
+        """
+        Move a roadmap's messages older than the cutoff into segments, one transaction per segment.
+        Returns (messages archived, raw bytes, compressed bytes).
+        """
+        archived = raw_bytes = compressed_bytes = 0
+        while True:
+            messages = db.scalars(
+                select(ChatMessage)
+                .where(ChatMessage.roadmap_id == roadmap_id, ChatMessage.timestamp < cutoff)
+                .order_by(ChatMessage.timestamp, ChatMessage.id)
+                .limit(segment_size)
+            ).all()
+            if not messages:
+                return archived, raw_bytes, compressed_bytes
+
+            message_ids = [m.id for m in messages]
+            raw = json.dumps([
+                [m.id, m.user_id, m.type, m.content, m.timestamp.isoformat()] for m in messages
+            ], separators=(",", ":")).encode()
+            payload = compress(raw, self.codec)
+            db.add(ChatArchiveSegment(
+                roadmap_id=roadmap_id,
+                user_id=messages[0].user_id,
+                first_message_id=min(message_ids),
+                last_message_id=max(message_ids),
+                first_timestamp=messages[0].timestamp,
+                last_timestamp=messages[-1].timestamp,
+                message_count=len(messages),
+                codec=self.codec,
+                payload=payload
+            ))
+            db.execute(delete(ChatMessage).where(ChatMessage.id.in_(message_ids)), execution_options={"synchronize_session": False})
+            # Archived messages stay searchable
+            search_service.index_chat_messages(db, messages)
+            db.commit()
+            db.expunge_all()
+
+            archived += len(messages)
+            raw_bytes += len(raw)
+            compressed_bytes += len(payload)
+
+    def archive_older_than(self, cutoff: datetime, segment_size: int, db: Session) -> Iterator[Tuple[int, int, int, int]]:
+        """Archive every roadmap's old messages, yielding (roadmap_id, messages, raw bytes, compressed bytes)"""
+        roadmap_ids = db.scalars(
+            select(ChatMessage.roadmap_id).where(ChatMessage.timestamp < cutoff).distinct().order_by(ChatMessage.roadmap_id)
+        ).all()
+        for roadmap_id in roadmap_ids:
+            yield (roadmap_id, *self.archive_roadmap(roadmap_id, cutoff, segment_size, db))
+
+    def find_message_key(self, roadmap_id: int, message_id: int, db: Session) -> Optional[MessageKey]:
+        """Get the (timestamp, id) of an archived message"""
+        segments = db.scalars(
+            select(ChatArchiveSegment).options(undefer(ChatArchiveSegment.payload)).where(
+                ChatArchiveSegment.roadmap_id == roadmap_id,
+                ChatArchiveSegment.first_message_id <= message_id,
+                ChatArchiveSegment.last_message_id >= message_id
+            )
+        )
+        for segment in segments:
+            for message in self._read(segment):
+                if message.id == message_id:
+                    return _key(message)
+        return None
+
+    def load_before(self, roadmap_id: int, db: Session, before: Optional[MessageKey], limit: int) -> List[ChatMessage]:
+        """Get up to limit archived messages older than a key (newest first)"""
+        query = self._segments(roadmap_id)
+        if before is not None:
+            query = query.where(ChatArchiveSegment.first_timestamp <= before[0])
+        query = query.order_by(ChatArchiveSegment.id.desc())
+
+        messages: List[ChatMessage] = []
+        for segment in db.scalars(query):
+            messages.extend(m for m in reversed(self._read(segment)) if before is None or _key(m) < before)
+            if len(messages) >= limit:
+                break
+        return messages[:limit]
+
+    def load_after(self, roadmap_id: int, db: Session, after: MessageKey, limit: int) -> List[ChatMessage]:
+        """Get up to limit archived messages newer than a key (oldest first)"""
+        query = self._segments(roadmap_id).where(
+            ChatArchiveSegment.last_timestamp >= after[0]
+        ).order_by(ChatArchiveSegment.id)
+
+        messages: List[ChatMessage] = []
+        for segment in db.scalars(query):
+            messages.extend(m for m in self._read(segment) if _key(m) > after)
+            if len(messages) >= limit:
+                break
+        return messages[:limit]
+
+    def _segments(self, roadmap_id: int):
+        # Segments are read in creation order, which is message order
+        return select(ChatArchiveSegment).options(undefer(ChatArchiveSegment.payload)).where(
+            ChatArchiveSegment.roadmap_id == roadmap_id
+        )
+
+    def _read(self, segment: ChatArchiveSegment) -> List[ChatMessage]:
+        """Decompress a segment into transient ChatMessage objects (oldest first)"""
+        rows = json.loads(decompress(segment.payload, segment.codec))
+        return [
+            ChatMessage(
+                id=message_id,
+                roadmap_id=segment.roadmap_id,
+                user_id=user_id,
+                type=message_type,
+                content=content,
+                timestamp=datetime.fromisoformat(timestamp)
+            )
+            for message_id, user_id, message_type, content, timestamp in rows
+        ]
+
+    def rebuild_search_index(self, db: Session, batch_size: int = 100):
+        """Refill the search index from the source tables and the archived segments in one transaction"""
+        search_service.refill(db)
+        segment_ids = db.scalars(select(ChatArchiveSegment.id).order_by(ChatArchiveSegment.id)).all()
+        for start in range(0, len(segment_ids), batch_size):
+            segments = db.scalars(
+                select(ChatArchiveSegment).options(undefer(ChatArchiveSegment.payload))
+                .where(ChatArchiveSegment.id.in_(segment_ids[start:start + batch_size]))
+            ).all()
+            for segment in segments:
+                search_service.index_chat_messages(db, self._read(segment))
+            # Payloads are only needed once
+            db.expunge_all()
+        db.commit()
+
+    def archived_count(self, db: Session) -> int:
+        return db.scalar(select(func.coalesce(func.sum(ChatArchiveSegment.message_count), 0)))
+
+
+# Global instance
+chat_archive_service = ChatArchiveService(settings.chat_archive_codec)
@@ -0,0 +1,129 @@
+from typing import List, Optional
+
+from app.models.chat_message import ChatMessage
+from app.schemas.chat import ChatHistoryPage
+from app.services.chat_archive_service import MessageKey, chat_archive_service
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class ChatHistoryService:
+    """Service reading a roadmap's chat history in cursor-paginated pages"""
+
+    def get_page(
+        self,
+        roadmap_id: int,
+        db: Session,
+        limit: int = DEFAULT_PAGE_SIZE,
+        before: Optional[int] = None,
+        after: Optional[int] = None
+    ) -> ChatHistoryPage:
+        """
+        Get a page of messages ordered by (timestamp, id), returned oldest first.
+        Without a cursor this is the newest page; before/after are message IDs from a previous page.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        query = select(ChatMessage).where(ChatMessage.roadmap_id == roadmap_id)
+
+        if after is not None:
+            query = query.where(self._after(roadmap_id, after))
+            order = (ChatMessage.timestamp.asc(), ChatMessage.id.asc())
+        else:
+            if before is not None:
+                query = query.where(self._before(roadmap_id, before))
+            order = (ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+
+        # Fetch one extra row to know whether another page exists
+        rows = list(db.scalars(query.order_by(*order).limit(limit + 1)).all())
+        if len(rows) <= limit:
+            # The page runs into (or starts in) the compressed archive of older messages
+            rows = self._with_archived(roadmap_id, db, rows, limit, before, after)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after is None:
+            rows.reverse()
+
+        # Paging forward means older messages exist (and the other way round)
+        older_exist = has_more if after is None else bool(rows)
+        return ChatHistoryPage(
+            items=rows,
+            has_more=has_more,
+            next_before=rows[0].id if rows and older_exist else None,
+            next_after=rows[-1].id if rows else after
+        )
+
+    def _with_archived(
+        self,
+        roadmap_id: int,
+        db: Session,
+        rows: List[ChatMessage],
+        limit: int,
+        before: Optional[int],
+        after: Optional[int]
+    ) -> List[ChatMessage]:
+        """Extend a short page of live messages (in query order) with archived ones"""
+        if after is not None:
+            if rows or self._message_key(roadmap_id, after, db, live_only=True):
+                # Archived messages are all older than a live anchor
+                return rows
+            key = chat_archive_service.find_message_key(roadmap_id, after, db)
+            if key is None:
+                return rows
+            archived = chat_archive_service.load_after(roadmap_id, db, key, limit + 1)
+            if len(archived) <= limit:
+                live = select(ChatMessage).where(ChatMessage.roadmap_id == roadmap_id)
+                archived += db.scalars(
+                    live.order_by(ChatMessage.timestamp, ChatMessage.id).limit(limit + 1 - len(archived))
+                ).all()
+            return archived
+
+        if rows:
+            boundary = (rows[-1].timestamp, rows[-1].id)
+        elif before is not None:
+            boundary = self._message_key(roadmap_id, before, db)
+            if boundary is None:
+                return rows
+        else:
+            boundary = None
+        return rows + chat_archive_service.load_before(roadmap_id, db, boundary, limit + 1 - len(rows))
+
+    def _message_key(self, roadmap_id: int, message_id: int, db: Session, live_only: bool = False) -> Optional[MessageKey]:
+        """Get the (timestamp, id) of a live or archived message"""
+        timestamp = db.scalar(select(ChatMessage.timestamp).where(
+            ChatMessage.id == message_id,
+            ChatMessage.roadmap_id == roadmap_id
+        ))
+        if timestamp is not None:
+            return timestamp, message_id
+        if live_only:
+            return None
+        return chat_archive_service.find_message_key(roadmap_id, message_id, db)
+
+    def _anchor_timestamp(self, roadmap_id: int, message_id: int):
+        # Compare against the anchor's stored timestamp in SQL: a value parsed into Python and
+        # bound back can differ in textual precision from what SQLite stored
+        return select(ChatMessage.timestamp).where(
+            ChatMessage.id == message_id,
+            ChatMessage.roadmap_id == roadmap_id
+        ).scalar_subquery()
+
+    def _before(self, roadmap_id: int, message_id: int):
+        anchor = self._anchor_timestamp(roadmap_id, message_id)
+        return or_(
+            ChatMessage.timestamp < anchor,
+            and_(ChatMessage.timestamp == anchor, ChatMessage.id < message_id)
+        )
+
+    def _after(self, roadmap_id: int, message_id: int):
+        anchor = self._anchor_timestamp(roadmap_id, message_id)
+        return or_(
+            ChatMessage.timestamp > anchor,
+            and_(ChatMessage.timestamp == anchor, ChatMessage.id > message_id)
+        )
+
+
+# Global instance
+chat_history_service = ChatHistoryService()
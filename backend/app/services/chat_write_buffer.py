@@ -0,0 +1,179 @@
+"""
+Optional write-behind buffer for chat messages.
+Requests hand their messages to a writer thread that inserts everything queued within a
+few milliseconds in one transaction, so many chats share a commit (one fsync under SQLite).
+Callers are only answered once their batch has committed.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.chat_message import ChatMessage
+from app.schemas.chat import ChatMessage as ChatMessageSchema
+
+logger = logging.getLogger(__name__)
+
+# How long a full buffer may block a writer before the request is rejected
+ENQUEUE_TIMEOUT_SECONDS = 5.0
+# How long a request waits for its batch to commit
+COMMIT_TIMEOUT_SECONDS = 30.0
+
+
+class ChatBufferFullError(Exception):
+    """Raised when the buffer stays full for longer than the enqueue timeout"""
+
+
+def chat_timestamp() -> datetime:
+    """Current time on the same clock as the timestamp column's func.now() default (UTC)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ChatWriteBuffer:
+    """Batches ChatMessage inserts from all requests into few transactions"""
+
+    def __init__(self, flush_interval_seconds: float, max_batch_size: int, max_pending: int):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_batch_size = max_batch_size
+        # Bounded: a full queue makes writers wait (backpressure) instead of growing memory
+        self._queue: "queue.Queue[Tuple[List[Dict], Future]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """Start the writer thread"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="chat-write-buffer", daemon=True)
+        self._thread.start()
+        logger.info("Chat write buffer started")
+
+    def stop(self, timeout: float = 10.0):
+        """Stop accepting writes and flush everything still queued"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        # Anything enqueued after the writer's final pass
+        self._flush(self._drain())
+        logger.info("Chat write buffer stopped")
+
+    def submit(self, messages: List[Dict], timeout: float = ENQUEUE_TIMEOUT_SECONDS) -> Future:
+        """
+        Queue messages (ChatMessage column values) to be inserted together in one transaction.
+        The future resolves to the saved messages once committed. Without a running writer
+        the insert happens inline.
+        """
+        messages = [{"timestamp": chat_timestamp(), **message} for message in messages]
+        future: Future = Future()
+        if not self._running:
+            self._flush([(messages, future)])
+            return future
+        try:
+            self._queue.put((messages, future), timeout=timeout)
+        except queue.Full:
+            raise ChatBufferFullError("Chat write buffer is full")
+        if not self._running:
+            # Stopped while enqueueing; don't leave the message behind
+            self._flush(self._drain())
+        return future
+
+    def write(self, messages: List[Dict]) -> List[ChatMessageSchema]:
+        """Insert messages and wait until they are committed"""
+        return self.submit(messages).result(timeout=COMMIT_TIMEOUT_SECONDS)
+
+    async def write_async(self, messages: List[Dict]) -> List[ChatMessageSchema]:
+        """Insert messages and wait until they are committed, without blocking the event loop"""
+        if not self._running:
+            # The inline insert is a blocking transaction
+            return await asyncio.to_thread(self.write, messages)
+        try:
+            future = self.submit(messages, timeout=0)
+        except ChatBufferFullError:
+            # Wait for room off the event loop
+            future = await asyncio.to_thread(self.submit, messages)
+        return await asyncio.wait_for(asyncio.wrap_future(future), COMMIT_TIMEOUT_SECONDS)
+
+    def _run(self):
+        while self._running or not self._queue.empty():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            batch = [first]
+            rows = len(first[0])
+            # Collect whatever else arrives within the flush interval
+            deadline = time.monotonic() + self.flush_interval_seconds
+            while rows < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            self._flush(batch)
+
+    def _drain(self) -> List[Tuple[List[Dict], Future]]:
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _flush(self, batch: List[Tuple[List[Dict], Future]]):
+        if not batch:
+            return
+        db = SessionLocal()
+        try:
+            saved = []
+            for messages, future in batch:
+                rows = [ChatMessage(**message) for message in messages]
+                db.add_all(rows)
+                saved.append((rows, future))
+            db.flush()
+            # Serialize before committing so nothing is reloaded afterwards
+            results = [([ChatMessageSchema.model_validate(row) for row in rows], future) for rows, future in saved]
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            if len(batch) > 1:
+                # Retry one request at a time so a bad message only fails its own request
+                for item in batch:
+                    self._flush([item])
+                return
+            logger.error(f"Failed to save chat messages: {e}")
+            batch[0][1].set_exception(e)
+            return
+        finally:
+            db.close()
+        for result, future in results:
+            future.set_result(result)
+
+
+# Global instance
+chat_write_buffer = ChatWriteBuffer(
+    settings.chat_write_flush_ms / 1000,
+    settings.chat_write_batch_size,
+    settings.chat_write_max_pending
+)
@@ -1,7 +1,11 @@
 import asyncio
 import json
 import logging
-from typing import Any, Dict, List
+import math
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
 
 import google.generativeai as genai
 from app.core.config import settings
@@ -645,6 +649,24 @@ FIELD_CONFIG = {
     }
 }
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text (about four characters per token)"""
+    return math.ceil(len(text) / 4)
+
+@dataclass
+class TokenUsage:
+    """Tokens used by the LLM calls made inside a metered block"""
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    calls: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.output_tokens
+
+# The meter of the current request, if it is metering its LLM calls
+_usage_meter: ContextVar[Optional[TokenUsage]] = ContextVar("llm_usage_meter", default=None)
+
 class LLMService:
     """Service for handling AI/LLM interactions for career guidance."""
 
@@ -702,31 +724,8 @@ class LLMService:
             logger.error("AI model not available.")
             return self._generate_fallback_roadmap(field)
 
-        field_key = field.lower().replace(" ", "_").replace("/", "_")
-        config = FIELD_CONFIG.get(field_key, FIELD_CONFIG["default"])
-        prompt_template = config["prompt_template"]
-
-        # Ensure all keys required by the template are present in user_responses
-        # Provide default values for any missing answers to prevent errors
-        # If using default config for a custom field, use custom questions
-        if field_key not in FIELD_CONFIG and field != "default":
-            # Use the custom questions we generated
-            custom_questions = [
-                {"key": "experience", "text": f"What's your current experience level with {field}?"},
-                {"key": "interests", "text": f"What specific aspects of {field} interest you the most?"},
-                {"key": "goals", "text": f"What are your main goals in {field}?"},
-                {"key": "learning_style", "text": "How do you prefer to learn?"},
-                {"key": "time_commitment", "text": "How much time can you dedicate to learning per week?"},
-            ]
-            prompt_data = {q["key"]: user_responses.get(q["key"], "Not provided") for q in custom_questions}
-        else:
-            prompt_data = {q["key"]: user_responses.get(q["key"], "Not provided") for q in config["questions"]}
-        prompt_data["field"] = field # Add field for the default template
-
-        try:
-            prompt = prompt_template.format(**prompt_data)
-        except KeyError as e:
-            logger.error(f"Missing key in user_responses for prompt template: {e}")
+        prompt = self.build_roadmap_prompt(field, user_responses)
+        if prompt is None:
             return self._generate_fallback_roadmap(field)
 
         response_text = await self._call_ai_service(prompt)
@@ -794,6 +793,72 @@ class LLMService:
             # Fallback if the AI fails to return valid JSON
             return self._generate_fallback_roadmap(field)
 
+    def build_roadmap_prompt(self, field: str, user_responses: Dict[str, Any]) -> Optional[str]:
+        """The roadmap generation prompt for a field and the user's answers (None if it can't be built)"""
+        field_key = field.lower().replace(" ", "_").replace("/", "_")
+        config = FIELD_CONFIG.get(field_key, FIELD_CONFIG["default"])
+        prompt_template = config["prompt_template"]
+
+        # Ensure all keys required by the template are present in user_responses
+        # Provide default values for any missing answers to prevent errors
+        # If using default config for a custom field, use custom questions
+        if field_key not in FIELD_CONFIG and field != "default":
+            # Use the custom questions we generated
+            custom_questions = [
+                {"key": "experience", "text": f"What's your current experience level with {field}?"},
+                {"key": "interests", "text": f"What specific aspects of {field} interest you the most?"},
+                {"key": "goals", "text": f"What are your main goals in {field}?"},
+                {"key": "learning_style", "text": "How do you prefer to learn?"},
+                {"key": "time_commitment", "text": "How much time can you dedicate to learning per week?"},
+            ]
+            prompt_data = {q["key"]: user_responses.get(q["key"], "Not provided") for q in custom_questions}
+        else:
+            prompt_data = {q["key"]: user_responses.get(q["key"], "Not provided") for q in config["questions"]}
+        prompt_data["field"] = field # Add field for the default template
+
+        try:
+            return prompt_template.format(**prompt_data)
+        except KeyError as e:
+            logger.error(f"Missing key in user_responses for prompt template: {e}")
+            return None
+
+    def estimate_roadmap_tokens(self, field: str, user_responses: Dict[str, Any]) -> int:
+        """Tokens a roadmap generation may use: the prompt plus a full-length response"""
+        prompt = self.build_roadmap_prompt(field, user_responses) or ""
+        return estimate_tokens(prompt) + settings.gemini_max_tokens
+
+    def estimate_chat_tokens(self, prompt: str) -> int:
+        """Tokens a chat reply is expected to use: the prompt plus a typical short answer"""
+        return estimate_tokens(prompt) + min(settings.ai_chat_reply_token_estimate, settings.gemini_max_tokens)
+
+    @contextmanager
+    def metered(self) -> Iterator[TokenUsage]:
+        """Count the tokens of the LLM calls made inside the block (in this task)"""
+        usage = TokenUsage()
+        token = _usage_meter.set(usage)
+        try:
+            yield usage
+        finally:
+            _usage_meter.reset(token)
+
+    def _record_usage(self, prompt: str, response: Any):
+        """Add a response's token counts to the current meter, estimating any the provider omits"""
+        usage = _usage_meter.get()
+        if usage is None:
+            return
+        metadata = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(metadata, "prompt_token_count", 0) or estimate_tokens(prompt)
+        output_tokens = getattr(metadata, "candidates_token_count", 0)
+        if not output_tokens:
+            try:
+                output_tokens = estimate_tokens(response.text)
+            except Exception:
+                # Blocked responses have no text
+                output_tokens = 0
+        usage.prompt_tokens += prompt_tokens
+        usage.output_tokens += output_tokens
+        usage.calls += 1
+
     def _generate_fallback_roadmap(self, field: str) -> Dict[str, Any]:
         """Generate a fallback roadmap if the AI service fails."""
         return {
@@ -836,6 +901,7 @@ class LLMService:
                 prompt,
                 generation_config=generation_config
             )
+            self._record_usage(prompt, response)
             
             if not response or not hasattr(response, 'text'):
                 logger.error("Gemini API returned invalid response object")
@@ -0,0 +1,66 @@
+"""
+Throttling of failed logins per client IP address and per account.
+Checked before any password is verified, so credential-stuffing traffic is turned away
+without costing bcrypt work. Failures are counted with the same GCRA stores as the AI rate
+limits: in shared memory for all workers on the host when SHARED_MEMORY_DIR is set, otherwise
+in a bounded per-process map that forgets keys once their failures have left the window.
+"""
+
+from typing import Optional, Union
+
+from app.core.config import settings
+from app.core.shared_memory import open_shared_table
+from app.services.rate_limit_service import (MemoryRateLimitStore,
+                                             RateLimitWindow,
+                                             SharedRateLimitStore)
+
+
+class LoginThrottle:
+    """
+    Counters of failed logins, keyed by IP address and by email.
+    A key is throttled once it has max failures within the window; after that it gets one
+    more attempt every window / max seconds, so the long-run rate stays at max per window.
+    """
+
+    def __init__(self, max_failures_per_ip: int, max_failures_per_email: int, window_seconds: int,
+                 max_tracked_keys: int = settings.login_max_tracked_keys):
+        self.max_failures_per_ip = max_failures_per_ip
+        self.max_failures_per_email = max_failures_per_email
+        self.window_seconds = window_seconds
+        table = open_shared_table("login_throttle", max_tracked_keys * 5 // 4, 8)
+        if table is not None:
+            self.store: Union[SharedRateLimitStore, MemoryRateLimitStore] = SharedRateLimitStore(table, 1)
+        else:
+            self.store = MemoryRateLimitStore(max_tracked_keys)
+
+    def _limits(self, ip: str, email: str):
+        return (
+            (f"ip:{ip}", RateLimitWindow("ip", self.max_failures_per_ip, self.window_seconds)),
+            (f"email:{email.lower()}", RateLimitWindow("email", self.max_failures_per_email, self.window_seconds)),
+        )
+
+    async def check(self, ip: str, email: str) -> Optional[int]:
+        """Get the seconds to wait if the IP address or the account is throttled, else None"""
+        retry_after = []
+        for key, window in self._limits(ip, email):
+            allowed, results, _now = await self.store.acquire_async(key, [window], 1, dry_run=True)
+            if not allowed:
+                retry_after.append(max(1, int(results[0].retry_after) + 1))
+        return max(retry_after) if retry_after else None
+
+    async def record_failure(self, ip: str, email: str):
+        for key, window in self._limits(ip, email):
+            # Counted even past the limit, e.g. for attempts that passed check concurrently
+            await self.store.acquire_async(key, [window], 1, dry_run=False, force=True)
+
+    async def reset(self, email: str):
+        """Forget an account's failures after a successful login"""
+        await self.store.delete_async(f"email:{email.lower()}")
+
+
+# Global instance
+login_throttle = LoginThrottle(
+    settings.login_max_failures_per_ip,
+    settings.login_max_failures_per_email,
+    settings.login_failure_window_seconds
+)
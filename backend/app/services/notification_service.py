@@ -0,0 +1,287 @@
+"""
+Notification service for pushing per-user events to connected clients.
+Provides an in-process pub/sub broker for single-worker deployments and a Redis
+backed broker that fans events out across workers.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.redis_client import (RedisConnection, RedisUnavailableError,
+                                   redis_connection)
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Event types
+ACHIEVEMENT_UNLOCKED = "achievement_unlocked"
+MILESTONE_COMPLETED = "milestone_completed"
+ROADMAP_PROGRESS = "roadmap_progress"
+JOB_COMPLETED = "job_completed"
+
+
+@dataclass
+class Notification:
+    """A single event delivered to a user's notification stream"""
+    id: int
+    user_id: int
+    type: str
+    data: Dict[str, Any] = field(default_factory=dict)
+    created_at: str = ""
+
+    def to_sse(self) -> str:
+        """Encode as a server-sent event frame"""
+        payload = json.dumps({"type": self.type, "data": self.data, "created_at": self.created_at}, default=str)
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "id": self.id,
+            "user_id": self.user_id,
+            "type": self.type,
+            "data": self.data,
+            "created_at": self.created_at,
+        }, default=str)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "Notification":
+        return cls(**json.loads(raw))
+
+    @classmethod
+    def from_message(cls, message: str) -> "Notification":
+        """Decode an "<id> <JSON>" message published by PUBLISH_LUA"""
+        notification_id, raw = message.split(" ", 1)
+        notification = cls.from_json(raw)
+        notification.id = int(notification_id)
+        return notification
+
+
+class NotificationBroker:
+    """
+    In-process pub/sub with a short per-user history for resuming streams.
+    Histories are kept for the max_history_users users notified most recently.
+    """
+
+    def __init__(self, history_size: int = 100, max_history_users: int = 10000):
+        self.history_size = history_size
+        self.max_history_users = max(1, max_history_users)
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._history: "OrderedDict[int, Deque[Notification]]" = OrderedDict()
+        self._subscribers: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(set)
+
+    def start(self):
+        """Start background resources (nothing to do in-process)"""
+
+    def stop(self):
+        """Release background resources (nothing to do in-process)"""
+
+    def publish(self, user_id: int, event_type: str, data: Optional[Dict[str, Any]] = None) -> Notification:
+        """Publish an event to a user's stream. Safe to call from any thread."""
+        notification = Notification(
+            id=self._allocate_id(),
+            user_id=user_id,
+            type=event_type,
+            data=data or {},
+            created_at=datetime.now().isoformat()
+        )
+        self._deliver(notification)
+        return notification
+
+    def _allocate_id(self) -> int:
+        # Time based so IDs keep increasing across restarts and Last-Event-ID stays meaningful
+        with self._lock:
+            self._last_id = max(self._last_id + 1, time.time_ns() // 1000)
+            return self._last_id
+
+    def _deliver(self, notification: Notification):
+        """Record a notification and hand it to this process's subscribers"""
+        with self._lock:
+            history = self._history.get(notification.user_id)
+            if history is None:
+                history = self._history[notification.user_id] = deque(maxlen=self.history_size)
+                if len(self._history) > self.max_history_users:
+                    self._history.popitem(last=False)
+            else:
+                self._history.move_to_end(notification.user_id)
+            history.append(notification)
+            subscribers = list(self._subscribers.get(notification.user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, notification)
+            except RuntimeError:
+                # Subscriber's loop already closed
+                pass
+
+    async def subscribe(self, user_id: int, last_event_id: Optional[int] = None,
+                        heartbeat_seconds: Optional[float] = None) -> AsyncIterator[Optional[Notification]]:
+        """
+        Yield notifications for a user, replaying anything newer than last_event_id first.
+        Yields None every heartbeat_seconds without traffic so callers can keep the connection alive.
+        """
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers[user_id].add(subscriber)
+            backlog = [
+                n for n in self._history.get(user_id, ())
+                if last_event_id is not None and n.id > last_event_id
+            ]
+
+        last_sent = last_event_id or 0
+        try:
+            for notification in backlog:
+                last_sent = notification.id
+                yield notification
+            queue = subscriber[1]
+            while True:
+                try:
+                    notification = await asyncio.wait_for(queue.get(), timeout=heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                # Skip anything already replayed from history
+                if notification.id <= last_sent:
+                    continue
+                last_sent = notification.id
+                yield notification
+        finally:
+            with self._lock:
+                self._subscribers[user_id].discard(subscriber)
+                if not self._subscribers[user_id]:
+                    del self._subscribers[user_id]
+
+
+# Allocate the next notification ID (one more than the last, but at least the caller's clock
+# in microseconds) and publish "<id> <notification JSON>" in one step, so events reach the
+# channel in ID order. KEYS: the ID counter; ARGV: clock, channel, notification JSON.
+PUBLISH_LUA = """
+local id = redis.call('INCR', KEYS[1])
+local now = tonumber(ARGV[1])
+if id < now then
+    redis.call('SET', KEYS[1], ARGV[1])
+    id = now
+end
+redis.call('PUBLISH', ARGV[2], string.format('%d', id) .. ' ' .. ARGV[3])
+return id
+"""
+
+
+class RedisNotificationBroker(NotificationBroker):
+    """
+    Broker that publishes through Redis so every worker's subscribers receive each event.
+    Publishing goes through the shared async connection and its circuit breaker on the
+    application's event loop, without the caller waiting for it; only the channel listener,
+    a thread, keeps a synchronous client of its own.
+    """
+
+    channel = "notifications"
+    id_key = "notifications:last_id"
+
+    def __init__(self, connection: RedisConnection, history_size: int = 100, max_history_users: int = 10000):
+        super().__init__(history_size, max_history_users)
+        self.connection = connection
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener = None
+        self._pubsub = None
+        self._running = False
+
+    def start(self):
+        """Subscribe to the shared channel and relay events to local subscribers; call on the event loop"""
+        if self._running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._running = True
+        self._listener = threading.Thread(target=self._listen, name="notification-listener", daemon=True)
+        self._listener.start()
+
+    def stop(self):
+        self._running = False
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub:
+            pubsub.close()
+        self._listener = None
+        self._loop = None
+
+    def publish(self, user_id: int, event_type: str, data: Optional[Dict[str, Any]] = None) -> Notification:
+        """Publish an event to a user's stream. Safe to call from any thread; the ID is set once sent."""
+        notification = Notification(
+            id=0,
+            user_id=user_id,
+            type=event_type,
+            data=data or {},
+            created_at=datetime.now().isoformat()
+        )
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            # Not started (scripts): only this process's subscribers can be reached
+            notification.id = self._allocate_id()
+            self._deliver(notification)
+        else:
+            asyncio.run_coroutine_threadsafe(self._send(notification), loop)
+        return notification
+
+    async def _send(self, notification: Notification):
+        # Callers publish after committing, so a Redis outage must not fail the request
+        payload = notification.to_json()
+        try:
+            script = self.connection.script(PUBLISH_LUA)
+            notification.id = int(await self.connection.execute(
+                lambda client: script(keys=[self.id_key], args=[time.time_ns() // 1000, self.channel, payload])
+            ))
+        except RedisUnavailableError as e:
+            logger.error(f"Redis notification publish failed: {e}")
+            # Still reach subscribers connected to this worker, with an ID from the local clock
+            notification.id = self._allocate_id()
+            self._deliver(notification)
+
+    def _listen(self):
+        while self._running:
+            try:
+                client = redis.Redis.from_url(
+                    self.connection.url,
+                    decode_responses=True,
+                    socket_connect_timeout=self.connection.socket_timeout,
+                    health_check_interval=30
+                )
+                pubsub = self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self._deliver(Notification.from_message(message["data"]))
+                    except Exception as e:
+                        logger.error(f"Invalid notification payload: {e}")
+            except Exception as e:
+                if not self._running:
+                    return
+                logger.error(f"Redis notification listener disconnected, retrying: {e}")
+                time.sleep(self.connection.reset_seconds)
+
+
+def _create_broker() -> NotificationBroker:
+    """Create the broker selected by settings, falling back to in-process"""
+    if settings.notification_backend == "redis":
+        if redis is not None and redis_connection.configured:
+            # Nothing connects here; the listener connects when the app starts
+            return RedisNotificationBroker(
+                redis_connection, settings.notification_history_size, settings.notification_history_users
+            )
+        logger.warning("NOTIFICATION_BACKEND is redis but Redis is not configured, using in-process notifications")
+    return NotificationBroker(settings.notification_history_size, settings.notification_history_users)
+
+
+# Global instance
+notification_broker = _create_broker()
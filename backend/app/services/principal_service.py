@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.models.user import User
+from app.utils.ttl_cache import create_ttl_cache
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as seen by routes: profile columns only, no ORM state"""
+    id: int
+    name: str
+    email: str
+    avatar: Optional[str]
+    joined_at: Optional[datetime]
+
+
+class PrincipalService:
+    """Service caching the authenticated user's principal so most requests skip the users lookup"""
+
+    def __init__(self):
+        self.cache = create_ttl_cache("principals", settings.principal_cache_ttl_seconds)
+
+    def get(self, user_id: int, db: Session) -> Optional[Principal]:
+        """Get a user's principal, or None if the user doesn't exist"""
+        principal = self.cache.get(user_id)
+        if principal is not None:
+            return principal
+        row = db.execute(
+            select(User.id, User.name, User.email, User.avatar, User.joined_at).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        principal = Principal(**row._mapping)
+        self.cache.set(user_id, principal)
+        return principal
+
+    def invalidate(self, user_id: int):
+        """Drop a cached principal; call after committing changes to (or deleting) the user"""
+        self.cache.invalidate(user_id)
+
+
+# Global instance
+principal_service = PrincipalService()
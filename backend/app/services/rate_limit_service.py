@@ -1,254 +1,486 @@
 """
 Rate limiting service for AI API requests.
-Provides rate limiting functionality with in-memory storage for development
-and Redis support for production environments.
+Limits are enforced with the generic cell rate algorithm (GCRA): every user and window keeps
+a single "theoretical arrival time", so state is constant per user however many requests
+they make. The per-minute, per-hour and per-day windows are checked together in one call,
+and the check and the consumption of a request are one atomic operation, with in-memory
+storage for development, a shared memory table for several workers on one host and Redis
+(a Lua script, one round trip on the shared async client) for production environments.
 """
 
-import json
+import asyncio
 import logging
+import math
+import struct
+import threading
 import time
-from collections import defaultdict
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from typing import (Callable, Dict, Hashable, List, Optional, Sequence, Set,
+                    Tuple)
 
 from app.core.config import settings
+from app.core.redis_client import (RedisConnection, RedisUnavailableError,
+                                   redis_connection)
+from app.core.shared_memory import SharedMemoryTable, open_shared_table
 
 logger = logging.getLogger(__name__)
 
 @dataclass
-class RateLimitInfo:
-    """Information about rate limiting for a user"""
-    requests_made: int
-    requests_remaining: int
-    reset_time: datetime
-    is_limited: bool
+class RateLimitDecision:
+    """Outcome of acquire, with the values of the most restrictive window for the headers"""
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_at: float  # Epoch seconds when the window is free again (or the request would fit)
+    retry_after: float  # Seconds to wait before retrying (0 when allowed)
+    window_seconds: int
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_at)),
+            "X-RateLimit-Window": str(self.window_seconds)
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+@dataclass(frozen=True)
+class RateLimitWindow:
+    """At most limit requests per period, allowed in bursts of up to limit"""
+    name: str
+    limit: int
+    period_seconds: int
+
+    @property
+    def emission_interval(self) -> float:
+        """Time one request occupies in the window"""
+        return self.period_seconds / self.limit
+
+@dataclass
+class WindowResult:
+    window: RateLimitWindow
+    allowed: bool
+    remaining: int
+    reset_after: float  # Seconds until the window is completely free again
+    retry_after: float  # Seconds until the request would be allowed (0 when allowed)
+
+def default_windows() -> List[RateLimitWindow]:
+    """The AI request windows from the settings; a limit of 0 disables a window"""
+    windows = [
+        RateLimitWindow("minute", settings.ai_requests_per_minute, 60),
+        RateLimitWindow("hour", settings.ai_requests_per_hour, 3600),
+        RateLimitWindow("day", settings.ai_requests_per_day, 86400),
+    ]
+    return [window for window in windows if window.limit > 0]
+
+def evaluate_gcra(
+    windows: Sequence[RateLimitWindow],
+    tats: Sequence[Optional[float]],
+    now: float,
+    cost: int = 1,
+    dry_run: bool = False,
+    force: bool = False
+) -> Tuple[bool, List[float], List[WindowResult]]:
+    """
+    Decide whether a request of the given cost fits every window.
+    tats are the stored theoretical arrival times (None when unknown). Returns whether the
+    request is allowed, the arrival times to store if it is (or if it is forced), and the
+    per-window results, which describe the state after the request (before it, for a dry run).
+    A negative cost refunds earlier requests, down to an empty window.
+    """
+    new_tats = []
+    results = []
+    for window, stored in zip(windows, tats):
+        interval = window.emission_interval
+        tat = max(stored if stored is not None else now, now)
+        new_tat = max(tat + interval * cost, now)
+        # The request fits if the window doesn't overflow by accepting it
+        allow_at = new_tat - window.period_seconds
+        allowed = allow_at <= now
+        used_until = new_tat if (allowed or force) and not dry_run else tat
+        results.append(WindowResult(
+            window=window,
+            allowed=allowed,
+            remaining=max(0, int((window.period_seconds - (used_until - now)) / interval + 1e-9)),
+            reset_after=used_until - now,
+            retry_after=0.0 if allowed else allow_at - now
+        ))
+        new_tats.append(new_tat)
+    return all(result.allowed for result in results), new_tats, results
+
+# Redis version of evaluate_gcra: applies the request atomically on the server and returns
+# the server time and the arrival times it read, from which the caller derives the results.
+# KEYS: one per window; ARGV: cost, mode (0 normal, 1 dry run, 2 forced), then period and
+# limit of every window.
+GCRA_LUA = """
+if redis.replicate_commands then redis.replicate_commands() end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local dry_run = ARGV[2] == '1'
+local force = ARGV[2] == '2'
+local stored = redis.call('MGET', unpack(KEYS))
+local new_tats = {}
+local allowed = true
+for i = 1, #KEYS do
+    local period = tonumber(ARGV[1 + 2 * i])
+    local limit = tonumber(ARGV[2 + 2 * i])
+    local tat = math.max(tonumber(stored[i]) or now, now)
+    new_tats[i] = math.max(tat + period / limit * cost, now)
+    if new_tats[i] - period > now then allowed = false end
+end
+if (allowed or force) and not dry_run then
+    for i = 1, #KEYS do
+        redis.call('SET', KEYS[i], string.format('%.6f', new_tats[i]),
+                   'PX', math.max(1, math.ceil((new_tats[i] - now) * 1000)))
+    end
+end
+local result = {string.format('%.6f', now)}
+for i = 1, #KEYS do result[i + 1] = stored[i] or '' end
+return result
+"""
+
+# Users per shard of the in-memory store before it is split further, and the most shards
+MEMORY_SHARD_KEYS = 1024
+MAX_MEMORY_SHARDS = 64
+
+class _MemoryShard:
+    """One lock's share of a MemoryRateLimitStore: a bounded map of arrival times and its idle buckets"""
+
+    def __init__(self, max_keys: int, bucket_seconds: int, now: float):
+        self.max_keys = max_keys
+        self.bucket_seconds = bucket_seconds
+        self.tats: "OrderedDict[Hashable, Tuple[float, ...]]" = OrderedDict()  # least recently used first
+        self.buckets: Dict[int, Set[Hashable]] = {}  # idle-from bucket -> keys
+        self.swept_bucket = self._bucket(now)
+        self.peak_keys = 0
+        self.lock = threading.Lock()
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+
+    def _bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def acquire(self, key: Hashable, windows: Sequence[RateLimitWindow], now: float, cost: int, dry_run: bool,
+                force: bool) -> Tuple[bool, List[WindowResult]]:
+        with self.lock:
+            if self._bucket(now) > self.swept_bucket:
+                self.evict_idle(now)
+            stored = self.tats.get(key)
+            allowed, new_tats, results = evaluate_gcra(windows, stored or [None] * len(windows), now, cost, dry_run, force)
+            if (allowed or force) and not dry_run:
+                self._store(key, stored, tuple(new_tats))
+        return allowed, results
+
+    def _store(self, key: Hashable, old: Optional[Tuple[float, ...]], new: Tuple[float, ...]):
+        bucket = self._bucket(max(new))
+        if old is None:
+            if len(self.tats) >= self.max_keys:
+                evicted, tats = self.tats.popitem(last=False)
+                self.unfile(evicted, tats)
+                self.evicted_lru += 1
+        else:
+            self.tats.move_to_end(key)
+            if self._bucket(max(old)) != bucket:
+                self.unfile(key, old)
+        self.tats[key] = new
+        self.peak_keys = max(self.peak_keys, len(self.tats))
+        self.buckets.setdefault(bucket, set()).add(key)
+
+    def unfile(self, key: Hashable, tats: Tuple[float, ...]):
+        bucket = self._bucket(max(tats))
+        keys = self.buckets.get(bucket)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.buckets[bucket]
+
+    def evict_idle(self, now: float):
+        """Drop the users whose bucket ended before now (every arrival time is in the past). Call with the lock held."""
+        current = self._bucket(now)
+        for bucket in sorted(b for b in self.buckets if b < current):
+            for key in self.buckets.pop(bucket):
+                del self.tats[key]
+                self.evicted_idle += 1
+        self.swept_bucket = current
+        if len(self.tats) < self.peak_keys // 4:
+            # Dicts never shrink their tables on delete; copy to give the memory back
+            self.tats = OrderedDict(self.tats)
+            self.peak_keys = len(self.tats)
+
+class MemoryRateLimitStore:
+    """
+    Arrival times per user in a bounded map; each check-and-consume is one short critical section.
+    A user whose arrival times are all in the past is in the same state as an unknown user, so
+    entries are filed in time buckets by that moment and dropped when their bucket has passed.
+    Beyond max_keys users the least recently used entry is dropped, which gives that user a
+    fresh allowance; size max_keys above the number of users active within the longest window.
+    Large stores are split into shards with their own locks and LRU order, so dropping idle
+    users and shrinking the map only ever stalls the users of one shard.
+    """
+
+    def __init__(self, max_keys: int = settings.rate_limit_max_tracked_users, bucket_seconds: int = 60,
+                 clock: Callable[[], float] = time.time):
+        self.max_keys = max(1, max_keys)
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        shard_count = max(1, min(MAX_MEMORY_SHARDS, self.max_keys // MEMORY_SHARD_KEYS))
+        now = clock()
+        self._shards = [
+            _MemoryShard(max(1, self.max_keys // shard_count), bucket_seconds, now)
+            for _ in range(shard_count)
+        ]
+
+    @property
+    def evicted_idle(self) -> int:
+        return sum(shard.evicted_idle for shard in self._shards)
+
+    @property
+    def evicted_lru(self) -> int:
+        return sum(shard.evicted_lru for shard in self._shards)
+
+    def _shard(self, key: Hashable) -> _MemoryShard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def acquire(self, key: Hashable, windows: Sequence[RateLimitWindow], cost: int, dry_run: bool,
+                force: bool = False) -> Tuple[bool, List[WindowResult], float]:
+        now = self.clock()
+        allowed, results = self._shard(key).acquire(key, windows, now, cost, dry_run, force)
+        return allowed, results, now
+
+    async def acquire_async(self, key: Hashable, windows: Sequence[RateLimitWindow], cost: int, dry_run: bool,
+                            force: bool = False) -> Tuple[bool, List[WindowResult], float]:
+        """acquire for coroutines; the shard locks are only held briefly by this process's threads"""
+        return self.acquire(key, windows, cost, dry_run, force)
+
+    def sweep(self):
+        """Drop idle users from every shard now, one shard lock at a time (each shard also does it on its own use)"""
+        now = self.clock()
+        for shard in self._shards:
+            with shard.lock:
+                shard.evict_idle(now)
+
+    def delete(self, key: Hashable):
+        shard = self._shard(key)
+        with shard.lock:
+            tats = shard.tats.pop(key, None)
+            if tats is not None:
+                shard.unfile(key, tats)
+
+    async def delete_async(self, key: Hashable):
+        self.delete(key)
+
+    def items(self) -> List[Tuple[Hashable, float]]:
+        """(key, arrival time) for every stored window"""
+        items = []
+        for shard in self._shards:
+            with shard.lock:
+                items.extend((key, tat) for key, tats in shard.tats.items() for tat in tats)
+        return items
+
+    def __len__(self) -> int:
+        return sum(len(shard.tats) for shard in self._shards)
+
+class SharedRateLimitStore:
+    """
+    Arrival times per user in a shared memory table, so all worker processes on the host
+    enforce one limit. A user's slot is free again once all their arrival times have passed;
+    when none is free nearby, the entry closest to expiring is replaced.
+    """
+
+    def __init__(self, table: SharedMemoryTable, window_count: int, clock: Callable[[], float] = time.time):
+        self.table = table
+        self.clock = clock
+        self._format = struct.Struct(f"<{window_count}d")
+
+    @property
+    def evicted_idle(self) -> int:
+        return self.table.evicted_expired
+
+    @property
+    def evicted_lru(self) -> int:
+        return self.table.evicted_live
+
+    def acquire(self, key: Hashable, windows: Sequence[RateLimitWindow], cost: int, dry_run: bool,
+                force: bool = False) -> Tuple[bool, List[WindowResult], float]:
+        now = self.clock()
+        table_key = str(key).encode()
+        with self.table.locked():
+            value = self.table.get(table_key, now)
+            stored = self._format.unpack(value) if value else [None] * len(windows)
+            allowed, new_tats, results = evaluate_gcra(windows, stored, now, cost, dry_run, force)
+            if (allowed or force) and not dry_run:
+                self.table.put(table_key, self._format.pack(*new_tats), max(new_tats), now)
+        return allowed, results, now
+
+    async def acquire_async(self, key: Hashable, windows: Sequence[RateLimitWindow], cost: int, dry_run: bool,
+                            force: bool = False) -> Tuple[bool, List[WindowResult], float]:
+        """acquire for coroutines: waits for a table locked by another worker without blocking the event loop"""
+        return await self.table.run_locked(lambda: self.acquire(key, windows, cost, dry_run, force))
+
+    def delete(self, key: Hashable):
+        self.table.delete(str(key).encode())
+
+    async def delete_async(self, key: Hashable):
+        await self.table.run_locked(lambda: self.delete(key))
+
+    def items(self) -> List[Tuple[str, float]]:
+        """(key digest, arrival time) for every stored window"""
+        return [
+            (digest.hex(), tat)
+            for digest, _expires_at, value in self.table.items(self.clock())
+            for tat in self._format.unpack(value)
+        ]
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.table.items(self.clock()))
+
+class RedisRateLimitStore:
+    """Arrival times in Redis keys that expire once the window is free; one script call per check"""
+
+    def __init__(self, connection: RedisConnection, key_prefix: str):
+        self.connection = connection
+        self.key_prefix = key_prefix
+
+    async def acquire(self, keys: List[str], windows: Sequence[RateLimitWindow], cost: int, dry_run: bool,
+                      force: bool = False) -> Tuple[bool, List[WindowResult], float]:
+        args = [cost, 1 if dry_run else 2 if force else 0]
+        for window in windows:
+            args += [window.period_seconds, window.limit]
+        script = self.connection.script(GCRA_LUA)
+        now, *stored = await self.connection.execute(lambda client: script(keys=keys, args=args))
+        now = float(now)
+        tats = [float(value) if value else None for value in stored]
+        allowed, _new_tats, results = evaluate_gcra(windows, tats, now, cost, dry_run, force)
+        return allowed, results, now
+
+    async def delete(self, keys: List[str]):
+        await self.connection.execute(lambda client: client.delete(*keys))
+
+    async def items(self) -> List[Tuple[str, float]]:
+        """(user id, arrival time) for every stored window"""
+        async def read(client):
+            keys = [key async for key in client.scan_iter(match=f"{self.key_prefix}:*", count=1000)]
+            values = await client.mget(keys) if keys else []
+            return [(key.split(":")[-2], float(value)) for key, value in zip(keys, values) if value is not None]
+        return await self.connection.execute(read)
 
 class RateLimitService:
     """Service for handling rate limiting of AI requests"""
-    
-    def __init__(self):
-        self.user_requests: Dict[int, List[datetime]] = defaultdict(list)
-        self.redis_client = None
-        self._initialize_redis()
-    
-    def _initialize_redis(self):
-        """Initialize Redis client if available"""
-        try:
-            import redis
-
-            # In production, these would come from environment variables
-            self.redis_client = redis.Redis(
-                host='localhost',
-                port=6379,
-                db=0,
-                decode_responses=True
-            )
-            self.redis_client.ping()  # Test connection
-            logger.info("Redis connected for rate limiting")
-        except (ImportError, Exception) as e:
-            logger.warning(f"Redis not available, using in-memory rate limiting: {e}")
-            self.redis_client = None
-    
-    def check_rate_limit(self, user_id: int) -> RateLimitInfo:
-        """Check if user has exceeded rate limits"""
-        
-        current_time = datetime.now()
-        
-        if self.redis_client:
-            return self._check_rate_limit_redis(user_id, current_time)
+
+    def __init__(
+        self,
+        windows: Optional[List[RateLimitWindow]] = None,
+        connection: RedisConnection = redis_connection,
+        key_prefix: str = "rate_limit:gcra",
+        max_tracked_users: int = settings.rate_limit_max_tracked_users
+    ):
+        self.windows = windows if windows is not None else default_windows()
+        self.key_prefix = key_prefix
+        # Without Redis (or while it is down) limits live in this process, or in shared memory
+        # for all workers on the host when SHARED_MEMORY_DIR is set
+        table = None
+        if self.windows:
+            table = open_shared_table(key_prefix.replace(":", "_"), max_tracked_users * 5 // 4, 8 * len(self.windows))
+        if table is not None:
+            self.memory_store = SharedRateLimitStore(table, len(self.windows))
         else:
-            return self._check_rate_limit_memory(user_id, current_time)
-    
-    def _check_rate_limit_memory(self, user_id: int, current_time: datetime) -> RateLimitInfo:
-        """Check rate limit using in-memory storage"""
-        
-        # Get user's request history
-        user_requests = self.user_requests[user_id]
-        
-        # Clean old requests (older than 1 hour)
-        one_hour_ago = current_time - timedelta(hours=1)
-        user_requests[:] = [req_time for req_time in user_requests if req_time > one_hour_ago]
-        
-        # Check limits
-        requests_made = len(user_requests)
-        requests_remaining = max(0, settings.ai_requests_per_hour - requests_made)
-        is_limited = requests_made >= settings.ai_requests_per_hour
-        
-        # Calculate reset time (next hour)
-        reset_time = current_time.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-        
-        return RateLimitInfo(
-            requests_made=requests_made,
-            requests_remaining=requests_remaining,
-            reset_time=reset_time,
-            is_limited=is_limited
-        )
-    
-    def _check_rate_limit_redis(self, user_id: int, current_time: datetime) -> RateLimitInfo:
-        """Check rate limit using Redis storage"""
-        
-        try:
-            # Redis key for user requests
-            key = f"rate_limit:user:{user_id}"
-            
-            # Get current requests count
-            requests_made = self.redis_client.get(key)
-            if requests_made is None:
-                requests_made = 0
-            else:
-                requests_made = int(requests_made)
-            
-            # Check if limited
-            is_limited = requests_made >= settings.ai_requests_per_hour
-            requests_remaining = max(0, settings.ai_requests_per_hour - requests_made)
-            
-            # Calculate reset time (next hour)
-            reset_time = current_time.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
-            
-            return RateLimitInfo(
-                requests_made=requests_made,
-                requests_remaining=requests_remaining,
-                reset_time=reset_time,
-                is_limited=is_limited
-            )
-            
-        except Exception as e:
-            logger.error(f"Redis rate limit check failed: {e}")
-            # Fallback to memory-based rate limiting
-            return self._check_rate_limit_memory(user_id, current_time)
-    
-    def increment_request_count(self, user_id: int) -> bool:
-        """Increment request count for user. Returns True if successful, False if rate limited."""
-        
-        current_time = datetime.now()
-        
-        # Check current rate limit
-        rate_limit_info = self.check_rate_limit(user_id)
-        
-        if rate_limit_info.is_limited:
-            return False
-        
-        # Increment counter
-        if self.redis_client:
-            self._increment_redis(user_id, current_time)
+            self.memory_store = MemoryRateLimitStore(max_tracked_users)
+        # Limits are shared across workers through Redis when it is configured
+        self.redis_store = RedisRateLimitStore(connection, key_prefix) if connection.configured else None
+
+    def _keys(self, user_id: int) -> List[str]:
+        return [f"{self.key_prefix}:{user_id}:{window.name}" for window in self.windows]
+
+    async def acquire(self, user_id: int, cost: int = 1) -> RateLimitDecision:
+        """Check every window and count the request if it fits, in one atomic operation"""
+        return await self._acquire(user_id, cost, dry_run=False)
+
+    async def peek(self, user_id: int) -> RateLimitDecision:
+        """Whether the user's next request would be allowed, without counting it"""
+        return await self._acquire(user_id, 1, dry_run=True)
+
+    async def adjust(self, user_id: int, cost: int) -> RateLimitDecision:
+        """Charge cost units even if they don't fit (or refund them, when negative), e.g. to settle an estimate"""
+        return await self._acquire(user_id, cost, dry_run=False, force=True)
+
+    async def _acquire(self, user_id: int, cost: int, dry_run: bool, force: bool = False) -> RateLimitDecision:
+        if not self.windows:
+            return RateLimitDecision(True, 0, 0, time.time(), 0.0, 0)
+        outcome = None
+        if self.redis_store is not None:
+            try:
+                outcome = await self.redis_store.acquire(self._keys(user_id), self.windows, cost, dry_run, force)
+            except RedisUnavailableError:
+                # Fallback to memory-based rate limiting (per worker) while Redis is unreachable
+                pass
+        if outcome is None:
+            outcome = await self.memory_store.acquire_async(user_id, self.windows, cost, dry_run, force)
+        allowed, results, now = outcome
+
+        # Report the window that limits the user the most
+        if allowed:
+            result = min(results, key=lambda r: (r.remaining, -r.window.period_seconds))
         else:
-            self._increment_memory(user_id, current_time)
-        
-        return True
-    
-    def _increment_memory(self, user_id: int, current_time: datetime):
-        """Increment counter in memory"""
-        self.user_requests[user_id].append(current_time)
-    
-    def _increment_redis(self, user_id: int, current_time: datetime):
-        """Increment counter in Redis"""
-        try:
-            key = f"rate_limit:user:{user_id}"
-            
-            # Use Redis pipeline for atomic operations
-            pipe = self.redis_client.pipeline()
-            pipe.incr(key)
-            pipe.expire(key, 3600)  # Expire after 1 hour
-            pipe.execute()
-            
-        except Exception as e:
-            logger.error(f"Redis increment failed: {e}")
-            # Fallback to memory
-            self._increment_memory(user_id, current_time)
-    
-    def get_rate_limit_headers(self, user_id: int) -> Dict[str, str]:
-        """Get rate limit headers for HTTP responses"""
-        
-        rate_limit_info = self.check_rate_limit(user_id)
-        
-        return {
-            "X-RateLimit-Limit": str(settings.ai_requests_per_hour),
-            "X-RateLimit-Remaining": str(rate_limit_info.requests_remaining),
-            "X-RateLimit-Reset": str(int(rate_limit_info.reset_time.timestamp())),
-            "X-RateLimit-Window": "3600"  # 1 hour in seconds
-        }
-    
-    def reset_user_rate_limit(self, user_id: int) -> bool:
+            result = max((r for r in results if not r.allowed), key=lambda r: r.retry_after)
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=result.window.limit,
+            remaining=result.remaining,
+            reset_at=now + (result.reset_after if allowed else result.retry_after),
+            retry_after=result.retry_after,
+            window_seconds=result.window.period_seconds
+        )
+
+    async def reset_user_rate_limit(self, user_id: int) -> bool:
         """Reset rate limit for a user (admin function)"""
-        
+
         try:
-            if self.redis_client:
-                key = f"rate_limit:user:{user_id}"
-                self.redis_client.delete(key)
-            else:
-                if user_id in self.user_requests:
-                    del self.user_requests[user_id]
-            
+            await self.memory_store.delete_async(user_id)
+            if self.redis_store is not None:
+                await self.redis_store.delete(self._keys(user_id))
             logger.info(f"Rate limit reset for user {user_id}")
             return True
-            
+
         except Exception as e:
             logger.error(f"Failed to reset rate limit for user {user_id}: {e}")
             return False
-    
-    def get_global_stats(self) -> Dict[str, int]:
+
+    async def get_global_stats(self) -> Dict[str, int]:
         """Get global rate limiting statistics"""
-        
-        if self.redis_client:
-            return self._get_redis_stats()
-        else:
-            return self._get_memory_stats()
-    
-    def _get_memory_stats(self) -> Dict[str, int]:
-        """Get statistics from memory storage"""
-        
-        current_time = datetime.now()
-        one_hour_ago = current_time - timedelta(hours=1)
-        
-        total_users = len(self.user_requests)
-        total_requests = 0
-        active_users = 0
-        
-        for user_id, requests in self.user_requests.items():
-            # Filter recent requests
-            recent_requests = [req for req in requests if req > one_hour_ago]
-            total_requests += len(recent_requests)
-            
-            if recent_requests:
-                active_users += 1
-        
-        return {
-            "total_users": total_users,
-            "active_users": active_users,
-            "total_requests": total_requests,
-            "requests_per_hour_limit": settings.ai_requests_per_hour
+
+        items = None
+        if self.redis_store is not None:
+            try:
+                items = await self.redis_store.items()
+            except RedisUnavailableError as e:
+                logger.error(f"Failed to get Redis stats: {e}")
+        if items is None:
+            # A full scan, under the shared table's lock; keep it off the event loop
+            items = await asyncio.to_thread(self.memory_store.items)
+
+        now = time.time()
+        stats = {
+            "total_users": len({str(user) for user, _ in items}),
+            "active_users": len({str(user) for user, tat in items if tat > now}),
+            "tracked_windows": len(items),
+            "evicted_idle_users": self.memory_store.evicted_idle,
+            "evicted_lru_users": self.memory_store.evicted_lru
         }
-    
-    def _get_redis_stats(self) -> Dict[str, int]:
-        """Get statistics from Redis storage"""
-        
-        try:
-            # Get all rate limit keys
-            keys = self.redis_client.keys("rate_limit:user:*")
-            
-            total_users = len(keys)
-            total_requests = 0
-            active_users = 0
-            
-            for key in keys:
-                count = self.redis_client.get(key)
-                if count:
-                    count = int(count)
-                    total_requests += count
-                    if count > 0:
-                        active_users += 1
-            
-            return {
-                "total_users": total_users,
-                "active_users": active_users,
-                "total_requests": total_requests,
-                "requests_per_hour_limit": settings.ai_requests_per_hour
-            }
-            
-        except Exception as e:
-            logger.error(f"Failed to get Redis stats: {e}")
-            return self._get_memory_stats()
+        for window in self.windows:
+            stats[f"requests_per_{window.name}_limit"] = window.limit
+        return stats
+
+class SensitiveOperationLimiter(RateLimitService):
+    """Per-user limit on sensitive account operations such as password changes or account deletion"""
+
+    def __init__(self, limit: int, period_seconds: int, name: str = "sensitive"):
+        windows = [RateLimitWindow(name, limit, period_seconds)] if limit > 0 else []
+        super().__init__(windows, key_prefix=f"rate_limit:{name}")
 
-# Global instance
-rate_limit_service = RateLimitService() 
\ No newline at end of file
+# Global instances
+rate_limit_service = RateLimitService()
+sensitive_operation_limiter = SensitiveOperationLimiter(settings.sensitive_operations_per_hour, 3600)
@@ -0,0 +1,319 @@
+"""
+Full-text search over a user's chat messages, milestones and roadmaps.
+On SQLite the documents live in an FTS5 table kept in sync by triggers; on Postgres the
+source tables are searched through tsvector expression indexes.
+Snippets are HTML: the matched text is escaped and only the <mark> highlights are markup.
+"""
+
+import html
+import logging
+import re
+from typing import List, Optional
+
+from app.models.chat_message import ChatMessage
+from app.models.milestone import Milestone
+from app.models.roadmap import Roadmap
+from app.schemas.search import SearchResult
+from sqlalchemy import func, literal, select, text, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Result types and their code in the FTS rowid (rowid = source id * KIND_SLOTS + code),
+# which lets the triggers find a document by primary key
+CHAT_MESSAGE = "chat_message"
+MILESTONE = "milestone"
+ROADMAP = "roadmap"
+KIND_CODES = {CHAT_MESSAGE: 1, MILESTONE: 2, ROADMAP: 3}
+KIND_SLOTS = 4
+
+MAX_RESULTS = 50
+SNIPPET_TOKENS = 12
+
+# Highlight delimiters from the database (private use characters), turned into <mark> tags
+# after the snippet text is escaped
+MARK_START = "\ue000"
+MARK_END = "\ue001"
+
+# The owner column holds one token per document ('u' + user ID). Matching it together with
+# the query lets FTS5 intersect with the user's documents instead of filtering a global match.
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title, body, owner,
+        kind UNINDEXED, ref_id UNINDEXED, user_id UNINDEXED, roadmap_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    # Chat messages
+    """CREATE TRIGGER IF NOT EXISTS search_chat_insert AFTER INSERT ON chat_messages BEGIN
+        INSERT INTO search_index (rowid, title, body, owner, kind, ref_id, user_id, roadmap_id)
+        VALUES (new.id * 4 + 1, '', new.content, 'u' || new.user_id, 'chat_message', new.id, new.user_id, new.roadmap_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_chat_update AFTER UPDATE OF content ON chat_messages BEGIN
+        UPDATE search_index SET body = new.content WHERE rowid = new.id * 4 + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_chat_delete AFTER DELETE ON chat_messages BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 1;
+    END""",
+    # Archived chat messages keep their documents until their segment is deleted
+    """CREATE TRIGGER IF NOT EXISTS search_chat_archive_delete AFTER DELETE ON chat_archive_segments BEGIN
+        DELETE FROM search_index
+        WHERE rowid BETWEEN old.first_message_id * 4 + 1 AND old.last_message_id * 4 + 1
+          AND kind = 'chat_message' AND roadmap_id = old.roadmap_id;
+    END""",
+    # Milestones (the owner comes from the roadmap)
+    """CREATE TRIGGER IF NOT EXISTS search_milestone_insert AFTER INSERT ON milestones BEGIN
+        INSERT INTO search_index (rowid, title, body, owner, kind, ref_id, user_id, roadmap_id)
+        SELECT new.id * 4 + 2, new.title, coalesce(new.description, ''), 'u' || user_id, 'milestone', new.id,
+               user_id, new.roadmap_id
+        FROM roadmaps WHERE id = new.roadmap_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_milestone_update AFTER UPDATE OF title, description ON milestones BEGIN
+        UPDATE search_index SET title = new.title, body = coalesce(new.description, '')
+        WHERE rowid = new.id * 4 + 2;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_milestone_delete AFTER DELETE ON milestones BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 2;
+    END""",
+    # Roadmaps
+    """CREATE TRIGGER IF NOT EXISTS search_roadmap_insert AFTER INSERT ON roadmaps BEGIN
+        INSERT INTO search_index (rowid, title, body, owner, kind, ref_id, user_id, roadmap_id)
+        VALUES (new.id * 4 + 3, new.title, coalesce(new.description, ''), 'u' || new.user_id, 'roadmap', new.id,
+                new.user_id, new.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_roadmap_update AFTER UPDATE OF title, description ON roadmaps BEGIN
+        UPDATE search_index SET title = new.title, body = coalesce(new.description, '')
+        WHERE rowid = new.id * 4 + 3;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_roadmap_delete AFTER DELETE ON roadmaps BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 3;
+    END""",
+]
+
+SQLITE_TRIGGERS = re.findall(r"CREATE TRIGGER IF NOT EXISTS (\w+)", "\n".join(SQLITE_SCHEMA))
+
+SQLITE_REBUILD = [
+    "DELETE FROM search_index",
+    """INSERT INTO search_index (rowid, title, body, owner, kind, ref_id, user_id, roadmap_id)
+       SELECT id * 4 + 1, '', content, 'u' || user_id, 'chat_message', id, user_id, roadmap_id FROM chat_messages""",
+    """INSERT INTO search_index (rowid, title, body, owner, kind, ref_id, user_id, roadmap_id)
+       SELECT m.id * 4 + 2, m.title, coalesce(m.description, ''), 'u' || r.user_id, 'milestone', m.id,
+              r.user_id, m.roadmap_id
+       FROM milestones m JOIN roadmaps r ON r.id = m.roadmap_id""",
+    """INSERT INTO search_index (rowid, title, body, owner, kind, ref_id, user_id, roadmap_id)
+       SELECT id * 4 + 3, title, coalesce(description, ''), 'u' || user_id, 'roadmap', id, user_id, id
+       FROM roadmaps""",
+]
+
+POSTGRES_SCHEMA = [
+    """CREATE INDEX IF NOT EXISTS ix_chat_messages_search
+       ON chat_messages USING gin (to_tsvector('english', content))""",
+    """CREATE INDEX IF NOT EXISTS ix_milestones_search
+       ON milestones USING gin (to_tsvector('english', title || ' ' || coalesce(description, '')))""",
+    """CREATE INDEX IF NOT EXISTS ix_roadmaps_search
+       ON roadmaps USING gin (to_tsvector('english', title || ' ' || coalesce(description, '')))""",
+]
+
+
+def owner_token(user_id: int) -> str:
+    return f"u{user_id}"
+
+
+def build_match_query(query: str, user_id: int) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query over the user's documents: every word must match
+    the title or body, the last one as a prefix
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return f'owner : "{owner_token(user_id)}" AND {{title body}} : ({" AND ".join(terms)})'
+
+
+def highlight(snippet: str) -> str:
+    """Escape a snippet for HTML and turn the highlight delimiters into <mark> tags"""
+    return html.escape(snippet).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+class SearchService:
+    """Service maintaining and querying the full-text search index"""
+
+    def __init__(self):
+        self.available = False
+
+    def ensure_index(self, engine: Engine):
+        """Create the search index and its triggers if missing, filling it from existing rows"""
+        try:
+            with engine.begin() as connection:
+                if engine.dialect.name == "postgresql":
+                    for statement in POSTGRES_SCHEMA:
+                        connection.execute(text(statement))
+                elif engine.dialect.name == "sqlite":
+                    exists = connection.execute(text(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+                    )).first()
+                    if exists and not self._has_owner_column(connection):
+                        # Index from before the owner column: recreate it with its triggers
+                        for trigger in SQLITE_TRIGGERS:
+                            connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+                        connection.execute(text("DROP TABLE search_index"))
+                        exists = None
+                    for statement in SQLITE_SCHEMA:
+                        connection.execute(text(statement))
+                    if not exists:
+                        for statement in SQLITE_REBUILD:
+                            connection.execute(text(statement))
+                else:
+                    logger.warning(f"Full-text search is not supported on {engine.dialect.name}")
+                    return
+            self.available = True
+        except OperationalError as e:
+            # SQLite builds without FTS5
+            logger.warning(f"Full-text search disabled: {e}")
+
+    def _has_owner_column(self, connection) -> bool:
+        columns = connection.execute(text("PRAGMA table_info(search_index)")).all()
+        return any(column[1] == "owner" for column in columns)
+
+    def index_chat_messages(self, db: Session, messages: List[ChatMessage]):
+        """Add documents for chat messages that left the chat_messages table (archived messages)"""
+        if not messages or db.get_bind().dialect.name != "sqlite" or not self._sqlite_index_exists(db):
+            return
+        db.execute(text(
+            "INSERT OR REPLACE INTO search_index (rowid, title, body, owner, kind, ref_id, user_id, roadmap_id) "
+            "VALUES (:rowid, '', :body, :owner, 'chat_message', :ref_id, :user_id, :roadmap_id)"
+        ), [
+            {
+                "rowid": message.id * KIND_SLOTS + KIND_CODES[CHAT_MESSAGE],
+                "body": message.content,
+                "owner": owner_token(message.user_id),
+                "ref_id": message.id,
+                "user_id": message.user_id,
+                "roadmap_id": message.roadmap_id,
+            }
+            for message in messages
+        ])
+
+    def _sqlite_index_exists(self, db: Session) -> bool:
+        return db.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+        )).first() is not None
+
+    def rebuild(self, db: Session):
+        """
+        Refill the SQLite index from the source tables. Archived chat messages are not in them;
+        ChatArchiveService.rebuild_search_index() rebuilds the index including those.
+        """
+        self.refill(db)
+        db.commit()
+
+    def refill(self, db: Session):
+        """Replace every document with those of the source tables, in the caller's transaction"""
+        if db.get_bind().dialect.name != "sqlite":
+            # Postgres searches the source tables directly
+            return
+        for statement in SQLITE_REBUILD:
+            db.execute(text(statement))
+
+    def search(self, user_id: int, query: str, db: Session, limit: int = 20, types: Optional[List[str]] = None) -> List[SearchResult]:
+        """Search the user's chat messages, milestones and roadmaps, best matches first"""
+        limit = max(1, min(limit, MAX_RESULTS))
+        kinds = [kind for kind in KIND_CODES if types is None or kind in types]
+        if not kinds:
+            return []
+        if db.get_bind().dialect.name == "postgresql":
+            return self._search_postgres(user_id, query, db, limit, kinds)
+        return self._search_sqlite(user_id, query, db, limit, kinds)
+
+    def _search_sqlite(self, user_id: int, query: str, db: Session, limit: int, kinds: List[str]) -> List[SearchResult]:
+        match = build_match_query(query, user_id)
+        if match is None:
+            return []
+        kind_params = {f"kind_{i}": kind for i, kind in enumerate(kinds)}
+        rows = db.execute(text(f"""
+            SELECT s.kind, s.ref_id, s.roadmap_id, r.title AS roadmap_title, s.title,
+                   snippet(search_index, 1, :mark_start, :mark_end, '…', {SNIPPET_TOKENS}) AS snippet,
+                   bm25(search_index, 2.0, 1.0, 0.0) AS rank
+            FROM search_index s
+            JOIN roadmaps r ON r.id = s.roadmap_id
+            WHERE search_index MATCH :match
+              AND s.user_id = :user_id
+              AND s.kind IN ({", ".join(":" + name for name in kind_params)})
+            ORDER BY rank
+            LIMIT :limit
+        """), {
+            "match": match, "user_id": user_id, "limit": limit,
+            "mark_start": MARK_START, "mark_end": MARK_END, **kind_params
+        }).mappings().all()
+        return [
+            SearchResult(
+                type=row["kind"],
+                id=row["ref_id"],
+                roadmap_id=row["roadmap_id"],
+                roadmap_title=row["roadmap_title"],
+                title=row["title"] or None,
+                # Matches only in the title leave the body snippet without highlights
+                snippet=highlight(row["snippet"]),
+                score=-row["rank"]
+            )
+            for row in rows
+        ]
+
+    def _search_postgres(self, user_id: int, query: str, db: Session, limit: int, kinds: List[str]) -> List[SearchResult]:
+        ts_query = func.websearch_to_tsquery("english", query)
+        headline_options = f"StartSel={MARK_START}, StopSel={MARK_END}"
+        milestone_document = Milestone.title + " " + func.coalesce(Milestone.description, "")
+        roadmap_document = Roadmap.title + " " + func.coalesce(Roadmap.description, "")
+        selects = {
+            CHAT_MESSAGE: select(
+                literal(CHAT_MESSAGE).label("kind"), ChatMessage.id.label("ref_id"),
+                ChatMessage.roadmap_id.label("roadmap_id"), Roadmap.title.label("roadmap_title"),
+                literal(None).label("title"),
+                func.ts_headline("english", ChatMessage.content, ts_query, headline_options).label("snippet"),
+                func.ts_rank(func.to_tsvector("english", ChatMessage.content), ts_query).label("score"),
+            ).join(Roadmap, Roadmap.id == ChatMessage.roadmap_id).where(
+                ChatMessage.user_id == user_id,
+                func.to_tsvector("english", ChatMessage.content).bool_op("@@")(ts_query)
+            ),
+            MILESTONE: select(
+                literal(MILESTONE).label("kind"), Milestone.id.label("ref_id"),
+                Milestone.roadmap_id.label("roadmap_id"), Roadmap.title.label("roadmap_title"),
+                Milestone.title.label("title"),
+                func.ts_headline("english", func.coalesce(Milestone.description, ""), ts_query, headline_options).label("snippet"),
+                func.ts_rank(func.to_tsvector("english", milestone_document), ts_query).label("score"),
+            ).join(Roadmap, Roadmap.id == Milestone.roadmap_id).where(
+                Roadmap.user_id == user_id,
+                func.to_tsvector("english", milestone_document).bool_op("@@")(ts_query)
+            ),
+            ROADMAP: select(
+                literal(ROADMAP).label("kind"), Roadmap.id.label("ref_id"),
+                Roadmap.id.label("roadmap_id"), Roadmap.title.label("roadmap_title"),
+                Roadmap.title.label("title"),
+                func.ts_headline("english", func.coalesce(Roadmap.description, ""), ts_query, headline_options).label("snippet"),
+                func.ts_rank(func.to_tsvector("english", roadmap_document), ts_query).label("score"),
+            ).where(
+                Roadmap.user_id == user_id,
+                func.to_tsvector("english", roadmap_document).bool_op("@@")(ts_query)
+            ),
+        }
+        combined = union_all(*[selects[kind] for kind in kinds]).subquery()
+        rows = db.execute(select(combined).order_by(combined.c.score.desc()).limit(limit)).mappings().all()
+        return [
+            SearchResult(
+                type=row["kind"],
+                id=row["ref_id"],
+                roadmap_id=row["roadmap_id"],
+                roadmap_title=row["roadmap_title"],
+                title=row["title"],
+                snippet=highlight(row["snippet"]),
+                score=row["score"]
+            )
+            for row in rows
+        ]
+
+
+# Global instance
+search_service = SearchService()
@@ -0,0 +1,292 @@
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+from app.core.config import settings
+from app.models.milestone import Milestone
+from app.models.roadmap import Roadmap
+from app.models.user import User
+from app.models.user_stats import UserStats
+from app.services.analytics_service import analytics_service
+from app.utils.ttl_cache import create_ttl_cache
+from sqlalchemy import case, event, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+# Domain events emitted by the roadmap and AI routes
+ROADMAP_CREATED = "roadmap_created"
+ROADMAP_DELETED = "roadmap_deleted"
+ROADMAP_COMPLETED = "roadmap_completed"
+ROADMAP_REOPENED = "roadmap_reopened"
+MILESTONE_COMPLETED = "milestone_completed"
+MILESTONE_UNCOMPLETED = "milestone_uncompleted"
+MILESTONES_ADDED = "milestones_added"
+FIELD_ADDED = "field_added"
+PROGRESS_RESET = "progress_reset"
+
+COUNTER_COLUMNS = (
+    "roadmap_count",
+    "roadmaps_completed",
+    "milestones_total",
+    "milestones_completed",
+    "distinct_fields",
+    "current_streak",
+    "longest_streak",
+    "last_completion_date",
+)
+
+# Session.info key collecting users whose counters changed in the current transaction
+CHANGED_USERS_KEY = "user_stats_changed"
+# Session.info key holding the counter rows loaded in the current transaction
+LOADED_STATS_KEY = "user_stats_loaded"
+
+
+def compute_streaks(completion_days: Iterable) -> tuple:
+    """Get (current, longest, last day) streaks from distinct completion days in ascending order"""
+    current = longest = 0
+    previous = None
+    for day in completion_days:
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        current = current + 1 if previous is not None and day == previous + timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day
+    return current, longest, previous
+
+
+class UserStatsService:
+    """Service maintaining per-user counters from domain events"""
+
+    def __init__(self):
+        self.profile_cache = create_ttl_cache("profile_stats", settings.profile_stats_cache_ttl_seconds)
+
+    def get_stats(self, user_id: int, db: Session) -> UserStats:
+        """
+        Get the counters row for a user, building it from scratch if missing.
+        Routes call it before mutating so the events they record apply on top of the row;
+        the row stays in the session until the transaction ends, so later events don't reload it.
+        """
+        stats, _ = self._get_or_build(user_id, db)
+        return stats
+
+    def _get_or_build(self, user_id: int, db: Session):
+        stats = db.get(UserStats, user_id)
+        built = stats is None
+        if built:
+            try:
+                with db.begin_nested():
+                    stats = UserStats(user_id=user_id)
+                    self._apply_snapshot(stats, self._compute_snapshot(user_id, db))
+                    db.add(stats)
+                    analytics_service.rebuild_rollups(user_id, db)
+            except IntegrityError:
+                # A concurrent request built the row first; its snapshot doesn't include this
+                # transaction's changes, so events apply on top of it as usual
+                stats = db.get(UserStats, user_id, populate_existing=True)
+                built = False
+        # The identity map only holds weak references
+        db.info.setdefault(LOADED_STATS_KEY, {})[user_id] = stats
+        return stats, built
+
+    def record_event(self, user_id: int, event: str, db: Session, **payload) -> UserStats:
+        """
+        Apply a domain event to the user's counters and completion rollups.
+        Call it after the change the event describes has been added to the session;
+        it runs inside the caller's transaction and the caller commits.
+        Completion events may pass completed_on ({day: count}) for the rollups;
+        removals without it fall back to rebuilding the user's rollups.
+        """
+        db.flush()
+        self._mark_changed(user_id, db)
+        stats, built = self._get_or_build(user_id, db)
+        if built:
+            # A freshly built row already reflects the flushed change
+            return stats
+        count = payload.get("count", 1)
+
+        if event == ROADMAP_CREATED:
+            stats.roadmap_count = UserStats.roadmap_count + 1
+            stats.milestones_total = UserStats.milestones_total + payload.get("milestones", 0)
+
+        elif event == ROADMAP_DELETED:
+            stats.roadmap_count = UserStats.roadmap_count - 1
+            stats.milestones_total = UserStats.milestones_total - payload.get("milestones", 0)
+            stats.milestones_completed = UserStats.milestones_completed - payload.get("completed_milestones", 0)
+            if payload.get("was_completed"):
+                stats.roadmaps_completed = UserStats.roadmaps_completed - 1
+            if payload.get("completed_milestones"):
+                self._refresh_streaks(stats, user_id, db)
+                self._remove_completions(user_id, payload.get("completed_on"), db)
+            field = payload.get("field")
+            if field and not self._field_in_use(user_id, field, payload.get("roadmap_id"), db):
+                stats.distinct_fields = UserStats.distinct_fields - 1
+
+        elif event == ROADMAP_COMPLETED:
+            stats.roadmaps_completed = UserStats.roadmaps_completed + count
+
+        elif event == ROADMAP_REOPENED:
+            stats.roadmaps_completed = UserStats.roadmaps_completed - count
+
+        elif event == MILESTONES_ADDED:
+            stats.milestones_total = UserStats.milestones_total + count
+
+        elif event == MILESTONE_COMPLETED:
+            stats.milestones_completed = UserStats.milestones_completed + count
+            completed_at = payload.get("completed_at") or datetime.now()
+            completed_on = payload.get("completed_on") or {completed_at.date(): count}
+            self._advance_streak(stats, max(completed_on))
+            analytics_service.apply_completion_deltas(user_id, completed_on, db)
+
+        elif event == MILESTONE_UNCOMPLETED:
+            stats.milestones_completed = UserStats.milestones_completed - count
+            self._refresh_streaks(stats, user_id, db)
+            self._remove_completions(user_id, payload.get("completed_on"), db)
+
+        elif event == FIELD_ADDED:
+            field = payload.get("field")
+            if field and not self._field_in_use(user_id, field, payload.get("roadmap_id"), db):
+                stats.distinct_fields = UserStats.distinct_fields + 1
+
+        elif event == PROGRESS_RESET:
+            for column in COUNTER_COLUMNS:
+                setattr(stats, column, None if column == "last_completion_date" else 0)
+            analytics_service.clear_rollups(user_id, db)
+
+        else:
+            raise ValueError(f"Unknown user stats event: {event}")
+
+        db.flush()
+        return stats
+
+    def get_profile_stats(self, user_id: int, db: Session) -> dict:
+        """Get the counters shown on the profile, cached briefly per user"""
+        profile = self.profile_cache.get(user_id)
+        if profile is None:
+            stats = self.get_stats(user_id, db)
+            profile = {
+                "total_roadmaps": stats.roadmap_count,
+                "total_milestones": stats.milestones_total,
+                "completed_milestones": stats.milestones_completed,
+                "completed_roadmaps": stats.roadmaps_completed,
+            }
+            self.profile_cache.set(user_id, profile)
+        return profile
+
+    def _mark_changed(self, user_id: int, db: Session):
+        """Drop the user's cached counters once the current transaction commits"""
+        db.info.setdefault(CHANGED_USERS_KEY, set()).add(user_id)
+
+    def _advance_streak(self, stats: UserStats, completed_on: date):
+        """Extend or restart the daily completion streak"""
+        last = stats.last_completion_date
+        if last is not None and completed_on <= last:
+            return
+        if last is not None and completed_on == last + timedelta(days=1):
+            stats.current_streak = (stats.current_streak or 0) + 1
+        else:
+            stats.current_streak = 1
+        stats.longest_streak = max(stats.longest_streak or 0, stats.current_streak)
+        stats.last_completion_date = completed_on
+
+    def _remove_completions(self, user_id: int, completed_on: Optional[dict], db: Session):
+        """Take removed completions out of the rollups"""
+        if completed_on is None:
+            analytics_service.rebuild_rollups(user_id, db)
+        else:
+            analytics_service.apply_completion_deltas(
+                user_id, {day: -count for day, count in completed_on.items()}, db
+            )
+
+    def _field_in_use(self, user_id: int, field: str, exclude_roadmap_id: Optional[int], db: Session) -> bool:
+        """Check whether another roadmap of the user already covers a field"""
+        query = db.query(Roadmap.id).filter(Roadmap.user_id == user_id, Roadmap.field == field)
+        if exclude_roadmap_id is not None:
+            query = query.filter(Roadmap.id != exclude_roadmap_id)
+        return db.query(query.exists()).scalar()
+
+    def _compute_snapshot(self, user_id: int, db: Session) -> dict:
+        """Compute every counter from the source tables"""
+        roadmap_count, roadmaps_completed, distinct_fields = db.query(
+            func.count(Roadmap.id),
+            func.coalesce(func.sum(case(
+                ((Roadmap.total_milestones > 0) & (Roadmap.completed_milestones == Roadmap.total_milestones), 1),
+                else_=0
+            )), 0),
+            func.count(func.distinct(Roadmap.field)),
+        ).filter(Roadmap.user_id == user_id).one()
+
+        milestones_total, milestones_completed = db.query(
+            func.count(Milestone.id),
+            func.coalesce(func.sum(case((Milestone.completed == True, 1), else_=0)), 0),
+        ).join(Roadmap).filter(Roadmap.user_id == user_id).one()
+
+        current_streak, longest_streak, last_completion_date = self._compute_streaks(user_id, db)
+
+        return {
+            "roadmap_count": roadmap_count,
+            "roadmaps_completed": roadmaps_completed,
+            "milestones_total": milestones_total,
+            "milestones_completed": milestones_completed,
+            "distinct_fields": distinct_fields,
+            "current_streak": current_streak,
+            "longest_streak": longest_streak,
+            "last_completion_date": last_completion_date,
+        }
+
+    def _refresh_streaks(self, stats: UserStats, user_id: int, db: Session):
+        """Recompute streaks after completions were removed; they can't be rolled back incrementally"""
+        stats.current_streak, stats.longest_streak, stats.last_completion_date = self._compute_streaks(user_id, db)
+
+    def _compute_streaks(self, user_id: int, db: Session) -> tuple:
+        """Get (current, longest, last day) streaks from the distinct completion days"""
+        completion_days = [
+            row[0] for row in db.query(func.date(Milestone.completed_at)).join(Roadmap).filter(
+                Roadmap.user_id == user_id,
+                Milestone.completed == True,
+                Milestone.completed_at.isnot(None)
+            ).distinct().order_by(func.date(Milestone.completed_at)).all()
+        ]
+        return compute_streaks(completion_days)
+
+    def _apply_snapshot(self, stats: UserStats, snapshot: dict):
+        for column, value in snapshot.items():
+            setattr(stats, column, value)
+
+    def reconcile_user_stats(self, user_id: int, db: Session) -> bool:
+        """Recompute a user's counters and rollups from scratch. Returns True if drift was repaired."""
+        stats = self.get_stats(user_id, db)
+        db.refresh(stats)
+        snapshot = self._compute_snapshot(user_id, db)
+        drifted = any(getattr(stats, column) != value for column, value in snapshot.items())
+        if drifted:
+            self._apply_snapshot(stats, snapshot)
+            self._mark_changed(user_id, db)
+        drifted = analytics_service.rebuild_rollups(user_id, db) or drifted
+        db.commit()
+        return drifted
+
+    def reconcile_all_user_stats(self, db: Session) -> int:
+        """Repair counter drift for every user. Returns the number of repaired rows."""
+        repaired = 0
+        user_ids = [row[0] for row in db.query(User.id).order_by(User.id).all()]
+        for user_id in user_ids:
+            if self.reconcile_user_stats(user_id, db):
+                repaired += 1
+        return repaired
+
+
+# Global instance
+user_stats_service = UserStatsService()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_stats(session: Session):
+    # Invalidating only after commit keeps concurrent reads from re-caching uncommitted counters
+    session.info.pop(LOADED_STATS_KEY, None)
+    for user_id in session.info.pop(CHANGED_USERS_KEY, ()):
+        user_stats_service.profile_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_stats(session: Session):
+    session.info.pop(LOADED_STATS_KEY, None)
+    session.info.pop(CHANGED_USERS_KEY, None)
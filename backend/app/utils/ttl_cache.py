@@ -0,0 +1,91 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Union
+
+from app.core.shared_memory import SharedMemoryTable, open_shared_table
+
+
+class TTLCache:
+    """Small thread-safe in-process cache whose entries expire after a fixed time"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            # Drop the least recently used entries beyond the cap
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedTTLCache:
+    """
+    TTLCache kept in a shared memory table, so the worker processes on a host share entries
+    and invalidations. Values are pickled (the table file is private to the app's user);
+    values larger than the table's slots are not cached.
+    """
+
+    def __init__(self, table: SharedMemoryTable, ttl_seconds: float):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value, or None if it is missing or expired"""
+        value = self.table.get(repr(key).encode(), time.time())
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key: Hashable, value: Any):
+        if self.ttl_seconds <= 0:
+            return
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.table.value_size:
+            # Don't leave an older, smaller value behind
+            self.invalidate(key)
+            return
+        now = time.time()
+        self.table.put(repr(key).encode(), data, now + self.ttl_seconds, now)
+
+    def invalidate(self, key: Hashable):
+        self.table.delete(repr(key).encode())
+
+    def clear(self):
+        self.table.clear()
+
+
+def create_ttl_cache(name: str, ttl_seconds: float, max_entries: int = 10000,
+                     value_size: int = 512) -> Union[TTLCache, SharedTTLCache]:
+    """A cache shared by the workers on the host when SHARED_MEMORY_DIR is set, in-process otherwise"""
+    table = open_shared_table(name, max_entries * 5 // 4, value_size)
+    if table is not None:
+        return SharedTTLCache(table, ttl_seconds)
+    return TTLCache(ttl_seconds, max_entries)
@@ -0,0 +1,59 @@
+"""
+Microbenchmark of the AI rate limiter.
+
+Runs acquire (which evaluates the per-minute, per-hour and per-day windows in one call) for
+many simulated users from concurrent tasks and reports checks per second. Uses Redis when
+REDIS_URL is set, the shared memory table when SHARED_MEMORY_DIR is set, in-memory storage
+otherwise.
+
+Usage (from the backend directory):
+    python -m benchmarks.rate_limit_benchmark
+    python -m benchmarks.rate_limit_benchmark --users 100000 --checks 500000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from app.core.redis_client import redis_connection
+from app.services.rate_limit_service import (RateLimitService,
+                                             SharedRateLimitStore)
+
+async def run(service: RateLimitService, users: int, checks: int, concurrency: int) -> float:
+    per_task = checks // concurrency
+
+    async def worker(seed: int):
+        rng = random.Random(seed)
+        for _ in range(per_task):
+            await service.acquire(rng.randrange(users))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(seed) for seed in range(concurrency)))
+    return per_task * concurrency / (time.perf_counter() - started)
+
+async def main(args):
+    service = RateLimitService()
+    if service.redis_store:
+        backend = "redis"
+    elif isinstance(service.memory_store, SharedRateLimitStore):
+        backend = "shared memory"
+    else:
+        backend = "memory"
+    windows = ", ".join(f"{w.limit}/{w.name}" for w in service.windows)
+    print(f"Backend: {backend}; windows: {windows}")
+    try:
+        rate = await run(service, max(1, args.users), max(1, args.checks), max(1, args.concurrency))
+        stats = await service.get_global_stats()
+    finally:
+        await redis_connection.close()
+    print(f"{rate:,.0f} checks/s with {args.concurrency} concurrent task(s); "
+          f"{stats['total_users']} users, {stats['tracked_windows']} stored windows")
+    print(f"Redis: {redis_connection.status()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the AI rate limiter")
+    parser.add_argument("--users", type=int, default=10000, help="Simulated users")
+    parser.add_argument("--checks", type=int, default=200000, help="Total checks")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent callers")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+Memory footprint of the in-memory rate limiter store at a million users.
+
+Simulates --users users making one AI request each on a simulated clock and reports, with
+tracemalloc, the memory held by the store:
+  1. with room for every user (bytes per tracked user),
+  2. after the clock passes the longest window (idle users must all be dropped),
+  3. with the default cap of RATE_LIMIT_MAX_TRACKED_USERS (memory must stay bounded).
+Exits with status 1 if idle users are kept or the cap is exceeded.
+
+Usage (from the backend directory):
+    python -m benchmarks.rate_limit_memory_benchmark
+    python -m benchmarks.rate_limit_memory_benchmark --users 200000
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+from app.core.config import settings
+from app.services.rate_limit_service import MemoryRateLimitStore, default_windows
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self) -> float:
+        return self.now
+
+def fill(store: MemoryRateLimitStore, clock: SimulatedClock, users: int, windows):
+    for user_id in range(users):
+        clock.now += 0.0001
+        store.acquire(user_id, windows, 1, False)
+
+def measure(users: int, max_keys: int, windows, idle_after: bool):
+    clock = SimulatedClock()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    store = MemoryRateLimitStore(max_keys, clock=clock)
+    started = time.perf_counter()
+    fill(store, clock, users, windows)
+    elapsed = time.perf_counter() - started
+    filled = tracemalloc.get_traced_memory()[0] - baseline
+    tracked = len(store)
+    idle = None
+    if idle_after:
+        # Past the longest window every user is idle; each shard drops them on its next use
+        clock.now += max(window.period_seconds for window in windows) + 2 * store.bucket_seconds
+        store.sweep()
+        store.acquire(-1, windows, 1, False)
+        idle = (len(store), tracemalloc.get_traced_memory()[0] - baseline)
+    tracemalloc.stop()
+    return store, tracked, filled, elapsed, idle
+
+def main(users: int) -> bool:
+    windows = default_windows()
+    print(f"{users:,} simulated users; windows: {', '.join(f'{w.limit}/{w.name}' for w in windows)}")
+    ok = True
+
+    # Twice the users, so no shard of the store runs out of room
+    store, tracked, filled, elapsed, idle = measure(users, users * 2, windows, idle_after=True)
+    print(f"Uncapped: {tracked:,} users tracked, {filled / 2**20:,.1f} MiB "
+          f"({filled / tracked:,.0f} bytes/user), {users / elapsed:,.0f} acquires/s")
+    print(f"After the windows pass: {idle[0]:,} users tracked, {idle[1] / 2**20:,.1f} MiB, "
+          f"{store.evicted_idle:,} dropped as idle")
+    if idle[0] > 1:
+        print("FAIL: idle users were not evicted")
+        ok = False
+
+    cap = settings.rate_limit_max_tracked_users
+    store, tracked, filled, _elapsed, _idle = measure(users, cap, windows, idle_after=False)
+    print(f"Capped at {cap:,}: {tracked:,} users tracked, {filled / 2**20:,.1f} MiB, "
+          f"{store.evicted_lru:,} least recently used dropped")
+    if tracked > cap:
+        print("FAIL: the store grew past its cap")
+        ok = False
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the rate limiter's memory footprint")
+    parser.add_argument("--users", type=int, default=1000000, help="Simulated users")
+    args = parser.parse_args()
+    sys.exit(0 if main(max(1, args.users)) else 1)
@@ -0,0 +1,66 @@
+import itertools
+import os
+import tempfile
+
+# Point the app at a throwaway database before anything imports app.database
+_db_dir = tempfile.mkdtemp(prefix="pathyvo-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+# TestClient connects as "testclient"; trust it like a reverse proxy
+os.environ["FORWARDED_ALLOW_IPS"] = "127.0.0.1,testclient"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.routes_auth import create_access_token
+from app.database import SessionLocal
+from app.main import app
+from app.models import Milestone, Roadmap, User
+
+_emails = itertools.count(1)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    # Not entered as a context manager, so the startup hooks don't run
+    return TestClient(app, base_url="http://localhost")
+
+
+@pytest.fixture
+def make_user(db):
+    """Create a user and return it together with bearer auth headers"""
+    def _make_user(name: str = "Test User"):
+        user = User(name=name, email=f"user{next(_emails)}@example.com", hashed_password="unused")
+        db.add(user)
+        db.commit()
+        token = create_access_token({"sub": str(user.id)})
+        return user, {"Authorization": f"Bearer {token}"}
+    return _make_user
+
+
+@pytest.fixture
+def make_roadmap(db):
+    """Create a roadmap with open milestones and return it together with the milestone IDs"""
+    def _make_roadmap(user_id: int, milestones: int = 3, field: str = "software_development"):
+        roadmap = Roadmap(
+            user_id=user_id, title="Roadmap", field=field,
+            total_milestones=milestones, completed_milestones=0
+        )
+        db.add(roadmap)
+        db.flush()
+        db.add_all([
+            Milestone(roadmap_id=roadmap.id, title=f"Milestone {i}", description="")
+            for i in range(milestones)
+        ])
+        db.commit()
+        milestone_ids = [m.id for m in db.query(Milestone).filter_by(roadmap_id=roadmap.id).order_by(Milestone.id)]
+        return roadmap, milestone_ids
+    return _make_roadmap
@@ -0,0 +1,44 @@
+import time
+
+from app.models import Achievement
+from app.services.achievement_catalog import AchievementCatalog
+from app.services.achievement_service import achievement_service
+
+
+def test_catalog_is_revalidated_with_its_etag(client, db, make_user):
+    achievement_service.seed_default_achievements(db)
+    _, headers = make_user()
+
+    first = client.get("/achievements/", headers=headers)
+    etag = first.headers["ETag"]
+    revalidated = client.get("/achievements/", headers={**headers, "If-None-Match": etag})
+
+    assert first.status_code == 200 and first.json()
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+
+
+def test_changes_from_elsewhere_show_up_once_the_copy_is_stale(db):
+    achievement_service.seed_default_achievements(db)
+    catalog = AchievementCatalog(ttl_seconds=0.1)
+    entries, etag = catalog.get_snapshot(db)
+    achievement = db.get(Achievement, entries[0].id)
+    title = achievement.title
+
+    try:
+        # Like a script or another worker editing the table without invalidating this process
+        achievement.title = "Renamed"
+        db.commit()
+        assert catalog.get_snapshot(db) == (entries, etag)
+
+        time.sleep(0.1)
+        renamed, renamed_etag = catalog.get_snapshot(db)
+        assert renamed[0].title == "Renamed" and renamed_etag != etag
+
+        catalog.invalidate()
+        achievement.title = title
+        db.commit()
+        assert catalog.get_snapshot(db)[0][0].title == title
+    finally:
+        achievement.title = title
+        db.commit()
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import text
+
+from app.database import SessionLocal, engine
+from app.models import UserAchievement
+from app.services.achievement_service import UNIQUE_AWARD_INDEX, achievement_service
+from app.services.notification_service import ACHIEVEMENT_UNLOCKED, notification_broker
+from app.services.user_stats_service import user_stats_service
+
+
+@pytest.fixture(autouse=True)
+def achievements(db):
+    achievement_service.seed_default_achievements(db)
+
+
+def record_unlocks(monkeypatch):
+    unlocked = []
+    publish = notification_broker.publish
+
+    def recording_publish(user_id, event_type, data):
+        if event_type == ACHIEVEMENT_UNLOCKED:
+            unlocked.append(data["achievement_id"])
+        return publish(user_id, event_type, data)
+
+    monkeypatch.setattr(notification_broker, "publish", recording_publish)
+    return unlocked
+
+
+def test_racing_checks_award_and_announce_each_achievement_once(monkeypatch, db, make_user):
+    user, _ = make_user()
+    user_stats_service.get_stats(user.id, db)
+    db.commit()
+    unlocked = record_unlocks(monkeypatch)
+    get_stats = user_stats_service.get_stats
+
+    def get_stats_after_a_concurrent_check(user_id, session):
+        # Another check of the same user commits its awards after this one read the existing ones
+        monkeypatch.setattr(user_stats_service, "get_stats", get_stats)
+        other = SessionLocal()
+        try:
+            achievement_service.check_and_award_achievements(user_id, other)
+        finally:
+            other.close()
+        return get_stats(user_id, session)
+
+    monkeypatch.setattr(user_stats_service, "get_stats", get_stats_after_a_concurrent_check)
+    late = achievement_service.check_and_award_achievements(user.id, db)
+
+    awarded = [row[0] for row in db.query(UserAchievement.achievement_id).filter_by(user_id=user.id)]
+    assert late == []
+    assert awarded and len(awarded) == len(set(awarded))
+    assert sorted(unlocked) == sorted(awarded)
+
+
+def test_existing_databases_lose_repeated_awards_and_get_the_index(db, make_user):
+    user, _ = make_user()
+    achievement_service.check_and_award_achievements(user.id, db)
+    first = db.query(UserAchievement).filter_by(user_id=user.id).first()
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP INDEX {UNIQUE_AWARD_INDEX}"))
+        connection.execute(
+            text("INSERT INTO user_achievements (user_id, achievement_id, is_notified) VALUES (:user_id, :achievement_id, 0)"),
+            {"user_id": user.id, "achievement_id": first.achievement_id}
+        )
+
+    achievement_service.ensure_unique_awards(db)
+
+    copies = db.query(UserAchievement).filter_by(user_id=user.id, achievement_id=first.achievement_id).all()
+    assert [award.id for award in copies] == [first.id]
+    with engine.connect() as connection:
+        indexes = connection.execute(text("PRAGMA index_list(user_achievements)")).fetchall()
+    assert any(index[1] == UNIQUE_AWARD_INDEX and index[2] for index in indexes)
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from app.models import Milestone, Roadmap
+
+
+def walk_feed(client, headers, limit, **params):
+    items, cursor = [], None
+    while True:
+        page = client.get("/roadmaps/analytics/activity", headers=headers,
+                          params={"limit": limit, **params, **({"cursor": cursor} if cursor else {})}).json()
+        items.extend((item["type"], item["id"]) for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_pages_cover_the_feed_once_in_order_across_ties(client, db, make_user, make_roadmap):
+    user, headers = make_user()
+    base = datetime(2026, 3, 1, 12, 0, 0)
+    roadmap, milestone_ids = make_roadmap(user.id, milestones=4)
+    db.get(Roadmap, roadmap.id).created_at = base
+    # Two completions share the roadmap's timestamp, two share a later one
+    for milestone_id, completed_at in zip(milestone_ids, [base, base, base + timedelta(hours=1), base + timedelta(hours=1)]):
+        milestone = db.get(Milestone, milestone_id)
+        milestone.completed = True
+        milestone.completed_at = completed_at
+    db.commit()
+
+    everything = walk_feed(client, headers, limit=100)
+    paged = walk_feed(client, headers, limit=2)
+
+    assert paged == everything
+    assert everything == [
+        ("milestone_completed", milestone_ids[3]),
+        ("milestone_completed", milestone_ids[2]),
+        # At the same time, types sort by rank and then by id, newest first
+        ("roadmap_created", roadmap.id),
+        ("milestone_completed", milestone_ids[1]),
+        ("milestone_completed", milestone_ids[0]),
+    ]
+    assert walk_feed(client, headers, limit=1, types="roadmap_created") == [("roadmap_created", roadmap.id)]
+
+
+def test_a_malformed_cursor_is_rejected(client, make_user):
+    _, headers = make_user()
+
+    response = client.get("/roadmaps/analytics/activity", params={"cursor": "not-a-cursor"}, headers=headers)
+
+    assert response.status_code == 400
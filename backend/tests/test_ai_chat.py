@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import httpx
+from sqlalchemy import event
+
+from app.database import SessionLocal, engine
+from app.main import app
+from app.models import ChatMessage
+from app.services.llm_service import llm_service
+
+# More concurrent chats than the default pool (5 + 10 overflow) could serve if each held a connection
+CONCURRENT_CHATS = 20
+
+
+def test_chat_holds_no_connection_while_waiting_for_the_llm(monkeypatch, db, make_user, make_roadmap):
+    checked_out = []
+    all_waiting = asyncio.Barrier(CONCURRENT_CHATS)
+
+    async def fake_ai_call(prompt, json_output=True):
+        # Once every chat is waiting for the LLM, none of them may hold a connection
+        await all_waiting.wait()
+        checked_out.append(engine.pool.checkedout())
+        await asyncio.sleep(0.2)
+        return "Keep going."
+
+    monkeypatch.setattr(llm_service, "_call_ai_service", fake_ai_call)
+    chats = []
+    for _ in range(CONCURRENT_CHATS):
+        user, headers = make_user()
+        roadmap, _ = make_roadmap(user.id, milestones=2)
+        chats.append((roadmap.id, headers))
+    # Return the fixture session's connection to the pool
+    db.close()
+
+    async def run_chats():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+            return await asyncio.gather(*[
+                client.post("/ai/chat", json={"message": "What next?", "roadmap_id": roadmap_id}, headers=headers)
+                for roadmap_id, headers in chats
+            ])
+
+    responses = asyncio.run(run_chats())
+
+    assert [r.status_code for r in responses] == [200] * CONCURRENT_CHATS
+    assert len(checked_out) == CONCURRENT_CHATS
+    assert max(checked_out) == 0
+
+
+def test_chat_reply_is_stamped_after_the_question(client, monkeypatch, make_user, make_roadmap):
+    async def fake_ai_call(prompt, json_output=True):
+        return "Keep going."
+
+    monkeypatch.setattr(llm_service, "_call_ai_service", fake_ai_call)
+    user, headers = make_user()
+    roadmap, _ = make_roadmap(user.id)
+
+    response = client.post("/ai/chat", json={"message": "What next?", "roadmap_id": roadmap.id}, headers=headers)
+
+    assert response.status_code == 200
+    with SessionLocal() as db:
+        question, reply = db.query(ChatMessage).filter_by(roadmap_id=roadmap.id).order_by(
+            ChatMessage.timestamp, ChatMessage.id
+        ).all()
+    assert (question.type, reply.type) == ("user", "ai")
+    assert reply.timestamp >= question.timestamp
+    # Both carry sub-second precision from the same clock, unlike the column's func.now() default
+    assert question.timestamp.microsecond or reply.timestamp.microsecond
+
+
+def test_chat_database_work_does_not_block_the_event_loop(monkeypatch, db, make_user, make_roadmap):
+    async def fake_ai_call(prompt, json_output=True):
+        return "Keep going."
+
+    def slow_statement(*args):
+        time.sleep(0.05)
+
+    monkeypatch.setattr(llm_service, "_call_ai_service", fake_ai_call)
+    chats = []
+    for _ in range(5):
+        user, headers = make_user()
+        roadmap, _ = make_roadmap(user.id, milestones=2)
+        chats.append((roadmap.id, headers))
+    db.close()
+    gaps = []
+
+    async def tick():
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(0.01)
+            now = time.monotonic()
+            gaps.append(now - last)
+            last = now
+
+    async def run_chats():
+        ticker = asyncio.create_task(tick())
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+            responses = await asyncio.gather(*[
+                client.post("/ai/chat", json={"message": "What next?", "roadmap_id": roadmap_id}, headers=headers)
+                for roadmap_id, headers in chats
+            ])
+        ticker.cancel()
+        return responses
+
+    # Every statement stalls like a busy database, in whichever thread runs it
+    event.listen(engine, "before_cursor_execute", slow_statement)
+    try:
+        responses = asyncio.run(run_chats())
+    finally:
+        event.remove(engine, "before_cursor_execute", slow_statement)
+
+    assert [r.status_code for r in responses] == [200] * 5
+    assert gaps and max(gaps) < 0.05
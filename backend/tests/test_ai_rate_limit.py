@@ -0,0 +1,63 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.api import routes_ai
+from app.main import app
+from app.services.llm_service import llm_service
+from app.services.rate_limit_service import RateLimitWindow
+
+
+@pytest.fixture
+def chat(monkeypatch, make_user, make_roadmap):
+    """Set the AI windows and return a function sending chats as a new user"""
+    async def fake_ai_call(prompt, json_output=True):
+        return "Keep going."
+
+    monkeypatch.setattr(llm_service, "_call_ai_service", fake_ai_call)
+    user, headers = make_user()
+    roadmap, _ = make_roadmap(user.id, milestones=1)
+    body = {"message": "What next?", "roadmap_id": roadmap.id}
+
+    def send(*windows, count=1):
+        monkeypatch.setattr(routes_ai.rate_limit_service, "windows", list(windows))
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://localhost") as client:
+                return await asyncio.gather(*[client.post("/ai/chat", json=body, headers=headers) for _ in range(count)])
+        return asyncio.run(run())
+    return send
+
+
+@pytest.mark.parametrize("windows, refused_by, retry_after", [
+    ([RateLimitWindow("minute", 2, 60), RateLimitWindow("hour", 5, 3600), RateLimitWindow("day", 9, 86400)], 60, "30"),
+    ([RateLimitWindow("minute", 5, 60), RateLimitWindow("hour", 2, 3600), RateLimitWindow("day", 9, 86400)], 3600, "1800"),
+    ([RateLimitWindow("minute", 5, 60), RateLimitWindow("hour", 5, 3600), RateLimitWindow("day", 2, 86400)], 86400, "43200"),
+])
+def test_each_window_refuses_once_it_is_used_up(chat, windows, refused_by, retry_after):
+    responses = [chat(*windows)[0] for _ in range(3)]
+
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    # The headers describe the window that limits the user the most
+    assert [r.headers["X-RateLimit-Remaining"] for r in responses[:2]] == ["1", "0"]
+    assert responses[1].headers["X-RateLimit-Window"] == str(refused_by)
+    assert responses[2].headers["X-RateLimit-Window"] == str(refused_by)
+    assert responses[2].headers["Retry-After"] == retry_after
+
+
+def test_concurrent_requests_are_admitted_up_to_the_limit_only(chat):
+    responses = chat(RateLimitWindow("hour", 100, 3600), RateLimitWindow("minute", 3, 60), count=10)
+
+    assert sorted(r.status_code for r in responses) == [200] * 3 + [429] * 7
+
+
+def test_refused_requests_are_not_charged_to_the_other_windows(chat):
+    hour = RateLimitWindow("hour", 5, 3600)
+    responses = chat(hour, RateLimitWindow("minute", 3, 60), count=8)
+    assert sorted(r.status_code for r in responses) == [200] * 3 + [429] * 5
+
+    # Without the minute window, the two requests the hour has left still fit
+    responses = [chat(hour)[0] for _ in range(3)]
+    assert [r.status_code for r in responses] == [200, 200, 429]
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from app.models import Milestone, Roadmap
+from app.services.analytics_service import MAX_BUCKETS
+from app.services.user_stats_service import MILESTONE_COMPLETED, user_stats_service
+
+
+def complete(milestone_id, completed_at, db):
+    milestone = db.get(Milestone, milestone_id)
+    milestone.completed = True
+    milestone.completed_at = completed_at
+    db.get(Roadmap, milestone.roadmap_id).completed_milestones += 1
+    user_stats_service.record_event(milestone.roadmap.user_id, MILESTONE_COMPLETED, db, completed_at=completed_at)
+    db.commit()
+
+
+def test_series_counts_completions_per_period(client, db, make_user, make_roadmap):
+    user, headers = make_user()
+    _, milestone_ids = make_roadmap(user.id, milestones=3)
+    now = datetime.now()
+    complete(milestone_ids[0], now - timedelta(days=1), db)
+    complete(milestone_ids[1], now, db)
+    complete(milestone_ids[2], now, db)
+
+    response = client.get("/roadmaps/analytics/milestones-by-date?granularity=day", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"date": (now - timedelta(days=1)).date().isoformat(), "milestones": 1},
+        {"date": now.date().isoformat(), "milestones": 2},
+    ]
+
+
+def test_long_histories_are_clamped_unless_the_range_is_explicit(client, db, make_user, make_roadmap):
+    user, headers = make_user()
+    _, milestone_ids = make_roadmap(user.id, milestones=2)
+    now = datetime.now()
+    first_completion = now - timedelta(days=MAX_BUCKETS + 100)
+    complete(milestone_ids[0], first_completion, db)
+    complete(milestone_ids[1], now, db)
+
+    daily = client.get("/roadmaps/analytics/milestones-by-date?granularity=day", headers=headers)
+    weekly = client.get("/roadmaps/analytics/milestones-by-date", headers=headers)
+    explicit = client.get(
+        f"/roadmaps/analytics/milestones-by-date?granularity=day&start={first_completion.date().isoformat()}",
+        headers=headers
+    )
+
+    assert daily.status_code == 200
+    assert len(daily.json()) == MAX_BUCKETS
+    assert daily.json()[-1] == {"date": now.date().isoformat(), "milestones": 1}
+    # Weekly buckets still reach back to the first completion
+    assert weekly.status_code == 200
+    assert sum(bucket["milestones"] for bucket in weekly.json()) == 2
+    assert explicit.status_code == 400
@@ -0,0 +1,50 @@
+from app.core.config import settings
+from app.services.login_throttle import login_throttle
+
+
+def test_login_throttle_keys_on_the_forwarded_client(client, monkeypatch):
+    monkeypatch.setattr(login_throttle, "max_failures_per_ip", 3)
+    first = {"X-Forwarded-For": "203.0.113.10"}
+    second = {"X-Forwarded-For": "203.0.113.20"}
+
+    for attempt in range(3):
+        response = client.post("/auth/login", json={"email": f"nobody{attempt}@example.com", "password": "x"},
+                               headers=first)
+        assert response.status_code == 401
+
+    throttled = client.post("/auth/login", json={"email": "nobody9@example.com", "password": "x"}, headers=first)
+    other_client = client.post("/auth/login", json={"email": "nobody9@example.com", "password": "x"}, headers=second)
+
+    assert throttled.status_code == 429
+    assert other_client.status_code == 401
+
+
+def test_account_lifecycle(client):
+    credentials = {"email": "lifecycle@example.com", "password": "secret123"}
+    registered = client.post("/auth/register", json={"name": "Life Cycle", **credentials})
+    assert registered.status_code == 201
+    assert client.post("/auth/register", json={"name": "Again", **credentials}).status_code == 400
+
+    login = client.post("/auth/login", json=credentials)
+    assert login.status_code == 200
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    changed = client.put("/users/change-password", headers=headers,
+                         json={"current_password": "secret123", "new_password": "secret456"})
+    assert changed.status_code == 200
+    assert client.post("/auth/login", json=credentials).status_code == 401
+    assert client.post("/auth/login", json={**credentials, "password": "secret456"}).status_code == 200
+
+    deleted = client.request("DELETE", "/users/account", headers=headers, json={"password": "secret456"})
+    assert deleted.status_code == 200
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_metrics_are_internal(client, monkeypatch):
+    # TestClient is neither loopback nor holding a token
+    assert client.get("/metrics/password-hashing").status_code == 403
+
+    monkeypatch.setattr(settings, "metrics_token", "metrics-secret")
+    assert client.get("/metrics/password-hashing", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    response = client.get("/metrics/password-hashing", headers={"Authorization": "Bearer metrics-secret"})
+    assert response.status_code == 200
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from app.backfill_achievements import backfill, save_checkpoint
+from app.models import Achievement, Milestone, MilestoneRollup, Roadmap, UserAchievement, UserStats
+from app.services.achievement_service import achievement_service
+from app.services.user_stats_service import COUNTER_COLUMNS, user_stats_service
+
+
+def complete_directly(milestone_ids, completed_at, db):
+    """Mark milestones done the way rows written before the counters existed look"""
+    for milestone_id in milestone_ids:
+        milestone = db.get(Milestone, milestone_id)
+        milestone.completed = True
+        milestone.completed_at = completed_at
+        db.get(Roadmap, milestone.roadmap_id).completed_milestones += 1
+    db.commit()
+
+
+def test_backfill_builds_counters_and_awards_for_existing_users(tmp_path, db, make_user, make_roadmap):
+    achievement_service.seed_default_achievements(db)
+    active, _ = make_user()
+    idle, _ = make_user()
+    _, milestone_ids = make_roadmap(active.id, milestones=3)
+    make_roadmap(active.id, milestones=1, field="data_science")
+    now = datetime.now()
+    complete_directly(milestone_ids[:1], now - timedelta(days=1), db)
+    complete_directly(milestone_ids[1:], now, db)
+    checkpoint = tmp_path / "checkpoint.json"
+
+    backfill([], chunk_size=1, checkpoint_path=str(checkpoint), restart=True)
+
+    db.expire_all()
+    for user in (active, idle):
+        stats = db.get(UserStats, user.id)
+        expected = user_stats_service._compute_snapshot(user.id, db)
+        assert {column: getattr(stats, column) for column in COUNTER_COLUMNS} == expected
+    assert db.get(UserStats, active.id).current_streak == 2
+    assert db.query(MilestoneRollup).filter_by(user_id=active.id).count() == 2
+    assert db.query(UserAchievement).filter_by(user_id=active.id).count() > 0
+    # The live engine finds nothing left to award
+    assert achievement_service.check_and_award_achievements(active.id, db) == []
+    assert not checkpoint.exists()
+
+
+def test_an_interrupted_backfill_resumes_after_its_checkpoint(tmp_path, db, make_user):
+    achievement_service.seed_default_achievements(db)
+    done, _ = make_user()
+    pending, _ = make_user()
+    achievement_ids = [row[0] for row in db.query(Achievement.id).order_by(Achievement.id)]
+    checkpoint = tmp_path / "checkpoint.json"
+    save_checkpoint(str(checkpoint), achievement_ids, done.id)
+
+    backfill([], chunk_size=1000, checkpoint_path=str(checkpoint), restart=False)
+
+    db.expire_all()
+    assert db.get(UserStats, done.id) is None
+    assert db.get(UserStats, pending.id) is not None
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+from app.models import ChatMessage
+from app.services.chat_archive_service import chat_archive_service
+
+
+def add_messages(user_id, roadmap_id, timestamps, db):
+    messages = [
+        ChatMessage(roadmap_id=roadmap_id, user_id=user_id, type="user", content=f"Message {i}", timestamp=timestamp)
+        for i, timestamp in enumerate(timestamps)
+    ]
+    db.add_all(messages)
+    db.commit()
+    return [message.id for message in sorted(messages, key=lambda message: (message.timestamp, message.id))]
+
+
+def page_backwards(client, headers, roadmap_id, limit):
+    """Walk from the newest page to the oldest; returns the IDs oldest first"""
+    ids, params = [], {"limit": limit}
+    while True:
+        page = client.get(f"/chat/roadmap/{roadmap_id}/page", params=params, headers=headers).json()
+        ids = [message["id"] for message in page["items"]] + ids
+        if page["next_before"] is None:
+            return ids
+        params = {"limit": limit, "before": page["next_before"]}
+
+
+def page_forwards(client, headers, roadmap_id, limit, after):
+    ids, params = [], {"limit": limit, "after": after}
+    while True:
+        page = client.get(f"/chat/roadmap/{roadmap_id}/page", params=params, headers=headers).json()
+        ids += [message["id"] for message in page["items"]]
+        if not page["has_more"]:
+            return ids
+        params = {"limit": limit, "after": page["next_after"]}
+
+
+def test_cursors_walk_the_history_both_ways_across_equal_timestamps(client, db, make_user, make_roadmap):
+    user, headers = make_user()
+    roadmap, _ = make_roadmap(user.id)
+    base = datetime(2026, 5, 1, 9, 0, 0)
+    # Inserted out of time order, with runs of equal timestamps
+    timestamps = [base + timedelta(minutes=minute) for minute in (5, 1, 1, 1, 3, 0, 5, 2, 4, 4, 0)]
+    expected = add_messages(user.id, roadmap.id, timestamps, db)
+
+    assert page_backwards(client, headers, roadmap.id, limit=3) == expected
+    assert page_forwards(client, headers, roadmap.id, limit=4, after=expected[0]) == expected[1:]
+    newest = client.get(f"/chat/roadmap/{roadmap.id}", params={"limit": 2}, headers=headers).json()
+    assert [message["id"] for message in newest] == expected[-2:]
+
+
+def test_history_is_private_and_takes_one_cursor(client, make_user, make_roadmap):
+    user, headers = make_user()
+    roadmap, _ = make_roadmap(user.id)
+    _, other_headers = make_user()
+    url = f"/chat/roadmap/{roadmap.id}/page"
+
+    assert client.get(url, headers=other_headers).status_code == 403
+    assert client.get(url, params={"before": 1, "after": 1}, headers=headers).status_code == 400
+
+
+def test_archived_messages_stay_in_the_paged_history(client, db, make_user, make_roadmap):
+    user, headers = make_user()
+    roadmap_id = make_roadmap(user.id)[0].id
+    base = datetime(2024, 1, 1, 9, 0, 0)
+    timestamps = [base + timedelta(days=day) for day in (0, 0, 1, 2, 3, 4, 30, 31)]
+    expected = add_messages(user.id, roadmap_id, timestamps, db)
+
+    archived, raw_bytes, compressed_bytes = chat_archive_service.archive_roadmap(
+        roadmap_id, base + timedelta(days=10), segment_size=4, db=db
+    )
+
+    assert archived == 6 and 0 < compressed_bytes < raw_bytes
+    assert db.query(ChatMessage).filter_by(roadmap_id=roadmap_id).count() == 2
+    # Pages run across the boundary between live and archived messages
+    assert page_backwards(client, headers, roadmap_id, limit=3) == expected
+    assert page_forwards(client, headers, roadmap_id, limit=3, after=expected[0]) == expected[1:]
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from app.database import engine
+from app.models import ChatMessage
+from app.services.chat_write_buffer import ChatWriteBuffer
+
+
+def test_concurrent_writers_share_commits_and_a_bad_message_fails_alone(db, make_user, make_roadmap):
+    user, _ = make_user()
+    roadmap, _ = make_roadmap(user.id)
+    buffer = ChatWriteBuffer(flush_interval_seconds=0.05, max_batch_size=100, max_pending=100)
+    commits = []
+
+    def count_commit(connection):
+        commits.append(connection)
+
+    event.listen(engine, "commit", count_commit)
+
+    def message(content):
+        return {"roadmap_id": roadmap.id, "user_id": user.id, "type": "user", "content": content}
+
+    buffer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            writes = [pool.submit(buffer.write, [message(f"Message {i}")]) for i in range(10)]
+            saved = [write.result() for write in writes]
+            batched_commits = len(commits)
+            # content is NOT NULL
+            bad = pool.submit(buffer.write, [message(None)])
+            good = pool.submit(buffer.write, [message("After")])
+            with pytest.raises(IntegrityError):
+                bad.result()
+            assert good.result()[0].content == "After"
+    finally:
+        buffer.stop()
+        event.remove(engine, "commit", count_commit)
+
+    assert all(len(messages) == 1 and messages[0].id for messages in saved)
+    # Far fewer transactions than writers
+    assert batched_commits < 10
+    stored = db.query(ChatMessage.content).filter_by(roadmap_id=roadmap.id).all()
+    assert sorted(row[0] for row in stored) == sorted([f"Message {i}" for i in range(10)] + ["After"])
+
+
+def test_messages_queued_while_stopping_are_still_saved(db, make_user, make_roadmap):
+    user, _ = make_user()
+    roadmap, _ = make_roadmap(user.id)
+    buffer = ChatWriteBuffer(flush_interval_seconds=1.0, max_batch_size=100, max_pending=100)
+
+    buffer.start()
+    future = buffer.submit([{"roadmap_id": roadmap.id, "user_id": user.id, "type": "ai", "content": "Queued"}])
+    buffer.stop()
+
+    assert future.result(timeout=1)[0].content == "Queued"
+    assert db.query(ChatMessage).filter_by(roadmap_id=roadmap.id).count() == 1
@@ -0,0 +1,30 @@
+from app.schemas.dashboard import DASHBOARD_SECTIONS
+from app.services.achievement_service import achievement_service
+
+
+def test_dashboard_matches_the_endpoints_it_replaces(client, db, make_user, make_roadmap):
+    achievement_service.seed_default_achievements(db)
+    user, headers = make_user()
+    _, milestone_ids = make_roadmap(user.id, milestones=2)
+    client.put(f"/roadmaps/milestones/{milestone_ids[0]}/complete", headers=headers)
+
+    dashboard = client.get("/dashboard/", headers=headers).json()
+
+    assert set(dashboard) == set(DASHBOARD_SECTIONS)
+    profile = client.get("/users/profile", headers=headers).json()
+    assert dashboard["user"]["id"] == profile["id"] == user.id
+    assert dashboard["stats"] == {key: profile[key] for key in dashboard["stats"]}
+    assert dashboard["roadmaps"] == client.get(f"/roadmaps/user/{user.id}/summary", headers=headers).json()
+    assert dashboard["achievements"] == client.get("/achievements/user", headers=headers).json()
+    assert dashboard["milestones_by_date"] == client.get("/roadmaps/analytics/milestones-by-date", headers=headers).json()
+    assert [item["id"] for item in dashboard["recent_milestones"]] == [milestone_ids[0]]
+
+
+def test_dashboard_returns_only_the_requested_sections(client, make_user):
+    _, headers = make_user()
+
+    partial = client.get("/dashboard/", params={"sections": "stats, roadmaps"}, headers=headers)
+    unknown = client.get("/dashboard/", params={"sections": "stats,everything"}, headers=headers)
+
+    assert set(partial.json()) == {"stats", "roadmaps"}
+    assert unknown.status_code == 400
@@ -0,0 +1,46 @@
+from app.core.hashing_worker import PasswordHashingBusyError, password_hasher
+
+
+def test_legacy_update_drops_the_cached_principal(client, make_user):
+    user, headers = make_user("Before")
+    assert client.get("/users/profile", headers=headers).json()["name"] == "Before"
+
+    assert client.put(f"/users/{user.id}", json={"name": "After"}).status_code == 200
+
+    assert client.get("/users/profile", headers=headers).json()["name"] == "After"
+
+
+def test_legacy_delete_drops_the_cached_principal(client, make_user):
+    user, headers = make_user()
+    assert client.get("/users/profile", headers=headers).status_code == 200
+
+    assert client.delete(f"/users/{user.id}").status_code == 200
+
+    assert client.get("/users/profile", headers=headers).status_code == 401
+
+
+def test_legacy_create_and_update_hash_through_the_hashing_pool(client):
+    created = client.post("/users/", json={"name": "Legacy", "email": "legacy@example.com", "password": "first-secret"})
+    assert created.status_code == 200
+    login = {"email": "legacy@example.com", "password": "first-secret"}
+    assert client.post("/auth/login", json=login).status_code == 200
+
+    updated = client.put(f"/users/{created.json()['id']}", json={"password": "second-secret"})
+
+    assert updated.status_code == 200
+    assert client.post("/auth/login", json=login).status_code == 401
+    assert client.post("/auth/login", json={**login, "password": "second-secret"}).status_code == 200
+
+
+def test_legacy_writes_are_turned_away_while_hashing_is_saturated(client, monkeypatch, make_user):
+    user, _ = make_user()
+
+    async def busy(password):
+        raise PasswordHashingBusyError("Too many password hashing jobs are waiting")
+
+    monkeypatch.setattr(password_hasher, "hash", busy)
+    created = client.post("/users/", json={"name": "Legacy", "email": "busy@example.com", "password": "secret"})
+    updated = client.put(f"/users/{user.id}", json={"password": "secret"})
+
+    assert (created.status_code, updated.status_code) == (503, 503)
+    assert created.headers["Retry-After"] == "1"
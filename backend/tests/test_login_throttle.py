@@ -0,0 +1,88 @@
+import asyncio
+import fcntl
+import os
+import time
+
+from app.core.config import settings
+from app.core.shared_memory import SharedMemoryTable
+from app.services.login_throttle import LoginThrottle
+from app.services.rate_limit_service import MemoryRateLimitStore, SharedRateLimitStore
+
+
+def test_failures_are_throttled_per_account_and_reset_by_a_login():
+    throttle = LoginThrottle(max_failures_per_ip=10, max_failures_per_email=3, window_seconds=900)
+    assert isinstance(throttle.store, MemoryRateLimitStore)
+
+    async def run():
+        for _ in range(3):
+            assert await throttle.check("198.51.100.1", "Ann@example.com") is None
+            await throttle.record_failure("198.51.100.1", "Ann@example.com")
+
+        # One more attempt per window / limit seconds
+        assert 300 <= await throttle.check("198.51.100.2", "ann@example.com") <= 301
+        assert await throttle.check("198.51.100.2", "bob@example.com") is None
+        await throttle.reset("ANN@example.com")
+        assert await throttle.check("198.51.100.2", "ann@example.com") is None
+
+    asyncio.run(run())
+
+
+def test_per_process_counters_are_bounded():
+    throttle = LoginThrottle(max_failures_per_ip=10, max_failures_per_email=3, window_seconds=900,
+                             max_tracked_keys=100)
+
+    async def run():
+        for i in range(1000):
+            await throttle.record_failure(f"10.0.{i // 256}.{i % 256}", f"user{i}@example.com")
+
+    asyncio.run(run())
+    assert len(throttle.store) <= 100
+
+
+def test_workers_share_counters_through_shared_memory(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "shared_memory_dir", str(tmp_path))
+    workers = [LoginThrottle(max_failures_per_ip=4, max_failures_per_email=100, window_seconds=900)
+               for _ in range(2)]
+    assert all(isinstance(worker.store, SharedRateLimitStore) for worker in workers)
+
+    async def run():
+        for attempt in range(4):
+            await workers[attempt % 2].record_failure("203.0.113.5", f"guess{attempt}@example.com")
+
+        assert await workers[0].check("203.0.113.5", "other@example.com") is not None
+        assert await workers[1].check("203.0.113.5", "other@example.com") is not None
+        assert await workers[1].check("203.0.113.6", "other@example.com") is None
+
+    asyncio.run(run())
+
+
+def test_a_locked_table_does_not_block_the_event_loop(tmp_path):
+    table = SharedMemoryTable(str(tmp_path / "table"), slots=16, value_size=8)
+    # flock is per open file, so a second descriptor contends like another worker would
+    other = os.open(table.path, os.O_RDWR)
+    fcntl.flock(other, fcntl.LOCK_EX)
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.005)
+
+    async def run():
+        ticker = asyncio.create_task(tick())
+        asyncio.get_running_loop().call_later(0.1, fcntl.flock, other, fcntl.LOCK_UN)
+        started = time.monotonic()
+        await table.run_locked(lambda: table.put(b"key", b"value", time.time() + 60, time.time()))
+        waited = time.monotonic() - started
+        ticker.cancel()
+        return waited
+
+    try:
+        waited = asyncio.run(run())
+    finally:
+        os.close(other)
+
+    assert waited >= 0.09
+    # Other coroutines kept running while the lock was held elsewhere
+    assert len(ticks) >= 10
+    assert table.get(b"key", time.time()) == b"value"
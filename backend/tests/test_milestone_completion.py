@@ -0,0 +1,140 @@
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app.database import engine
+from app.models import Milestone, Roadmap, UserStats
+from app.services.achievement_worker import achievement_worker
+from app.services.user_stats_service import COUNTER_COLUMNS, user_stats_service
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def route_statements(statements):
+    """Statements of the route itself, without authentication's user lookups"""
+    return [s for s in statements if "FROM users" not in s]
+
+
+@pytest.fixture(autouse=True)
+def skip_achievement_checks(monkeypatch):
+    # Without a running worker the check runs inline; it is not part of the request's own work
+    monkeypatch.setattr(achievement_worker, "enqueue", lambda user_id: None)
+
+
+def test_complete_milestone_statement_count(client, make_user, make_roadmap):
+    user, headers = make_user()
+    _, milestone_ids = make_roadmap(user.id, milestones=3)
+    # Build the counters row
+    client.put(f"/roadmaps/milestones/{milestone_ids[0]}/complete", headers=headers)
+
+    with count_statements() as statements:
+        response = client.put(f"/roadmaps/milestones/{milestone_ids[1]}/complete", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["completed"] is True
+    # Counters SELECT, milestone UPDATE, roadmap UPDATE, rollup UPDATE, counters UPDATE
+    assert len(route_statements(statements)) == 5, "\n".join(statements)
+    assert sum(s.startswith("SELECT") and "FROM user_stats" in s for s in statements) == 1
+
+
+def test_complete_milestone_already_completed_is_noop(client, make_user, make_roadmap):
+    user, headers = make_user()
+    _, milestone_ids = make_roadmap(user.id, milestones=2)
+    client.put(f"/roadmaps/milestones/{milestone_ids[0]}/complete", headers=headers)
+
+    with count_statements() as statements:
+        response = client.put(f"/roadmaps/milestones/{milestone_ids[0]}/complete", headers=headers)
+
+    assert response.status_code == 200
+    # Counters SELECT, the UPDATE matching nothing, milestone and owner lookups
+    assert len(route_statements(statements)) == 4, "\n".join(statements)
+
+
+def test_completing_last_milestone_builds_counters_once(client, db, make_user, make_roadmap):
+    user, headers = make_user()
+    _, milestone_ids = make_roadmap(user.id, milestones=1)
+
+    # No counters row exists yet; it is built before the completion events apply
+    response = client.put(f"/roadmaps/milestones/{milestone_ids[0]}/complete", headers=headers)
+
+    assert response.status_code == 200
+    stats = db.get(UserStats, user.id)
+    assert (stats.roadmap_count, stats.roadmaps_completed) == (1, 1)
+    assert (stats.milestones_total, stats.milestones_completed) == (1, 1)
+    assert stats.current_streak == 1
+
+
+def test_batch_applies_every_operation_and_recounts_once(client, db, make_user, make_roadmap):
+    user, headers = make_user()
+    roadmap, milestone_ids = make_roadmap(user.id, milestones=4)
+    client.put(f"/roadmaps/milestones/{milestone_ids[3]}/complete", headers=headers)
+    operations = [
+        {"op": "complete", "milestone_id": milestone_ids[0]},
+        {"op": "complete", "milestone_id": milestone_ids[1]},
+        # The last completion operation for a milestone wins
+        {"op": "uncomplete", "milestone_id": milestone_ids[1]},
+        {"op": "uncomplete", "milestone_id": milestone_ids[3]},
+        {"op": "set_due_date", "milestone_id": milestone_ids[2], "due_date": "2030-01-31"},
+        {"op": "edit", "milestone_id": milestone_ids[2], "title": "  Renamed  "},
+    ]
+
+    response = client.post(f"/roadmaps/{roadmap.id}/milestones/batch", json={"operations": operations}, headers=headers)
+
+    assert response.status_code == 200
+    summary = response.json()
+    assert (summary["completed_milestones"], summary["total_milestones"], summary["progress"]) == (1, 4, 25)
+    db.expire_all()
+    milestones = {m.id: m for m in db.query(Milestone).filter_by(roadmap_id=roadmap.id)}
+    assert [milestones[mid].completed for mid in milestone_ids] == [True, False, False, False]
+    assert milestones[milestone_ids[3]].completed_at is None
+    assert (milestones[milestone_ids[2]].title, milestones[milestone_ids[2]].due_date) == ("Renamed", date(2030, 1, 31))
+    stats = db.get(UserStats, user.id)
+    assert {column: getattr(stats, column) for column in COUNTER_COLUMNS} == \
+        user_stats_service._compute_snapshot(user.id, db)
+
+
+def test_batch_with_a_foreign_milestone_changes_nothing(client, db, make_user, make_roadmap):
+    user, headers = make_user()
+    roadmap, milestone_ids = make_roadmap(user.id, milestones=2)
+    other, _ = make_user()
+    _, foreign_ids = make_roadmap(other.id, milestones=1)
+    operations = [
+        {"op": "complete", "milestone_id": milestone_ids[0]},
+        {"op": "complete", "milestone_id": foreign_ids[0]},
+    ]
+
+    response = client.post(f"/roadmaps/{roadmap.id}/milestones/batch", json={"operations": operations}, headers=headers)
+
+    assert response.status_code == 404
+    db.expire_all()
+    assert not any(m.completed for m in db.query(Milestone).filter(Milestone.id.in_(milestone_ids + foreign_ids)))
+
+
+def test_complete_all_keeps_existing_completion_times(client, db, make_user, make_roadmap):
+    user, headers = make_user()
+    roadmap, milestone_ids = make_roadmap(user.id, milestones=3)
+    client.put(f"/roadmaps/milestones/{milestone_ids[0]}/complete", headers=headers)
+    db.expire_all()
+    first_completed_at = db.get(Milestone, milestone_ids[0]).completed_at
+
+    response = client.put(f"/roadmaps/{roadmap.id}/complete-all", headers=headers)
+
+    assert response.json() == {"message": "All milestones completed successfully", "completed_count": 3}
+    db.expire_all()
+    assert db.get(Roadmap, roadmap.id).progress == 100
+    assert db.get(Milestone, milestone_ids[0]).completed_at == first_completed_at
+    assert db.get(UserStats, user.id).milestones_completed == 3
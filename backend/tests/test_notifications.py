@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import lupa
+
+from app.core.redis_client import RedisConnection
+from app.services.notification_service import (PUBLISH_LUA, Notification,
+                                               NotificationBroker,
+                                               RedisNotificationBroker)
+
+# Not routable: connecting only ends at the socket timeout, like a Redis host that went away
+UNREACHABLE_REDIS = "redis://10.255.255.1:6379/0"
+
+
+def test_publish_during_a_redis_outage_neither_blocks_nor_loses_the_event():
+    broker = RedisNotificationBroker(RedisConnection(UNREACHABLE_REDIS, 0.3, 1, 0.1))
+
+    async def run():
+        broker.start()
+        stream = broker.subscribe(1, heartbeat_seconds=2)
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+
+        started = time.monotonic()
+        # Worker threads and request handlers publish the same way
+        await asyncio.to_thread(broker.publish, 1, "job_completed", {"job": "achievement_check"})
+        broker.publish(1, "roadmap_progress", {"progress": 50})
+        publish_seconds = time.monotonic() - started
+
+        received = [await first, await stream.__anext__()]
+        await stream.aclose()
+        return publish_seconds, received
+
+    try:
+        publish_seconds, received = asyncio.run(run())
+    finally:
+        broker.stop()
+
+    assert publish_seconds < 0.1
+    assert sorted(notification.type for notification in received) == ["job_completed", "roadmap_progress"]
+    assert all(notification.id > 0 for notification in received)
+
+
+def test_publish_before_start_reaches_local_subscribers():
+    broker = RedisNotificationBroker(RedisConnection(UNREACHABLE_REDIS, 0.3, 1, 0.1))
+
+    async def run():
+        stream = broker.subscribe(7, heartbeat_seconds=1)
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        broker.publish(7, "job_completed")
+        notification = await first
+        await stream.aclose()
+        return notification
+
+    notification = asyncio.run(run())
+    assert notification.type == "job_completed" and notification.id > 0
+
+
+def test_published_messages_carry_increasing_ids():
+    lua = lupa.LuaRuntime()
+    store, published = {}, []
+
+    def call(command, *args):
+        if command == "INCR":
+            store[args[0]] = int(store.get(args[0], 0)) + 1
+            return store[args[0]]
+        if command == "SET":
+            store[args[0]] = int(args[1])
+            return "OK"
+        if command == "PUBLISH":
+            published.append((args[0], args[1]))
+            return 1
+
+    script = lua.eval(f"function(KEYS, ARGV, redis) {PUBLISH_LUA} end")
+    redis = lua.table_from({"call": call})
+    now = time.time_ns() // 1000
+    for user_id in (1, 2):
+        payload = Notification(id=0, user_id=user_id, type="job_completed").to_json()
+        script(lua.table("notifications:last_id"), lua.table(str(now), "notifications", payload), redis)
+
+    channels = {channel for channel, _ in published}
+    received = [Notification.from_message(message) for _, message in published]
+    assert channels == {"notifications"}
+    assert [notification.user_id for notification in received] == [1, 2]
+    assert received[0].id == now and received[1].id == now + 1
+
+
+def test_histories_are_kept_for_the_most_recently_notified_users():
+    broker = NotificationBroker(history_size=5, max_history_users=100)
+    for user_id in range(1000):
+        broker.publish(user_id, "job_completed")
+    broker.publish(900, "roadmap_progress")
+    broker.publish(1000, "job_completed")
+
+    async def replay(user_id):
+        stream = broker.subscribe(user_id, last_event_id=0, heartbeat_seconds=0.01)
+        replayed = []
+        async for notification in stream:
+            if notification is None:
+                break
+            replayed.append(notification.type)
+        await stream.aclose()
+        return replayed
+
+    assert len(broker._history) == 100
+    # User 900 was notified again, so it outlived the users notified after it the first time
+    assert asyncio.run(replay(900)) == ["job_completed", "roadmap_progress"]
+    assert asyncio.run(replay(0)) == []
+    assert asyncio.run(replay(1000)) == ["job_completed"]
@@ -0,0 +1,37 @@
+from sqlalchemy import event
+
+from app.database import engine
+from app.services.achievement_worker import achievement_worker
+
+
+def profile_counts(client, headers):
+    profile = client.get("/users/profile", headers=headers).json()
+    return {key: profile[key] for key in
+            ("total_roadmaps", "total_milestones", "completed_milestones", "completed_roadmaps")}
+
+
+def test_profile_counters_are_cached_until_a_write_commits(client, monkeypatch, make_user, make_roadmap):
+    monkeypatch.setattr(achievement_worker, "enqueue", lambda user_id: None)
+    user, headers = make_user()
+    _, milestone_ids = make_roadmap(user.id, milestones=2)
+    assert profile_counts(client, headers) == {
+        "total_roadmaps": 1, "total_milestones": 2, "completed_milestones": 0, "completed_roadmaps": 0
+    }
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        cached = profile_counts(client, headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert not any("user_stats" in statement for statement in statements)
+
+    for milestone_id in milestone_ids:
+        client.put(f"/roadmaps/milestones/{milestone_id}/complete", headers=headers)
+
+    assert profile_counts(client, headers) == {
+        **cached, "completed_milestones": 2, "completed_roadmaps": 1
+    }
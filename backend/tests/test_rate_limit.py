@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import lupa
+import pytest
+
+from app.core.redis_client import RedisConnection
+from app.services.ai_quota_service import AIQuotaExceededError, AIQuotaService, ai_quota_service
+from app.services.llm_service import llm_service
+from app.services.rate_limit_service import (RateLimitService,
+                                             RateLimitWindow, evaluate_gcra,
+                                             rate_limit_service)
+
+MINUTE = RateLimitWindow("minute", 6, 60)  # one request every 10 seconds
+NOW = 1_000_000.0
+
+
+def memory_limiter(windows, key_prefix="test:gcra"):
+    return RateLimitService(windows, connection=RedisConnection(None, 0.1, 1, 1.0), key_prefix=key_prefix)
+
+
+def test_gcra_refuses_a_request_that_overflows_the_window():
+    allowed, new_tats, results = evaluate_gcra([MINUTE], [NOW + 55], NOW)
+    assert not allowed
+    assert new_tats == [NOW + 65]
+    assert results[0].retry_after == pytest.approx(5)
+    # A refused request leaves the window as it was
+    assert results[0].reset_after == pytest.approx(55)
+
+
+def test_gcra_forced_request_is_charged_even_when_it_does_not_fit():
+    allowed, new_tats, results = evaluate_gcra([MINUTE], [NOW + 55], NOW, cost=2, force=True)
+    assert not allowed
+    assert new_tats == [NOW + 75]
+    assert results[0].reset_after == pytest.approx(75)
+    assert results[0].remaining == 0
+
+
+def test_gcra_negative_cost_refunds_down_to_an_empty_window():
+    allowed, new_tats, results = evaluate_gcra([MINUTE], [NOW + 30], NOW, cost=-2, force=True)
+    assert allowed
+    assert new_tats == [NOW + 10]
+    assert results[0].remaining == 5
+
+    _allowed, new_tats, results = evaluate_gcra([MINUTE], [NOW + 30], NOW, cost=-10, force=True)
+    assert new_tats == [NOW]
+    assert results[0].remaining == MINUTE.limit
+
+
+def test_gcra_dry_run_describes_the_state_before_the_request():
+    allowed, new_tats, results = evaluate_gcra([MINUTE], [NOW + 20], NOW, dry_run=True)
+    assert allowed
+    assert new_tats == [NOW + 30]
+    assert results[0].reset_after == pytest.approx(20)
+    assert results[0].remaining == 4
+
+
+def test_token_budget_reserves_and_settles_against_reported_usage():
+    quota = AIQuotaService(tokens_per_day=1000)
+    quota.limiter = memory_limiter(quota.limiter.windows, "test:tokens")
+
+    async def run():
+        async with quota.metered(1, 600) as usage:
+            # The estimate is held for the duration of the call
+            assert (await quota.limiter.peek(1)).remaining == 400
+            usage.prompt_tokens, usage.output_tokens = 200, 100
+        # Settled at the 300 tokens actually used
+        assert (await quota.limiter.peek(1)).remaining == 700
+
+        async with quota.metered(1, 100) as usage:
+            usage.prompt_tokens, usage.output_tokens = 300, 200
+        # Usage above the estimate is charged
+        assert (await quota.limiter.peek(1)).remaining == 200
+
+        with pytest.raises(AIQuotaExceededError):
+            async with quota.metered(1, 300):
+                pass
+        assert (await quota.limiter.peek(1)).remaining == 200
+
+    asyncio.run(run())
+
+
+def test_token_budget_refunds_a_call_that_failed():
+    quota = AIQuotaService(tokens_per_day=1000)
+    quota.limiter = memory_limiter(quota.limiter.windows, "test:tokens")
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            async with quota.metered(1, 800):
+                raise RuntimeError("provider unavailable")
+        assert (await quota.limiter.peek(1)).remaining == 1000
+
+    asyncio.run(run())
+
+
+def test_token_refusal_does_not_use_up_a_request(monkeypatch, client, make_user, make_roadmap):
+    user, headers = make_user()
+    roadmap, _ = make_roadmap(user.id)
+    monkeypatch.setattr(llm_service, "_call_ai_service", pytest.fail)
+    monkeypatch.setattr(ai_quota_service, "limiter", memory_limiter([RateLimitWindow("day", 10, 86400)], "test:tokens"))
+    before = asyncio.run(rate_limit_service.peek(user.id)).remaining
+
+    response = client.post("/ai/chat", json={"message": "What next?", "roadmap_id": roadmap.id}, headers=headers)
+
+    assert response.status_code == 429
+    assert "token budget" in response.json()["detail"]
+    assert asyncio.run(rate_limit_service.peek(user.id)).remaining == before
+
+
+class LuaRedis(RedisConnection):
+    """Runs the limiter's scripts in an embedded Lua interpreter against a dict"""
+
+    def __init__(self, lua):
+        super().__init__("redis://test", 0.1, 1, 1.0)
+        self.lua = lua
+        self.data = {}
+        commands = {"TIME": self._time, "MGET": self._mget, "SET": self._set}
+        self.redis = lua.table_from({"call": lambda command, *args: commands[command](*args)})
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+    @property
+    def client(self):
+        return self
+
+    def _time(self):
+        now = time.time()
+        return self.lua.table(str(int(now)), str(int(now % 1 * 1_000_000)))
+
+    def _mget(self, *keys):
+        return self.lua.table(*[self.data.get(key, False) for key in keys])
+
+    def _set(self, key, value, *_expiry):
+        self.data[key] = value
+        return "OK"
+
+    def script(self, source: str):
+        function = self.lua.eval(f"function(KEYS, ARGV, redis) {source} end")
+
+        async def run(keys, args):
+            result = function(self.lua.table(*keys), self.lua.table(*[str(arg) for arg in args]), self.redis)
+            return list(result.values())
+        return run
+
+
+def test_lua_script_agrees_with_the_memory_store():
+    lua = lupa.LuaRuntime()
+    lua.globals().unpack = lua.eval("table.unpack")
+    windows = [RateLimitWindow("minute", 5, 60), RateLimitWindow("hour", 8, 3600)]
+    redis_limiter = RateLimitService(windows, connection=LuaRedis(lua), key_prefix="test:lua")
+    memory = memory_limiter(windows, "test:lua")
+    assert redis_limiter.redis_store is not None and memory.redis_store is None
+
+    steps = [
+        ("acquire", 1), ("acquire", 2), ("peek", 1), ("acquire", 3), ("adjust", 3),
+        ("acquire", 1), ("adjust", -4), ("acquire", 1), ("peek", 1), ("adjust", -20), ("acquire", 5),
+    ]
+
+    async def run(limiter):
+        decisions = []
+        for operation, cost in steps:
+            if operation == "peek":
+                decision = await limiter.peek(7)
+            else:
+                decision = await getattr(limiter, operation)(7, cost)
+            decisions.append((decision.allowed, decision.limit, decision.remaining, decision.window_seconds))
+        return decisions
+
+    assert asyncio.run(run(redis_limiter)) == asyncio.run(run(memory))
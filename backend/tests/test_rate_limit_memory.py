@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from app.services.rate_limit_service import MemoryRateLimitStore, default_windows
+from benchmarks.rate_limit_memory_benchmark import measure
+
+MIB = 2 ** 20
+
+
+def check_bounds(users: int, cap: int):
+    windows = default_windows()
+    store, tracked, filled, _elapsed, (idle_tracked, idle_bytes) = measure(users, users * 2, windows, idle_after=True)
+    assert tracked == users
+    assert filled / users < 400  # bytes per tracked user
+    # Only the request that came after the windows passed is left, and the tables were shrunk
+    assert idle_tracked == 1
+    assert store.evicted_idle == users
+    assert idle_bytes < filled / 20
+
+    store, tracked, filled, _elapsed, _idle = measure(users, cap, windows, idle_after=False)
+    assert tracked <= cap
+    assert store.evicted_lru >= users - cap
+    # Churn keeps the tables at their peak size, so allow a little more per slot
+    assert filled < cap * 512 + MIB
+
+
+def test_memory_is_bounded():
+    check_bounds(50_000, 10_000)
+
+
+@pytest.mark.slow
+def test_memory_is_bounded_at_a_million_users():
+    check_bounds(1_000_000, 100_000)
+
+
+def test_a_held_shard_does_not_block_other_users():
+    windows = default_windows()
+    store = MemoryRateLimitStore(100_000)
+    busy = store._shard(1)
+    other = next(key for key in range(2, 1000) if store._shard(key) is not busy)
+
+    with busy.lock:
+        done = threading.Event()
+        thread = threading.Thread(target=lambda: (store.acquire(other, windows, 1, False), done.set()))
+        thread.start()
+        assert done.wait(5)
+    thread.join()
+    assert len(store) == 1
+
+
+def test_small_stores_keep_exact_lru_order():
+    windows = default_windows()
+    store = MemoryRateLimitStore(3)
+    for key in (1, 2, 3):
+        store.acquire(key, windows, 1, False)
+    store.acquire(1, windows, 1, False)
+    store.acquire(4, windows, 1, False)
+
+    assert sorted({key for key, _tat in store.items()}) == [1, 3, 4]
+    assert store.evicted_lru == 1
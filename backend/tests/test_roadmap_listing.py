@@ -0,0 +1,52 @@
+from sqlalchemy import event
+
+from app.database import engine
+
+
+def test_summary_pages_newest_first_until_the_cursor_runs_out(client, make_user, make_roadmap):
+    user, headers = make_user()
+    roadmap_ids = [make_roadmap(user.id, milestones=1)[0].id for _ in range(5)]
+    other, _ = make_user()
+    make_roadmap(other.id)
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get(f"/roadmaps/user/{user.id}/summary", params=params, headers=headers).json()
+        pages.append([item["id"] for item in page["items"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == [roadmap_ids[4:2:-1], roadmap_ids[2:0:-1], roadmap_ids[:1]]
+    assert set(page["items"][0]) == {"id", "title", "field", "progress", "next_milestone",
+                                     "total_milestones", "completed_milestones", "created_at"}
+    assert client.get(f"/roadmaps/user/{other.id}/summary", headers=headers).status_code == 403
+
+
+def test_listing_loads_milestones_without_a_query_per_roadmap(client, make_user, make_roadmap):
+    user, headers = make_user()
+    client.get(f"/roadmaps/user/{user.id}", headers=headers)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def list_roadmaps():
+        statements.clear()
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            response = client.get(f"/roadmaps/user/{user.id}", headers=headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        return response.json(), len(statements)
+
+    make_roadmap(user.id, milestones=2)
+    one, statements_for_one = list_roadmaps()
+    for _ in range(4):
+        make_roadmap(user.id, milestones=2)
+    five, statements_for_five = list_roadmaps()
+
+    assert len(one) == 1 and len(five) == 5
+    assert all(len(roadmap["milestones"]) == 2 for roadmap in five)
+    assert statements_for_five == statements_for_one
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models import ChatMessage, Milestone
+from app.services.chat_archive_service import chat_archive_service
+from app.services.search_service import SearchService, search_service
+
+
+def test_snippet_escapes_content_and_marks_matches(db, make_user, make_roadmap):
+    user, _ = make_user()
+    roadmap, milestone_ids = make_roadmap(user.id, milestones=1)
+    milestone = db.get(Milestone, milestone_ids[0])
+    milestone.description = '<img src=x onerror="alert(1)"> Learn Kubernetes & Helm'
+    db.commit()
+
+    results = search_service.search(user.id, "kubernetes", db)
+
+    assert len(results) == 1
+    snippet = results[0].snippet
+    assert "<img" not in snippet
+    assert "&lt;img src=x onerror=&quot;alert(1)&quot;&gt;" in snippet
+    assert "<mark>Kubernetes</mark> &amp; Helm" in snippet
+
+
+def test_search_only_returns_the_users_documents(db, make_user, make_roadmap):
+    owner, _ = make_user()
+    other, _ = make_user()
+    for user in (owner, other):
+        _, milestone_ids = make_roadmap(user.id, milestones=1)
+        db.get(Milestone, milestone_ids[0]).description = "Terraform modules"
+    db.commit()
+
+    results = search_service.search(owner.id, "terraform", db)
+
+    assert [r.roadmap_id for r in results] and all(
+        db.get(Milestone, r.id).roadmap.user_id == owner.id for r in results
+    )
+    # The owner token itself is not searchable text
+    assert search_service.search(owner.id, f"u{owner.id}", db) == []
+
+
+def test_rebuild_keeps_archived_chat_messages(db, make_user, make_roadmap):
+    user, _ = make_user()
+    roadmap, _ = make_roadmap(user.id, milestones=1)
+    # Archiving expunges the session
+    user_id, roadmap_id = user.id, roadmap.id
+    old = datetime.utcnow() - timedelta(days=365)
+    db.add_all([
+        ChatMessage(roadmap_id=roadmap_id, user_id=user_id, type="user", content="How do I learn Rustlang?", timestamp=old),
+        ChatMessage(roadmap_id=roadmap_id, user_id=user_id, type="ai", content="Start with the Rustlang book.", timestamp=old),
+    ])
+    db.commit()
+    archived, _, _ = chat_archive_service.archive_roadmap(roadmap_id, datetime.utcnow(), 10, db)
+    assert archived == 2
+    assert len(search_service.search(user_id, "rustlang", db)) == 2
+
+    chat_archive_service.rebuild_search_index(db)
+
+    assert len(search_service.search(user_id, "rustlang", db)) == 2
+
+
+def test_ensure_index_upgrades_an_index_without_owner_column(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, name, email, hashed_password) VALUES (1, 'A', 'a@x', 'x')"))
+        connection.execute(text("INSERT INTO roadmaps (id, user_id, title, field, description) "
+                                "VALUES (1, 1, 'Cloud', 'devops', 'Learn Ansible')"))
+        # Layout and trigger of the first version of the index
+        connection.execute(text("""CREATE VIRTUAL TABLE search_index USING fts5(
+            title, body, kind UNINDEXED, ref_id UNINDEXED, user_id UNINDEXED, roadmap_id UNINDEXED)"""))
+        connection.execute(text("""CREATE TRIGGER search_roadmap_insert AFTER INSERT ON roadmaps BEGIN
+            INSERT INTO search_index (rowid, title, body, kind, ref_id, user_id, roadmap_id)
+            VALUES (new.id * 4 + 3, new.title, '', 'roadmap', new.id, new.user_id, new.id);
+        END"""))
+
+    service = SearchService()
+    service.ensure_index(engine)
+
+    assert service.available
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO roadmaps (id, user_id, title, field, description) "
+                                "VALUES (2, 1, 'Data', 'data', 'Learn Ansible too')"))
+    with Session(engine) as session:
+        assert sorted(r.id for r in service.search(1, "ansible", session)) == [1, 2]
+    engine.dispose()
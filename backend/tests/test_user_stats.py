@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+from app.database import SessionLocal
+from app.models import Milestone, Roadmap, UserStats
+from app.services.user_stats_service import (COUNTER_COLUMNS, FIELD_ADDED,
+                                             MILESTONE_COMPLETED,
+                                             MILESTONE_UNCOMPLETED,
+                                             MILESTONES_ADDED, PROGRESS_RESET,
+                                             ROADMAP_COMPLETED, ROADMAP_CREATED,
+                                             ROADMAP_DELETED, ROADMAP_REOPENED,
+                                             user_stats_service)
+
+
+def assert_counters_match_source(user_id, db):
+    db.commit()
+    stats = db.get(UserStats, user_id, populate_existing=True)
+    expected = user_stats_service._compute_snapshot(user_id, db)
+    assert {column: getattr(stats, column) for column in COUNTER_COLUMNS} == expected
+
+
+def add_roadmap(user_id, db, field, milestones):
+    roadmap = Roadmap(user_id=user_id, title="Roadmap", field=field, total_milestones=milestones, completed_milestones=0)
+    db.add(roadmap)
+    db.flush()
+    db.add_all([Milestone(roadmap_id=roadmap.id, title=f"Milestone {i}", description="") for i in range(milestones)])
+    user_stats_service.record_event(user_id, ROADMAP_CREATED, db, milestones=milestones)
+    user_stats_service.record_event(user_id, FIELD_ADDED, db, field=field, roadmap_id=roadmap.id)
+    return roadmap
+
+
+def set_completed(roadmap, milestones, completed, db, completed_at=None):
+    for milestone in milestones:
+        milestone.completed = completed
+        milestone.completed_at = (completed_at or datetime.now()) if completed else None
+    roadmap.completed_milestones += len(milestones) if completed else -len(milestones)
+    event = MILESTONE_COMPLETED if completed else MILESTONE_UNCOMPLETED
+    user_stats_service.record_event(roadmap.user_id, event, db, count=len(milestones),
+                                    completed_at=completed_at or datetime.now())
+
+
+def test_every_event_keeps_the_counters_equal_to_a_rebuild(db, make_user):
+    user, _ = make_user()
+    user_stats_service.get_stats(user.id, db)
+
+    first = add_roadmap(user.id, db, "data_science", milestones=3)
+    assert_counters_match_source(user.id, db)
+
+    milestones = db.query(Milestone).filter_by(roadmap_id=first.id).order_by(Milestone.id).all()
+    set_completed(first, milestones[:1], True, db, completed_at=datetime.now() - timedelta(days=1))
+    assert_counters_match_source(user.id, db)
+
+    db.add(Milestone(roadmap_id=first.id, title="Extra", description=""))
+    first.total_milestones += 1
+    user_stats_service.record_event(user.id, MILESTONES_ADDED, db, count=1)
+    assert_counters_match_source(user.id, db)
+
+    set_completed(first, milestones[:1], False, db)
+    assert_counters_match_source(user.id, db)
+
+    milestones = db.query(Milestone).filter_by(roadmap_id=first.id).order_by(Milestone.id).all()
+    set_completed(first, milestones, True, db)
+    user_stats_service.record_event(user.id, ROADMAP_COMPLETED, db)
+    assert_counters_match_source(user.id, db)
+    assert db.get(UserStats, user.id).roadmaps_completed == 1
+
+    set_completed(first, milestones[-1:], False, db)
+    user_stats_service.record_event(user.id, ROADMAP_REOPENED, db)
+    assert_counters_match_source(user.id, db)
+
+    # A second roadmap in the same field doesn't add a distinct field, and deleting one keeps it
+    second = add_roadmap(user.id, db, "data_science", milestones=2)
+    assert_counters_match_source(user.id, db)
+    db.delete(first)
+    user_stats_service.record_event(
+        user.id, ROADMAP_DELETED, db, roadmap_id=first.id, field=first.field,
+        milestones=4, completed_milestones=3, was_completed=False
+    )
+    assert_counters_match_source(user.id, db)
+    assert db.get(UserStats, user.id).distinct_fields == 1
+
+    db.delete(second)
+    user_stats_service.record_event(user.id, PROGRESS_RESET, db)
+    assert_counters_match_source(user.id, db)
+
+
+def test_a_concurrently_built_row_is_reused(monkeypatch, db, make_user):
+    user, _ = make_user()
+    compute_snapshot = user_stats_service._compute_snapshot
+
+    def another_request_builds_the_row_first(user_id, session):
+        other = SessionLocal()
+        try:
+            other.add(UserStats(user_id=user_id, **compute_snapshot(user_id, other)))
+            other.commit()
+        finally:
+            other.close()
+        return compute_snapshot(user_id, session)
+
+    monkeypatch.setattr(user_stats_service, "_compute_snapshot", another_request_builds_the_row_first)
+    stats = user_stats_service.get_stats(user.id, db)
+    db.commit()
+
+    assert stats.user_id == user.id
+    assert db.query(UserStats).filter_by(user_id=user.id).count() == 1